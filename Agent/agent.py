@@ -4,42 +4,116 @@ from langchain_openai import ChatOpenAI
 from openai import RateLimitError
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.runnables import RunnableWithMessageHistory
-from typing import Dict, Any, List
+from langchain_core.messages import SystemMessage
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, AsyncIterator, Awaitable, Callable, Literal, Optional
+import asyncio
 import json
+import logging
+import threading
 import re
 import os
-from tools import AVAILABLE_TOOLS, get_tool
+from tools import AVAILABLE_TOOLS, NEAREST_COORDINATE_PRECISION, NEAREST_KEYWORDS, get_tool
+from transports import get_transport
+from cache import tool_cache
+from semantic_cache import response_cache
+from governor import LLMOverloadedError, llm_governor
+from deadline import Deadline
+from runtime import run_sync
+from renderers import render_products, render_outlets
+from router import INTENT_ROUTER, route
+from history import (
+    HISTORY_MODE, PLANNER_TOKEN_BUDGET, compaction_end, count_message_tokens,
+    count_tokens, format_transcript, recent_turns
+)
 
+logger = logging.getLogger(__name__)
 
-class AgentPlanner:
-    """
-    Agent that plans and executes actions based on user intent.
-    Uses LangChain chains with conversation memory.
-    """
+# Most independent tool calls one decision may run at once
+MAX_PARALLEL_CALLS = 4
+
+# "template" renders product and outlet results directly, "llm" has the LLM
+# summarize them in a second call (slower, and more tokens per turn)
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "template")
+
+# "text" has the planner write an INTENT:/ACTION:/... block that is parsed with
+# regexes, "structured" has it call a function with a validated decision object
+PLANNER_MODE = os.getenv("PLANNER_MODE", "text")
+
+# Words that make a message a location query, which is sent with the user's location
+LOCATION_KEYWORDS = ["near", "nearest", "closest", "nearby", "close to me", "around me", "outlet", "location", "branch", "store"]
+
+# Words that make a message a product query
+PRODUCT_KEYWORDS = ["mug", "tumbler", "cup", "bottle", "flask", "drinkware"]
+
+# "on" starts the likely product or outlet lookup while the planner is still
+# deciding, "off" waits for the planner. A wrong guess costs one wasted API
+# call (and, for outlet text queries, one text-to-SQL LLM call on the API)
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "off")
+
+# "outlets in Cheras", "outlet near Sunway": the query the planner is asked to write
+OUTLET_PHRASE = re.compile(r"\boutlets?\s+(?:in|at|near|around)\s+\w+(?:\s+(?!and\b)\w+)*")
+
+# Seconds an LLM summary needs; with less left before the deadline,
+# tool results are rendered with the templates instead
+SUMMARY_MIN_SECONDS = 3.0
+
+# Status shown to the user while a tool runs
+TOOL_STATUS = {
+    "product_search": "Searching products...",
+    "outlet_query": "Searching outlets...",
+    "calculator": "Calculating...",
+}
+
+# Receives {"type": "status", "message": ...} and {"type": "token", "text": ...} events
+Emit = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ToolCall(BaseModel):
+    tool: str = Field(description="tool name from AVAILABLE TOOLS")
+    params: Dict[str, Any] = Field(default_factory=dict, description="parameters for the tool")
+
+
+class PlannerDecision(BaseModel):
+    """Record the decision about how to handle the user's message."""
+    intent: str = Field(description="the user's intent, in a few words")
+    action: Literal["use_tool", "ask_user", "answer"]
+    tool: Optional[str] = Field(None, description="tool name from AVAILABLE TOOLS if action is use_tool")
+    params: Dict[str, Any] = Field(default_factory=dict, description="parameters for the tool")
+    calls: List[ToolCall] = Field(default_factory=list, description="several INDEPENDENT tool calls, only when needed")
+    missing: str = Field("none", description="missing information, or none")
+    question: str = Field("", description="your question if action is ask_user")
+    answer: str = Field("", description="your answer if action is answer")
+
+
+_llm = None
+_planner_chains = {}
+_system_prompt_tokens = {}
+_shared_lock = threading.Lock()
+
+
+def get_llm() -> ChatOpenAI:
+    """Get the process-wide LLM client, shared by every session."""
+    global _llm
+    if _llm is None:
+        with _shared_lock:
+            if _llm is None:
+                # Rate limits are retried by the governor, which paces every session's calls
+                _llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.0, api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _llm
+
+
+def _build_planner_prompt(mode: str = "text") -> ChatPromptTemplate:
+    """Build the planning prompt. Each session passes in its own history."""
     
-    def __init__(self, session_id: str = "default"):
-        self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.0, api_key=os.getenv("OPENAI_API_KEY"))
-        self.session_id = session_id
-        
-        # Memory stores
-        self.chat_history_store = {}
-        self.context = {} 
-        
-        # Build the planning chain with memory
-        self._build_chain()
+    # System prompt for planning
+    tools_description = "\n".join([
+        f"- {name}: {tool.description}" 
+        for name, tool in AVAILABLE_TOOLS.items()
+    ])
     
-    def _build_chain(self):
-        """Build LangChain with conversation memory."""
-        
-        # System prompt for planning
-        tools_description = "\n".join([
-            f"- {name}: {tool.description}" 
-            for name, tool in AVAILABLE_TOOLS.items()
-        ])
-        
-        # Use raw string to avoid f-string interpretation issues
-        system_template = """
+    # Use raw string to avoid f-string interpretation issues
+    system_template = """
         You are an AI agent planner for ZUS Coffee assistant. Your job is to decide what action to take.
         AVAILABLE TOOLS:
         """ + tools_description + """
@@ -88,13 +162,25 @@ class AgentPlanner:
         2. What information is MISSING?
         3. What ACTION should you take?
 
-        Respond in this EXACT format (DO NOT deviate from this format):
+        """
+    
+    if mode == "structured":
+        system_template += """Always record your decision by calling the PlannerDecision function, never reply with plain text.
+        - action must be EXACTLY "use_tool", "ask_user", or "answer"
+        - For use_tool, set tool and params, e.g. tool "product_search" with the query "mugs"
+        - Use calls only when the user needs several lookups that don't depend on each other (e.g. outlets in two areas, or a product and an outlet). Still set tool and params to the first call
+        - For ask_user, write your question in question and list what is missing in missing
+        - For answer, write a proper greeting or response in answer
+        """
+    else:
+        system_template += """Respond in this EXACT format (DO NOT deviate from this format):
 
         INTENT: describe the user's intent
         MISSING: list missing information, or "none" if you have everything
         ACTION: MUST BE EXACTLY ONE OF: use_tool OR ask_user OR answer (no other values allowed!)
         TOOL: tool name from AVAILABLE TOOLS if ACTION is use_tool, otherwise write "none"
         PARAMS: JSON parameters for the tool like {{"query": "mugs"}}, or {{}} if none needed
+        CALLS: JSON list of tool calls when the user needs several INDEPENDENT lookups, like [{{"tool": "outlet_query", "params": {{"query": "outlets in Cheras"}}}}, {{"tool": "product_search", "params": {{"query": "tumblers"}}}}], otherwise write "none"
         QUESTION: your question if ACTION is ask_user, otherwise write "none"
         ANSWER: your answer if ACTION is answer, otherwise write "none"
         REASONING: brief explanation of your decision
@@ -102,7 +188,8 @@ class AgentPlanner:
         CRITICAL FORMATTING RULES:
         - DO NOT write conversational responses outside this format
         - DO NOT skip any fields
-        - ALWAYS include all 8 fields above, even if the value is "none"
+        - ALWAYS include all 9 fields above, even if the value is "none"
+        - Use CALLS only when the lookups don't depend on each other (e.g. outlets in two areas, or a product and an outlet). Still set TOOL and PARAMS to the first call
         - Your response MUST start with "INTENT:" on the first line
         - ACTION must be EXACTLY "use_tool", "ask_user", or "answer" - nothing else!
         - Always provide ANSWER field even if empty - write a proper greeting or response!
@@ -110,43 +197,112 @@ class AgentPlanner:
         Be concise and follow the format exactly.   
         """
 
-        # Create prompt with message history placeholder
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_template),
-            MessagesPlaceholder(variable_name="history"),
-            ("human", "{question}")
-        ])
-        
-        # Base chain
-        base_chain = prompt | self.llm
-        
-        # Wrap with message history
-        self.chain = RunnableWithMessageHistory(
-            base_chain,
-            self._get_session_history,
-            input_messages_key="question",
-            history_messages_key="history",
-        )
+    # Create prompt with message history placeholder
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_template),
+        MessagesPlaceholder(variable_name="history"),
+        ("human", "{question}")
+    ])
+    return prompt
+
+
+def get_planner_chain(mode: str = PLANNER_MODE):
+    """Get the process-wide planning chain for a planner mode, built once on first use."""
+    if mode not in _planner_chains:
+        llm = get_llm()
+        with _shared_lock:
+            if mode not in _planner_chains:
+                if mode == "structured":
+                    # include_raw keeps the reply when it doesn't fit the schema
+                    llm = llm.with_structured_output(PlannerDecision, method="function_calling", include_raw=True)
+                elif mode != "text":
+                    raise ValueError(f"Unknown PLANNER_MODE: {mode}")
+                _planner_chains[mode] = _build_planner_prompt(mode) | llm
+    return _planner_chains[mode]
+
+
+def get_system_prompt_tokens(mode: str = PLANNER_MODE) -> int:
+    """Tokens in the planner's system prompt, counted once per mode."""
+    if mode not in _system_prompt_tokens:
+        _system_prompt_tokens[mode] = count_tokens(_build_planner_prompt(mode).messages[0].prompt.template)
+    return _system_prompt_tokens[mode]
+
+
+class AgentPlanner:
+    """
+    Agent that plans and executes actions based on user intent.
+    Uses LangChain chains with conversation memory.
+    """
     
-    def _get_session_history(self, session_id: str) -> ChatMessageHistory:
-        """Get or create chat history for a session."""
-        if session_id not in self.chat_history_store:
-            self.chat_history_store[session_id] = ChatMessageHistory()
-        return self.chat_history_store[session_id]
+    def __init__(self, session_id: str = "default", summary_mode: str = None, planner_mode: str = None):
+        # The LLM client and planning chain are shared by every session
+        self.planner_mode = planner_mode or PLANNER_MODE
+        self.llm = get_llm()
+        self.chain = get_planner_chain(self.planner_mode)
+        self.session_id = session_id
+        self.summary_mode = summary_mode or SUMMARY_MODE
+        
+        # Per-session state
+        self.history = ChatMessageHistory()
+        self.context = {} 
+        
+        # With HISTORY_MODE=summary, a note summarizing history[:compacted_count]
+        self.history_mode = HISTORY_MODE
+        self.memory_note = ""
+        self.compacted_count = 0
+        self._compaction = None
+        
+        # (tool name, task) of the lookup started ahead of the planner's
+        # decision, see _start_prefetch
+        self._prefetch = None
     
-    def execute(self, user_input: str) -> Dict[str, Any]:
+    def execute(self, user_input: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Main execution: plan > execute > return result.
+        Runs aexecute on the shared event loop and waits for it.
         
         Args:
             user_input: User's message
+            deadline: Optional time the turn must finish by (see aexecute)
         
         Returns:
             Dict with execution result and bot response
         """
+        return run_sync(self.aexecute(user_input, deadline=deadline))
+    
+    async def aexecute(self, user_input: str, emit: Optional[Emit] = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Async execution: plan > execute > return result.
+        LLM and API calls are awaited, and independent tool calls run concurrently.
+        
+        Args:
+            user_input: User's message
+            emit: Optional callback for status and LLM token events (see astream)
+            deadline: Optional time the turn must finish by. Every LLM and API
+                call is cut short by it, and tool results are rendered without
+                an LLM summary when too little time is left for one
+        
+        Returns:
+            Dict with execution result and bot response
+        """
+        deadline = deadline or Deadline.never()
         try:
+            if emit:
+                await emit({"type": "status", "message": "Thinking..."})
+            
+            # A first turn that repeats a recent question is answered from the cache
+            first_turn = not self.history.messages
+            if first_turn:
+                cached = await self._acached_response(user_input)
+                if cached is not None:
+                    return cached
+            
             # Plan using the chain (with memory)
-            decision = self._plan(user_input)
+            decision = None
+            try:
+                decision = await self._aplan(user_input, deadline)
+            finally:
+                await self._settle_prefetch(decision)
             # Validate decision
             if decision["action"] == "use_tool" and not decision.get("tool"):
                 decision["action"] = "answer"
@@ -164,8 +320,10 @@ class AgentPlanner:
                         ),
                         "requires_input": True
                     }
+                elif len(decision.get("calls", [])) > 1:
+                    result = await self._aexecute_tools(decision["calls"], emit, deadline)
                 else:
-                    result = self._execute_tool(decision)
+                    result = await self._aexecute_tool(decision, emit, deadline)
             
             elif decision["action"] == "ask_user":
                 missing = decision.get("missing", "").lower()
@@ -189,18 +347,21 @@ class AgentPlanner:
                 }
                     
             # Add assistant response to history ONLY if it was a valid decision
-            history = self._get_session_history(self.session_id)
             # Only add if we have a proper response
             if result.get("response"):  
-                history.add_ai_message(result["response"])
+                self.history.add_ai_message(result["response"])
+            self._schedule_compaction()
                     
             # Include decision for transparency
             result["decision"] = decision
             
+            if first_turn and self._is_cacheable(result):
+                response_cache.set(user_input, result, self._response_cache_namespace(user_input))
+            
             return result
         
-        except RateLimitError as e:
-        # Gracefully handle rate limiting
+        except (RateLimitError, LLMOverloadedError) as e:
+        # Gracefully handle rate limiting, once the governor's retries ran out
             return {
                 "success": False,
                 "response": "I'm currently receiving too many requests. Please try again in a moment.",
@@ -208,14 +369,99 @@ class AgentPlanner:
                 "error_message": str(e),
                 "requires_input": False
             }
+        
+        except TimeoutError as e:
+            # The planner didn't decide before the deadline
+            return {
+                "success": False,
+                "response": "Sorry, that's taking longer than expected. Please try again in a moment.",
+                "error": "deadline",
+                "error_message": str(e),
+                "requires_input": False
+            }
+    
+    def _response_cache_namespace(self, user_input: str):
+        """Cached answers are only shared between agents that would give the same one."""
+        location = None
+        loc = self.context.get('user_location')
+        if loc and any(keyword in user_input.lower() for keyword in LOCATION_KEYWORDS):
+            location = (
+                round(loc['latitude'], NEAREST_COORDINATE_PRECISION),
+                round(loc['longitude'], NEAREST_COORDINATE_PRECISION)
+            )
+        return (self.summary_mode, location)
+    
+    async def _acached_response(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """The cached answer to a near-identical first turn, recorded in the history."""
+        # New outlet or product data makes every cached answer stale. Checked in
+        # the background, so the turn doesn't wait on the API or its deadline
+        response_cache.refresh_data_version(get_transport().data_version, tool_cache.clear)
+        
+        result = response_cache.get(user_input, self._response_cache_namespace(user_input))
+        if result is None:
+            return None
+        self.history.add_user_message(user_input)
+        self.history.add_ai_message(result["response"])
+        result["cached"] = True
+        return result
+    
+    def _is_cacheable(self, result: Dict[str, Any]) -> bool:
+        """Only complete answers that needed the LLM are cached, never errors or questions."""
+        if not result.get("success") or result.get("requires_input") or result.get("error"):
+            return False
+        if result["decision"].get("reasoning") == "local router":
+            return False
+        tool_results = result.get("tool_results") or [result.get("tool_result")]
+        return all(tool_result is None or tool_result.get("success") for tool_result in tool_results)
+    
+    async def astream(self, user_input: str, deadline: Optional[Deadline] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute like aexecute, yielding events as they happen:
+        {"type": "status", "message": ...} while planning and running tools,
+        {"type": "token", "text": ...} for the answer, and finally
+        {"type": "done", "result": ...} with the same result aexecute returns.
+        
+        LLM summaries are streamed token by token. Answers that don't come from
+        the LLM (templates, errors, questions) are sent as tokens once ready.
+        """
+        queue = asyncio.Queue()
+        streamed = False
+        
+        async def emit(event: Dict[str, Any]):
+            nonlocal streamed
+            streamed = streamed or event["type"] == "token"
+            await queue.put(event)
+        
+        task = asyncio.create_task(self.aexecute(user_input, emit, deadline))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        while (event := await queue.get()) is not None:
+            yield event
+        
+        result = task.result()
+        if not streamed and result.get("response"):
+            for text in re.findall(r"\S+\s*", result["response"]):
+                yield {"type": "token", "text": text}
+        yield {"type": "done", "result": result}
     
-    def _plan(self, user_input: str) -> Dict[str, Any]:
+    async def _aplan(self, user_input: str, deadline: Deadline) -> Dict[str, Any]:
         """Plan what action to take using the chain."""
         
+        # Obvious turns (arithmetic, greetings, off-topic) skip the LLM. Only a
+        # session's first message is routed, later ones may be follow-ups
+        # ("and a good one for travel?") that only the planner can read
+        if INTENT_ROUTER == "on" and not self.history.messages:
+            decision = route(user_input)
+            if decision is not None:
+                self.history.add_user_message(user_input)
+                return decision
+        
+        # The likely lookup runs while the planner decides
+        if SPECULATIVE_PREFETCH == "on":
+            self._start_prefetch(user_input, deadline)
+        
         # Check if this is a location-related query
-        location_keywords = ["near", "nearest", "closest", "nearby", "close to me", "around me", "outlet", "location", "branch", "store"]
         user_input_lower = user_input.lower()
-        is_location_query = any(keyword in user_input_lower for keyword in location_keywords)
+        is_location_query = any(keyword in user_input_lower for keyword in LOCATION_KEYWORDS)
         
         context_info = ""
         # Populate context information ONLY for location queries
@@ -226,30 +472,102 @@ class AgentPlanner:
         # Invoke chain with message history and context
         full_input = user_input + context_info
         
-        response = self.chain.invoke(
-            {"question": full_input},
-            config={"configurable": {"session_id": self.session_id}}
+        # The memory note stands in for the turns it summarizes
+        note = []
+        if self.memory_note:
+            note = [SystemMessage(content=f"Summary of the earlier conversation:\n{self.memory_note}")]
+        
+        # Only the most recent turns that fit in the token budget go to the planner
+        prompt_tokens = (
+            get_system_prompt_tokens(self.planner_mode) + count_tokens(full_input)
+            + sum(count_message_tokens(message) for message in note)
+        )
+        history = note + recent_turns(self.history.messages[self.compacted_count:], PLANNER_TOKEN_BUDGET - prompt_tokens)
+        prompt_tokens += sum(count_message_tokens(message) for message in history[len(note):])
+        response = await llm_governor.call(
+            self.session_id, prompt_tokens,
+            lambda: self.chain.ainvoke({"question": full_input, "history": history}),
+            deadline.expires_at
         )
         
-        decision_text = response.content
-        decision = self._parse_decision(decision_text)
+        if self.planner_mode == "structured":
+            decision_text, decision = self._read_structured_decision(response)
+        else:
+            decision_text = response.content
+            decision = self._parse_decision(decision_text)
+        self.history.add_user_message(full_input)
+        self.history.add_ai_message(decision_text)
         
         user_input_lower = user_input.lower()
         
-        if (decision.get("tool") == "outlet_query" and 
-            any(keyword in user_input_lower for keyword in location_keywords) and 
+        if (any(keyword in user_input_lower for keyword in LOCATION_KEYWORDS) and 
             self.context.get('user_location')):
             
             location = self.context['user_location']
-            # Add latitude/longitude to params
-            decision['params']['latitude'] = location['latitude']
-            decision['params']['longitude'] = location['longitude']
+            # Add latitude/longitude to params of every outlet call
+            for call in [decision] + decision["calls"]:
+                if call.get("tool") == "outlet_query":
+                    call['params']['latitude'] = location['latitude']
+                    call['params']['longitude'] = location['longitude']
         
         print("DECISION TEXT:\n", decision_text)
         print("PARSED DECISION:\n", decision)
         
         return decision
     
+    def _speculative_call(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """The tool call the planner is most likely to make for this message, or None."""
+        user_input_lower = user_input.lower()
+        if any(keyword in user_input_lower for keyword in NEAREST_KEYWORDS):
+            loc = self.context.get('user_location')
+            if not loc:
+                # The planner will ask for the location first
+                return None
+            # Nearest lookups are keyed on the coordinates alone, so any
+            # nearest query the planner writes shares this result
+            return {
+                "tool": "outlet_query",
+                "params": {"query": user_input, "latitude": loc['latitude'], "longitude": loc['longitude']}
+            }
+        match = OUTLET_PHRASE.search(user_input_lower)
+        if match:
+            return {"tool": "outlet_query", "params": {"query": match.group(0)}}
+        for word in re.findall(r"[a-z]+", user_input_lower):
+            if any(word.startswith(keyword) for keyword in PRODUCT_KEYWORDS):
+                return {"tool": "product_search", "params": {"query": word}}
+        return None
+    
+    def _start_prefetch(self, user_input: str, deadline: Deadline):
+        """
+        Start the likely lookup in the background. Tools fetch through the
+        shared tool cache, so if the planner then makes the same call it gets
+        this result instead of calling the API again. A call with other
+        parameters fetches its own result. See _settle_prefetch.
+        """
+        call = self._speculative_call(user_input)
+        if call is None:
+            return
+        tool = get_tool(call["tool"])
+        self._prefetch = (call["tool"], asyncio.create_task(tool.aexecute(**call["params"], deadline=deadline)))
+    
+    async def _settle_prefetch(self, decision: Optional[Dict[str, Any]]):
+        """
+        Once the planner has decided (or failed to), wait for the prefetched
+        lookup if the decision calls the same tool, so that call finds its
+        result in the tool cache, or else cancel it. Either way it is done
+        with before the turn goes on, and its outcome is retrieved.
+        """
+        if self._prefetch is None:
+            return
+        tool_name, task = self._prefetch
+        self._prefetch = None
+        used = decision is not None and decision.get("action") == "use_tool" and any(
+            call.get("tool") == tool_name for call in [decision] + decision.get("calls", [])
+        )
+        if not used:
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    
     def _parse_decision(self, decision_text: str) -> Dict[str, Any]:
         """Parse the LLM's decision into a structured format."""
         
@@ -259,6 +577,7 @@ class AgentPlanner:
             "action": "answer",
             "tool": None,
             "params": {},
+            "calls": [],
             "question": "",
             "answer": "",
             "reasoning": ""
@@ -281,6 +600,7 @@ class AgentPlanner:
             "action": r"ACTION:\s*(.+?)(?=\n|$)",
             "tool": r"TOOL:\s*(.+?)(?=\n|$)",
             "params": r"PARAMS:\s*(.+?)(?=\n|$)",
+            "calls": r"CALLS:\s*(.+?)(?=\n|$)",
             "question": r"QUESTION:\s*(.+?)(?=\n|$)",
             "answer": r"ANSWER:\s*(.+?)(?=\n|$)",
             "reasoning": r"REASONING:\s*(.+?)(?=\n|$)"
@@ -290,6 +610,9 @@ class AgentPlanner:
             match = re.search(pattern, decision_text, re.IGNORECASE)
             if match:
                 value = match.group(1).strip()
+                if key == "calls":
+                    decision[key] = self._parse_calls(value)
+                    continue
                 # Remove any leading non-alphanumeric characters (*, [, etc.) and whitespace
                 value = re.sub(r'^[^a-zA-Z0-9{]+', '', value)
                 # Remove any trailing non-alphanumeric characters and whitespace  
@@ -307,12 +630,83 @@ class AgentPlanner:
             # Action may have use_tool since llm hallucinates
             # Ensure that action is NEVER any tool call
             decision["action"] = "use_tool"
+
+        if decision["calls"] and (not decision["tool"] or decision["tool"] == "none"):
+            decision["tool"] = decision["calls"][0]["tool"]
+            decision["params"] = decision["calls"][0]["params"]
             
 
         return decision
     
-    def _execute_tool(self, decision: Dict[str, Any]) -> Dict[str, Any]:
+    def _read_structured_decision(self, response: Dict[str, Any]):
+        """
+        Convert a PlannerDecision into the same dict _parse_decision returns.
+        Returns the text to keep in the history along with the decision.
+        """
+        parsed = response["parsed"]
+        if parsed is None:
+            # The model replied in plain text instead of calling the function
+            decision_text = response["raw"].content or "I need to clarify what you're asking for."
+            return decision_text, self._parse_decision(decision_text)
+        
+        tool = parsed.tool if parsed.tool in AVAILABLE_TOOLS else None
+        decision = {
+            "intent": parsed.intent,
+            "missing": parsed.missing or "none",
+            "action": parsed.action,
+            "tool": tool if parsed.action == "use_tool" else None,
+            "params": parsed.params if parsed.action == "use_tool" else {},
+            "calls": self._filter_calls([call.model_dump() for call in parsed.calls]),
+            "question": parsed.question or "none",
+            "answer": parsed.answer,
+            "reasoning": ""
+        }
+        if decision["calls"] and not decision["tool"]:
+            decision["tool"] = decision["calls"][0]["tool"]
+            decision["params"] = decision["calls"][0]["params"]
+        return parsed.model_dump_json(exclude_defaults=True), decision
+    
+    def _parse_calls(self, value: str) -> List[Dict[str, Any]]:
+        """Parse the CALLS field into a list of {"tool", "params"} dicts."""
+        try:
+            calls = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+        if not isinstance(calls, list):
+            return []
+        return self._filter_calls(calls)
+    
+    def _filter_calls(self, calls: List[Any]) -> List[Dict[str, Any]]:
+        """Keep the valid lookups, up to MAX_PARALLEL_CALLS."""
+        parsed = []
+        for call in calls:
+            # Only lookups run in parallel, asking the user is never batched
+            if (isinstance(call, dict) and call.get("tool") in AVAILABLE_TOOLS
+                    and call["tool"] != "ask_user"):
+                params = call.get("params")
+                parsed.append({
+                    "tool": call["tool"],
+                    "params": params if isinstance(params, dict) else {}
+                })
+        return parsed[:MAX_PARALLEL_CALLS]
+    
+    async def _aexecute_tools(self, calls: List[Dict[str, Any]], emit: Optional[Emit] = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Execute independent tool calls concurrently and combine their responses."""
+        # Summaries written at the same time can't be streamed without
+        # interleaving, so only status events are passed on
+        results = await asyncio.gather(*(
+            self._aexecute_tool(call, emit, deadline, stream_tokens=False) for call in calls
+        ))
+        return {
+            "success": True,
+            "response": "\n\n".join(result["response"] for result in results),
+            "tool_results": [result.get("tool_result") for result in results],
+            "requires_input": False
+        }
+    
+    async def _aexecute_tool(self, decision: Dict[str, Any], emit: Optional[Emit] = None, deadline: Optional[Deadline] = None, stream_tokens: bool = True) -> Dict[str, Any]:
         """Execute a tool based on the decision."""
+        deadline = deadline or Deadline.never()
         
         tool_name = decision.get("tool")
         params = decision.get("params", {})
@@ -333,7 +727,9 @@ class AgentPlanner:
             }
         
         # Execute the tool
-        tool_result = tool.execute(**params)
+        if emit and tool_name in TOOL_STATUS:
+            await emit({"type": "status", "message": TOOL_STATUS[tool_name]})
+        tool_result = await tool.aexecute(**{**params, "deadline": deadline})
 
         print("TOOL RESULT:", tool_result)
         print("SUCCESS:", tool_result.get("success"))
@@ -346,7 +742,9 @@ class AgentPlanner:
         
         # Generate response
         if tool_result.get("success"):
-            response = self._generate_response_from_tool(tool_name, tool_result)
+            response = await self._agenerate_response_from_tool(
+                tool_name, tool_result, emit if stream_tokens else None, deadline
+            )
         else:
             response = tool_result.get("message") or "An error occurred while using the tool."
         
@@ -358,8 +756,43 @@ class AgentPlanner:
             "requires_input": False
         }
     
-    def _generate_response_from_tool(self, tool_name: str, tool_result: Dict[str, Any]) -> str:
+    async def _asummarize(self, summary_prompt: str, fallback: str, deadline: Deadline, emit: Optional[Emit] = None) -> str:
+        """
+        Summarize with the LLM, streaming its tokens to emit when given.
+        Returns fallback (the template rendering) instead when the summary
+        can't be written before the deadline or past the rate limits.
+        """
+        prompt_tokens = count_tokens(summary_prompt)
+        if deadline.remaining() < SUMMARY_MIN_SECONDS:
+            return fallback
+        
+        chunks = []
+        try:
+            if emit is None:
+                summary = await llm_governor.call(
+                    self.session_id, prompt_tokens, lambda: self.llm.ainvoke(summary_prompt), deadline.expires_at
+                )
+                return summary.content.strip()
+            
+            async for chunk in llm_governor.stream(
+                self.session_id, prompt_tokens, lambda: self.llm.astream(summary_prompt), deadline.expires_at
+            ):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    await emit({"type": "token", "text": chunk.content})
+        except (TimeoutError, LLMOverloadedError, RateLimitError) as e:
+            logger.warning(f"summary skipped, sending results as is: {e!r}")
+            if not chunks:
+                return fallback
+            # The start of the summary was already streamed
+            chunks.append("\n\n" + fallback)
+            if emit is not None:
+                await emit({"type": "token", "text": chunks[-1]})
+        return "".join(chunks).strip()
+    
+    async def _agenerate_response_from_tool(self, tool_name: str, tool_result: Dict[str, Any], emit: Optional[Emit] = None, deadline: Optional[Deadline] = None) -> str:
         """Generate natural language response from tool results."""
+        deadline = deadline or Deadline.never()
         
         if tool_name == "calculator":
             return f"The answer is {tool_result['result']}"
@@ -371,6 +804,9 @@ class AgentPlanner:
             if not products:
                 return "I couldn't find any products matching your description."
             
+            if self.summary_mode != "llm":
+                return render_products(products[:5])
+            
             # Aggregate the data first
             product_list_text = ""
             for i, product in enumerate(products[:5], 1):
@@ -401,9 +837,7 @@ class AgentPlanner:
             4. Keep it concise and specific.
             """
 
-            summary = self.llm.invoke(summary_prompt)
-
-            return summary.content.strip()
+            return await self._asummarize(summary_prompt, render_products(products[:5]), deadline, emit)
 
         elif tool_name == "outlet_query":
             data = tool_result.get("result") or {}  
@@ -455,6 +889,9 @@ class AgentPlanner:
             if not outlet_texts:
                 return "Sorry, I couldn't retrieve the outlet information. Could you be more specific?"
             
+            if self.summary_mode != "llm":
+                return render_outlets(outlets, is_nearest)
+            
             combined_outlet_info = "\n\n".join(outlet_texts)
             
             # Different prompt for nearest vs regular search
@@ -498,8 +935,7 @@ class AgentPlanner:
                 7. Keep the response concise and specific without too much added jargon.
                 """
             
-            summary = self.llm.invoke(summary_prompt)
-            return summary.content.strip()
+            return await self._asummarize(summary_prompt, render_outlets(outlets, is_nearest), deadline, emit)
 
         
         else:
@@ -507,17 +943,59 @@ class AgentPlanner:
     
     def get_conversation_history(self) -> List[Dict[str, str]]:
         """Get conversation history for current session."""
-        history = self._get_session_history(self.session_id)
         return [
-            {"role": "user" if isinstance(msg, type(history.messages[0])) else "assistant", 
+            {"role": "user" if isinstance(msg, type(self.history.messages[0])) else "assistant", 
              "content": msg.content}
-            for msg in history.messages
+            for msg in self.history.messages
         ]
     
+    def _schedule_compaction(self):
+        """Summarize older turns in the background once they pass the threshold."""
+        if self.history_mode != "summary":
+            return
+        if self._compaction is not None and not self._compaction.done():
+            return
+        end = compaction_end(self.history.messages, self.compacted_count)
+        if end > self.compacted_count:
+            # Off the request path: this turn's reply doesn't wait for it
+            self._compaction = asyncio.create_task(self._acompact(end))
+    
+    async def _acompact(self, end: int):
+        """Fold history[compacted_count:end] into the memory note."""
+        messages = self.history.messages
+        start = self.compacted_count
+        compaction_prompt = f"""
+        Summarize this conversation between a ZUS Coffee customer and the assistant
+        as a short memory note of at most 5 bullet points. Keep what follow-up
+        questions may refer to: outlet names and areas, products and prices, the
+        customer's location, and what they asked for. Merge in the earlier note.
+        
+        Earlier note:
+        {self.memory_note or "none"}
+        
+        Conversation:
+        {format_transcript(messages[start:end])}
+        """
+        try:
+            summary = await llm_governor.call(
+                self.session_id, count_tokens(compaction_prompt), lambda: self.llm.ainvoke(compaction_prompt)
+            )
+        except Exception as e:
+            # The raw turns are still there, so try again after the next turn
+            logger.warning(f"history compaction failed: {e}")
+            return
+        
+        # The history was cleared (or compacted) while the summary was written
+        if self.history.messages is not messages or self.compacted_count != start:
+            return
+        self.memory_note = summary.content.strip()
+        self.compacted_count = end
+    
     def clear_history(self):
         """Clear conversation history for current session."""
-        if self.session_id in self.chat_history_store:
-            self.chat_history_store[self.session_id].clear()
+        self.history.clear()
+        self.memory_note = ""
+        self.compacted_count = 0
         self.context = {}
     
     def update_context(self, key: str, value: Any):
@@ -526,6 +1004,6 @@ class AgentPlanner:
 
 
 # Factory function for creating agents with different sessions
-def create_agent(session_id: str = "default") -> AgentPlanner:
+def create_agent(session_id: str = "default", summary_mode: str = None, planner_mode: str = None) -> AgentPlanner:
     """Create a new agent instance for a session."""
-    return AgentPlanner(session_id=session_id)
+    return AgentPlanner(session_id=session_id, summary_mode=summary_mode, planner_mode=planner_mode)
@@ -1,8 +1,14 @@
 """Flask web application for ZUS Coffee Chatbot."""
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 from flask_cors import CORS
 from chatbot import ZUSChatbot
+from cache import tool_cache
+from semantic_cache import response_cache
+from governor import llm_governor
+from deadline import TURN_DEADLINE, Deadline
+from runtime import iterate_sync
+import json
 import os
 import uuid
 from datetime import timedelta
@@ -23,28 +29,44 @@ def index():
     """Render the main chat interface."""
     return render_template('index.html')
 
+def _start_chat():
+    """
+    Read the chat request and get or create the session for it,
+    saving the user's location to the session's agent when given.
+    Returns the message (empty if missing) and the session ID.
+    """
+    # A body that isn't a JSON object is treated like one without a message
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    user_message = data.get('message', '').strip()
+    user_location = data.get('location') 
+    if not user_message:
+        return user_message, None
+    
+    # Get or create session ID
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+        session.permanent = True
+    
+    session_id = session['session_id']
+    if user_location:
+        _, agent = chatbot.get_or_create_session(session_id)
+        agent.update_context('user_location', user_location)
+    return user_message, session_id
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat messages."""
+    # The turn's time budget starts when the request arrives
+    deadline = Deadline.after(TURN_DEADLINE)
     try:
-        data = request.get_json()
-        user_message = data.get('message', '').strip()
-        user_location = data.get('location') 
+        user_message, session_id = _start_chat()
         if not user_message:
             return jsonify({'error': 'Message is required'}), 400
-        
-        # Get or create session ID
-        if 'session_id' not in session:
-            session['session_id'] = str(uuid.uuid4())
-            session.permanent = True
-        
-        session_id = session['session_id']
-        if user_location:
-            _, agent = chatbot.get_or_create_session(session_id)
-            agent.update_context('user_location', user_location)
 
         # Get response from chatbot
-        response = chatbot.chat(user_message, session_id)
+        response = chatbot.chat(user_message, session_id, deadline)
         
         return jsonify({
             'success': True,
@@ -60,6 +82,41 @@ def chat():
             'error': 'Sorry, something went wrong. Please try again.'
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Handle chat messages, streaming the reply as Server-Sent Events.
+    Sends "status" events while planning and running tools, "token" events
+    with the answer as it is written, then one "done" event.
+    """
+    deadline = Deadline.after(TURN_DEADLINE)
+    try:
+        user_message, session_id = _start_chat()
+    except Exception as e:
+        app.logger.error(f"Chat stream error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Sorry, something went wrong. Please try again.'
+        }), 500
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    def generate():
+        try:
+            for event in iterate_sync(chatbot.chat_stream(user_message, session_id, deadline)):
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            app.logger.error(f"Chat stream error: {str(e)}")
+            error = {'type': 'error', 'error': 'Sorry, something went wrong. Please try again.'}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # Stop proxies from buffering the stream
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
     """Get conversation history for current session."""
@@ -113,7 +170,11 @@ def health():
     """Health check endpoint for cloud deployment."""
     return jsonify({
         'status': 'healthy',
-        'active_sessions': len(chatbot.sessions)
+        'active_sessions': len(chatbot.sessions),
+        'sessions': chatbot.sessions.stats(),
+        'tool_cache': tool_cache.stats(),
+        'response_cache': response_cache.stats(),
+        'llm': llm_governor.stats()
     })
 
 @app.errorhandler(404)
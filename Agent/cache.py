@@ -0,0 +1,114 @@
+"""Shared, size-bounded TTL cache for tool results."""
+
+import asyncio
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "300"))
+TOOL_CACHE_MAXSIZE = int(os.getenv("TOOL_CACHE_MAXSIZE", "1024"))
+
+
+class TTLCache:
+    """
+    Least recently used cache whose entries also expire after a fixed time.
+    Safe to share across gunicorn threads. Concurrent fetches of the same key
+    on one event loop are coalesced into a single fetch.
+    """
+
+    def __init__(self, maxsize: int = TOOL_CACHE_MAXSIZE, ttl: float = TOOL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> task fetching it
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    # Callers get their own copy, so one session can't alter another's result
+                    return copy.deepcopy(value)
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool] = None) -> Any:
+        """
+        Return the cached value for key, or await fetch() and cache its result.
+        Exceptions from fetch are never cached, and neither is a value that
+        cacheable rejects. Callers asking for a key that is already being
+        fetched wait for that fetch instead of starting another.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or pending.get_loop() is not loop:
+                pending = loop.create_task(self._fetch(key, fetch, cacheable))
+                # Read the exception even when every caller has given up waiting
+                pending.add_done_callback(lambda task: task.cancelled() or task.exception())
+                self._pending[key] = pending
+            else:
+                self.coalesced += 1
+        # A cancelled caller doesn't cancel the fetch others may be waiting on
+        value = await asyncio.shield(pending)
+        return copy.deepcopy(value)
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool] = None) -> Any:
+        try:
+            value = await fetch()
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                if self._pending.get(key) is asyncio.current_task():
+                    del self._pending[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Shared by every tool and session in the process
+tool_cache = TTLCache()
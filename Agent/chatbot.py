@@ -1,7 +1,11 @@
 """Chatbot wrapper"""
 
 from agent import create_agent
-from typing import Dict, Any, List
+from sessions import SessionStore
+from session_backends import get_session_backend
+from deadline import Deadline
+from typing import Dict, Any, List, AsyncIterator, Optional
+import asyncio
 import uuid
 
 class ZUSChatbot:
@@ -12,32 +16,34 @@ class ZUSChatbot:
     
     def __init__(self):
         """Initialize the chatbot with session management."""
-        self.sessions = {}  
+        # Idle sessions expire and the least recently used are evicted,
+        # so long-running workers don't keep every visitor forever.
+        # With SESSION_BACKEND set, sessions are shared between workers
+        self.sessions = SessionStore(create_agent, backend=get_session_backend())
     
     def get_or_create_session(self, session_id: str = None):
         """Get existing session or create a new one."""
         if session_id is None:
             session_id = str(uuid.uuid4())
         
-        if session_id not in self.sessions:
-            self.sessions[session_id] = create_agent(session_id)
-        
-        return session_id, self.sessions[session_id]
+        return session_id, self.sessions.get_or_create(session_id)
     
-    def chat(self, message: str, session_id: str = None) -> Dict[str, Any]:
+    def chat(self, message: str, session_id: str = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Process a chat message.
         
         Args:
             message: User's message
             session_id: Optional session ID (creates new if not provided)
+            deadline: Optional time the reply must be ready by
         
         Returns:
             Dict with response and session info
         """
         session_id, agent = self.get_or_create_session(session_id)
         
-        result = agent.execute(message)
+        result = agent.execute(message, deadline)
+        self.sessions.save(session_id, agent)
         return {
             "session_id": session_id,
             "message": result["response"],
@@ -45,14 +51,37 @@ class ZUSChatbot:
             "success": result["success"]
         }
     
+    async def chat_stream(self, message: str, session_id: str = None, deadline: Optional[Deadline] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a chat message, yielding status and token events as they happen.
+        The last event is {"type": "done"} with the same fields chat returns.
+        """
+        # The session backend does blocking I/O, so keep it off the event loop
+        session_id, agent = await asyncio.to_thread(self.get_or_create_session, session_id)
+        
+        async for event in agent.astream(message, deadline):
+            if event["type"] != "done":
+                yield event
+                continue
+            result = event["result"]
+            await asyncio.to_thread(self.sessions.save, session_id, agent)
+            yield {
+                "type": "done",
+                "session_id": session_id,
+                "message": result["response"],
+                "requires_input": result.get("requires_input", False),
+                "success": result["success"]
+            }
+    
     def get_history(self, session_id: str) -> List[Dict[str, str]]:
         """Get conversation history for a session."""
-        if session_id in self.sessions:
-            return self.sessions[session_id].get_conversation_history()
+        agent = self.sessions.get(session_id)
+        if agent is not None:
+            return agent.get_conversation_history()
         return []
     
     def clear_session(self, session_id: str):
         """Clear a session's history."""
-        if session_id in self.sessions:
-            self.sessions[session_id].clear_history()
-            del self.sessions[session_id]
+        agent = self.sessions.pop(session_id)
+        if agent is not None:
+            agent.clear_history()
@@ -0,0 +1,55 @@
+"""
+Per-turn time budget.
+
+The chat routes start a Deadline for each turn and pass it down through the
+planner, the LLM calls and the tools, so every wait (an LLM slot, an API
+call, a retry) is cut short by the time left for the turn instead of its own
+fixed timeout. API calls send the time left as a header, so the backend can
+stop working on a reply nobody will wait for.
+"""
+
+import math
+import os
+import time
+from typing import Dict, Optional
+
+# Seconds a chat turn may take, from the request arriving to the reply
+TURN_DEADLINE = float(os.getenv("TURN_DEADLINE", "20"))
+
+# Milliseconds the backend has left to answer, see fastapi-backend/app/deadline.py
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+
+class Deadline:
+    """A point in time (on the monotonic clock) by which the turn must finish."""
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def never(cls) -> "Deadline":
+        return cls(math.inf)
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, limit: Optional[float] = None) -> Optional[float]:
+        """A step's own timeout (None for none), shortened to the time left."""
+        remaining = self.remaining()
+        if limit is None:
+            return None if math.isinf(remaining) else remaining
+        return min(limit, remaining)
+
+    def headers(self) -> Dict[str, str]:
+        """The header passing the time left on to the API."""
+        if math.isinf(self.expires_at):
+            return {}
+        return {DEADLINE_HEADER: str(int(self.remaining() * 1000))}
@@ -0,0 +1,141 @@
+"""
+Safe arithmetic evaluator for the calculator tool.
+
+Mirrors fastapi-backend/app/evaluator.py so that local evaluation in the agent
+gives exactly the same results and limits as the /calculator endpoint. The
+Agent is deployed without the backend, so the code is copied rather than
+shared; tests/test_evaluator_parity.py fails if the two drift apart.
+
+Expressions are parsed once into a tree of small Python closures and cached,
+so repeated expressions skip parsing entirely. Only numbers, named variables
+and arithmetic operators are allowed, and every limit below is checked so that
+no input can tie up a worker (e.g. 9**9**9).
+
+Variables let one compiled template be evaluated against many bindings,
+e.g. "price * (1 - discount)" with {"price": 79, "discount": 0.15}.
+"""
+
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Union
+import ast
+import operator
+
+MAX_EXPRESSION_LENGTH = 200
+MAX_NODES = 100
+# Largest absolute value allowed for any operand or intermediate result
+MAX_MAGNITUDE = 1e15
+# Largest absolute exponent allowed for **
+MAX_EXPONENT = 64
+
+Number = Union[int, float]
+CompiledExpression = Callable[[Optional[Dict[str, Number]]], Number]
+
+class EvaluationError(ValueError):
+    """Raised when an expression is not valid arithmetic"""
+    code = "invalid_expression"
+
+class LimitExceededError(EvaluationError):
+    """Raised when an expression exceeds one of the evaluator limits"""
+    code = "limit_exceeded"
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+def _check_magnitude(value: Number) -> Number:
+    """Reject complex results and values outside MAX_MAGNITUDE"""
+    if isinstance(value, complex):
+        raise EvaluationError("Result is not a real number")
+    if abs(value) > MAX_MAGNITUDE:
+        raise LimitExceededError(f"Value exceeds the limit of {MAX_MAGNITUDE:g}")
+    return value
+
+def _power(base: Number, exponent: Number) -> Number:
+    if abs(exponent) > MAX_EXPONENT:
+        raise LimitExceededError(f"Exponent exceeds the limit of {MAX_EXPONENT}")
+    # Operands are already bounded, so this finishes quickly even for ints
+    return _check_magnitude(base ** exponent)
+
+def _compile_node(node: ast.AST) -> CompiledExpression:
+    """Turn an AST node into a closure that evaluates it"""
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = _check_magnitude(node.value)
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+
+        def lookup(env):
+            if not env or name not in env:
+                raise EvaluationError(f"Unknown variable: {name}")
+            value = env[name]
+            if type(value) not in (int, float):
+                raise EvaluationError(f"Variable {name} is not a number")
+            return _check_magnitude(value)
+
+        return lookup
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        op = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda env: op(operand(env))
+
+    if isinstance(node, ast.BinOp):
+        left = _compile_node(node.left)
+        right = _compile_node(node.right)
+        if isinstance(node.op, ast.Pow):
+            return lambda env: _power(left(env), right(env))
+        op = _BINARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise EvaluationError(f"Unsupported operator: {type(node.op).__name__}")
+        return lambda env: _check_magnitude(op(left(env), right(env)))
+
+    raise EvaluationError(f"Unsupported syntax: {type(node).__name__}")
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> CompiledExpression:
+    """
+    Parse and validate an expression, returning a cached compiled form.
+
+    Raises:
+        LimitExceededError: if the expression is too long or too complex
+        EvaluationError: if the expression is not plain arithmetic
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise LimitExceededError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        raise EvaluationError("Expression is not valid arithmetic")
+
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise LimitExceededError(f"Expression has more than {MAX_NODES} parts")
+
+    return _compile_node(tree)
+
+def run(compiled: CompiledExpression, variables: Optional[Dict[str, Number]] = None) -> Number:
+    """Evaluate an already compiled expression with optional variable bindings"""
+    try:
+        return compiled(variables)
+    except ZeroDivisionError:
+        raise EvaluationError("Division by zero")
+    except OverflowError:
+        raise LimitExceededError("Result is too large")
+
+def evaluate(expression: str, variables: Optional[Dict[str, Number]] = None) -> Number:
+    """Evaluate an arithmetic expression within the evaluator limits"""
+    return run(compile_expression(expression), variables)
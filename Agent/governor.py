@@ -0,0 +1,240 @@
+"""
+Admission control for the process's OpenAI calls.
+
+Every planner, summary and compaction call waits here for a slot: at most
+LLM_MAX_CONCURRENCY calls are in flight, the estimated tokens of the calls
+started in the last minute stay within LLM_TOKENS_PER_MINUTE, and waiting
+calls are admitted round-robin across sessions, so one busy conversation
+can't starve the others. A 429 gives the slot back and the call is retried
+with jittered exponential backoff until its deadline, instead of failing
+the conversation on the first one. A call still running at its deadline is
+cancelled with TimeoutError.
+
+The governor lives on the agent's event loop (see runtime.py), so it needs
+no locks.
+"""
+
+import asyncio
+import math
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Optional
+from openai import RateLimitError
+
+# Most OpenAI calls in flight at once
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Token budget per minute, 0 for none
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "150000"))
+# Seconds a call may take, queueing and rate limit retries included
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "30"))
+
+# Completion tokens counted for each call on top of its prompt
+COMPLETION_TOKEN_ESTIMATE = 300
+
+# Backoff after a 429: the first retry waits up to BACKOFF_BASE seconds,
+# doubling with each attempt up to BACKOFF_MAX
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+
+class LLMOverloadedError(Exception):
+    """A call couldn't be admitted, or kept being rate limited, before its deadline."""
+
+
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    """Seconds the API asked us to wait, if it said."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+class LLMGovernor:
+    """Concurrency limit, token bucket and fair queue in front of the LLM."""
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        deadline: float = LLM_CALL_DEADLINE
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.deadline = deadline
+        self._in_flight = 0
+        # The bucket holds up to a minute's budget and refills continuously
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        # session -> waiting (future, tokens), in arrival order; sessions take turns
+        self._queues: "OrderedDict[Hashable, Deque[tuple]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self.admitted = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def estimate_tokens(self, prompt_tokens: int) -> int:
+        return prompt_tokens + COMPLETION_TOKEN_ESTIMATE
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.tokens_per_minute > 0:
+            self._tokens = min(
+                float(self.tokens_per_minute),
+                self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60
+            )
+        self._refilled_at = now
+
+    def _dispatch(self):
+        """Admit waiting calls, one session at a time, while slots and tokens last."""
+        self._refill()
+        while self._queues and self._in_flight < self.max_concurrency:
+            session, queue = next(iter(self._queues.items()))
+            future, tokens = queue[0]
+            if future.done():
+                # Gave up waiting
+                queue.popleft()
+            else:
+                if self.tokens_per_minute > 0 and tokens > self._tokens:
+                    self._schedule_wakeup(tokens - self._tokens)
+                    return
+                queue.popleft()
+                self._tokens -= tokens
+                self._in_flight += 1
+                self.admitted += 1
+                future.set_result(None)
+            # The session goes to the back of the line
+            del self._queues[session]
+            if queue:
+                self._queues[session] = queue
+
+    def _schedule_wakeup(self, missing_tokens: float):
+        if self._wakeup is not None:
+            return
+        delay = missing_tokens * 60 / self.tokens_per_minute
+
+        def wakeup():
+            self._wakeup = None
+            self._dispatch()
+
+        self._wakeup = asyncio.get_running_loop().call_later(delay, wakeup)
+
+    async def _acquire(self, session: Hashable, tokens: int, deadline: float):
+        # A call bigger than the whole budget would otherwise never start
+        if self.tokens_per_minute > 0:
+            tokens = min(tokens, self.tokens_per_minute)
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(session, deque()).append((future, tokens))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LLMOverloadedError("Timed out waiting for an LLM slot") from None
+        except BaseException:
+            # Cancelled just after being admitted
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            if future.cancelled():
+                # Gave up waiting: leave the queue now, not when a slot frees
+                queue = self._queues.get(session)
+                if queue is not None and (future, tokens) in queue:
+                    queue.remove((future, tokens))
+                    if not queue:
+                        del self._queues[session]
+            self._dispatch()
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    async def _backoff(self, error: RateLimitError, attempt: int, deadline: float):
+        """Wait before retrying a rate limited call, or give up if the deadline is too close."""
+        self.rate_limited += 1
+        # Everyone else backs off too: the bucket starts refilling from empty
+        self._refill()
+        self._tokens = min(self._tokens, 0.0)
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        delay = max(delay, _retry_after(error) or 0.0)
+        if time.monotonic() + delay >= deadline:
+            raise error
+        self.retries += 1
+        await asyncio.sleep(delay)
+
+    async def call(self, session: Hashable, prompt_tokens: int, make_call: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        """
+        Await make_call() once admitted, retrying rate limits until the deadline:
+        a time.monotonic() value like the turn's Deadline.expires_at, and at
+        most LLM_CALL_DEADLINE seconds from now.
+        """
+        deadline = min(deadline or math.inf, time.monotonic() + self.deadline)
+        tokens = self.estimate_tokens(prompt_tokens)
+        attempt = 0
+        while True:
+            await self._acquire(session, tokens, deadline)
+            try:
+                return await asyncio.wait_for(make_call(), max(0.0, deadline - time.monotonic()))
+            except RateLimitError as e:
+                error = e
+            finally:
+                self._release()
+            await self._backoff(error, attempt, deadline)
+            attempt += 1
+
+    async def stream(self, session: Hashable, prompt_tokens: int, make_stream: Callable[[], AsyncIterator[Any]], deadline: Optional[float] = None) -> AsyncIterator[Any]:
+        """
+        Like call, for a streamed response. Only a rate limit before the first
+        chunk is retried, since chunks already passed on can't be taken back.
+        """
+        deadline = min(deadline or math.inf, time.monotonic() + self.deadline)
+        tokens = self.estimate_tokens(prompt_tokens)
+        attempt = 0
+        while True:
+            await self._acquire(session, tokens, deadline)
+            started = False
+            try:
+                chunks = make_stream().__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        return
+                    started = True
+                    yield chunk
+            except RateLimitError as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                self._release()
+            await self._backoff(error, attempt, deadline)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        # Called from request threads too, so this only reads
+        tokens = None
+        if self.tokens_per_minute > 0:
+            elapsed = time.monotonic() - self._refilled_at
+            tokens = int(min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60))
+        return {
+            "in_flight": self._in_flight,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "max_concurrency": self.max_concurrency,
+            "tokens_per_minute": self.tokens_per_minute,
+            "tokens_available": tokens,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "rejected": self.rejected
+        }
+
+
+# Shared by every session in the process
+llm_governor = LLMGovernor()
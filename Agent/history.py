@@ -0,0 +1,124 @@
+"""
+Token-budgeted window over a session's conversation history.
+
+The planner gets the system prompt, the most recent whole turns that fit in
+the budget, and the new message, so its input stays the same size however
+long a user chats. Older turns stay in the session's history (and in
+/api/history), they just aren't sent to the planner.
+
+With HISTORY_MODE=summary, long sessions are also compacted: once the turns
+not yet summarized pass a token threshold, the older ones are folded into a
+short memory note in the background, and the planner gets the note in their
+place.
+"""
+
+import logging
+import os
+import threading
+from typing import List, Sequence
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+logger = logging.getLogger(__name__)
+
+# Most tokens in one planner prompt: system prompt, history and the new message
+PLANNER_TOKEN_BUDGET = int(os.getenv("PLANNER_TOKEN_BUDGET", "4000"))
+
+# "window" only sends recent turns, "summary" also compacts older turns into a note
+HISTORY_MODE = os.getenv("HISTORY_MODE", "window")
+# Tokens of not yet summarized history that trigger a compaction
+COMPACTION_THRESHOLD_TOKENS = int(os.getenv("COMPACTION_THRESHOLD_TOKENS", "1500"))
+# Most recent turns left out of the summary, so the planner still sees them verbatim
+COMPACTION_KEEP_TURNS = int(os.getenv("COMPACTION_KEEP_TURNS", "2"))
+
+# Model whose tokenizer is used to count
+TOKENIZER_MODEL = "gpt-4o-mini"
+
+# Tokens the chat format adds around each message
+TOKENS_PER_MESSAGE = 4
+
+# Used when tiktoken can't load its encoding (it downloads it on first use)
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Load the tokenizer once, or None if it isn't available."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+                except Exception as e:
+                    logger.warning(f"tiktoken unavailable, estimating tokens from length: {e}")
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    return TOKENS_PER_MESSAGE + count_tokens(str(message.content))
+
+
+def recent_turns(messages: Sequence[BaseMessage], budget: int) -> List[BaseMessage]:
+    """
+    The most recent whole turns (a user message and the replies after it)
+    that fit in budget tokens, oldest first. Turns are dropped oldest first,
+    and a turn that doesn't fit is dropped whole, never cut in half. The
+    last turn is always kept, even over budget, since a follow-up question
+    is usually about it.
+    """
+    kept: List[BaseMessage] = []
+    turn: List[BaseMessage] = []
+    turn_tokens = 0
+    used = 0
+    for message in reversed(messages):
+        turn.insert(0, message)
+        turn_tokens += count_message_tokens(message)
+        if not isinstance(message, HumanMessage):
+            continue
+        # A turn starts at its user message
+        if kept and used + turn_tokens > budget:
+            break
+        kept[:0] = turn
+        used += turn_tokens
+        turn, turn_tokens = [], 0
+    return kept
+
+
+def compaction_end(messages: Sequence[BaseMessage], start: int, keep_turns: int = COMPACTION_KEEP_TURNS) -> int:
+    """
+    Index up to which messages[start:] should be summarized, or start if not
+    yet: when they pass the threshold, everything but the last keep_turns
+    turns is summarized.
+    """
+    pending = messages[start:]
+    if sum(count_message_tokens(message) for message in pending) <= COMPACTION_THRESHOLD_TOKENS:
+        return start
+    turn_starts = [i for i, message in enumerate(pending) if isinstance(message, HumanMessage)]
+    if len(turn_starts) <= keep_turns:
+        return start
+    return start + turn_starts[-keep_turns] if keep_turns else len(messages)
+
+
+def format_transcript(messages: Sequence[BaseMessage]) -> str:
+    """Write messages out as a plain transcript, without the planner's decisions."""
+    lines = []
+    for message in messages:
+        content = str(message.content)
+        # Text and structured planner decisions
+        if isinstance(message, AIMessage) and content.lstrip().startswith(("INTENT:", '{"intent"')):
+            continue
+        role = "Customer" if isinstance(message, HumanMessage) else "Assistant"
+        lines.append(f"{role}: {content}")
+    return "\n".join(lines)
@@ -0,0 +1,111 @@
+"""Shared, pooled async HTTP client for calling the ZUS Coffee API from the tools."""
+
+import asyncio
+import os
+import random
+import threading
+import weakref
+from typing import Optional
+import httpx
+import requests
+from deadline import Deadline
+
+DEFAULT_API_BASE_URL = "https://zus-coffee-chatbot-api-702670372085.asia-southeast1.run.app"
+
+# Point this at http://localhost:8000 when hosting the API locally
+API_BASE_URL = os.getenv("ZUS_API_BASE_URL", DEFAULT_API_BASE_URL).rstrip("/")
+
+# Idle keep-alive connections kept open to the API
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", os.getenv("GUNICORN_THREADS", "8")))
+# Concurrent requests to the API, shared by every conversation on the event loop
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.2"))
+BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.2"))
+# Gateway errors worth another try. Not 504: the API's deadline middleware
+# answers that once the turn's time is up, so a retry can't finish either
+RETRY_STATUSES = (502, 503)
+
+# One client per event loop, since connections can't move between loops
+_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Get the pooled client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    base_url=API_BASE_URL,
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=POOL_MAXSIZE,
+                    ),
+                    # Retries connection failures only. Gateway errors are
+                    # retried by _request, and only for callers that opt in:
+                    # an outlet query costs an LLM call on the backend, so it
+                    # is never replayed
+                    transport=httpx.AsyncHTTPTransport(retries=MAX_RETRIES),
+                )
+                _clients[loop] = client
+    return client
+
+
+def _translate(e: httpx.HTTPError) -> requests.exceptions.RequestException:
+    """Map httpx errors to the requests exceptions the tools handle."""
+    if isinstance(e, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(e))
+    if isinstance(e, httpx.TransportError):
+        return requests.exceptions.ConnectionError(str(e))
+    if isinstance(e, httpx.HTTPStatusError):
+        return requests.exceptions.HTTPError(str(e))
+    return requests.exceptions.RequestException(str(e))
+
+
+async def _request(method: str, path: str, deadline: Optional[Deadline] = None, retry: bool = False, **kwargs) -> httpx.Response:
+    """
+    Send a request. With retry, for cheap lookups that are safe to repeat,
+    gateway errors are retried with jittered backoff. With a deadline, each
+    attempt's timeout is cut to the time left, the time left is sent to the
+    API as a header, and no retry is started that can't finish.
+    """
+    client = get_client()
+    send = client.get if method == "GET" else client.post
+    timeout = kwargs.get("timeout")
+    headers = kwargs.get("headers", {})
+    for attempt in range(MAX_RETRIES + 1):
+        if deadline is not None:
+            kwargs["timeout"] = deadline.timeout(timeout)
+            kwargs["headers"] = {**headers, **deadline.headers()}
+        try:
+            response = await send(path, **kwargs)
+        except httpx.HTTPError as e:
+            raise _translate(e)
+        if not retry or response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
+        delay = BACKOFF_FACTOR * (2 ** attempt) + random.uniform(0, BACKOFF_JITTER)
+        if deadline is not None and delay >= deadline.remaining():
+            return response
+        await asyncio.sleep(delay)
+
+
+def raise_for_status(response: httpx.Response):
+    """Raise requests.exceptions.HTTPError for 4xx and 5xx responses."""
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise _translate(e)
+
+
+async def get(path: str, deadline: Optional[Deadline] = None, retry: bool = False, **kwargs) -> httpx.Response:
+    """GET an API path through the pooled client, see _request for retry."""
+    return await _request("GET", path, deadline, retry, **kwargs)
+
+
+async def post(path: str, deadline: Optional[Deadline] = None, retry: bool = False, **kwargs) -> httpx.Response:
+    """POST to an API path through the pooled client, see _request for retry."""
+    return await _request("POST", path, deadline, retry, **kwargs)
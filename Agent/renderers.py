@@ -0,0 +1,91 @@
+"""
+Deterministic, brand-voice renderers for tool results.
+
+Product and outlet results are already structured, so they are formatted here
+instead of being sent back to the LLM to be reworded. This saves a second LLM
+call (and its latency) on most turns.
+"""
+
+from typing import Any, Dict, List
+
+# Longest product description shown before it is cut at a word boundary
+MAX_DESCRIPTION_LENGTH = 160
+
+
+def _clean(text: str) -> str:
+    """Replace the narrow and thin spaces in Google's opening hours with plain spaces."""
+    return " ".join(str(text).replace("\u202f", " ").replace("\u2009", " ").split())
+
+
+def _shorten(text: str, limit: int = MAX_DESCRIPTION_LENGTH) -> str:
+    text = _clean(text)
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(",.;:") + "..."
+
+
+def format_hours(operating_hours: str) -> str:
+    """
+    Collapse a weekly schedule into day ranges.
+    "Monday: 9:00 AM – 5:10 PM; ... Saturday: Closed; Sunday: Closed" becomes
+    "Monday–Friday: 9:00 AM – 5:10 PM, Saturday–Sunday: Closed", and a schedule
+    that is the same every day becomes "Daily, 8:00 AM – 9:40 PM".
+    """
+    days = []
+    for entry in _clean(operating_hours).split(";"):
+        day, _, hours = entry.partition(":")
+        if not hours:
+            # Not in "Day: hours" form, show it as it is
+            return _clean(operating_hours)
+        days.append((day.strip(), hours.strip()))
+
+    groups = []
+    for day, hours in days:
+        if groups and groups[-1][2] == hours:
+            groups[-1][1] = day
+        else:
+            groups.append([day, day, hours])
+
+    if len(groups) == 1 and len(days) == 7:
+        return f"Daily, {groups[0][2]}"
+    return ", ".join(
+        f"{first}: {hours}" if first == last else f"{first}–{last}: {hours}"
+        for first, last, hours in groups
+    )
+
+
+def render_products(products: List[Dict[str, Any]]) -> str:
+    """Render product search results as a numbered list."""
+    lines = ["Here's what we found in our drinkware range:", ""]
+    for i, product in enumerate(products, 1):
+        lines.append(f"{i}. **{product.get('name', 'Unknown')}** ({product.get('category', 'Uncategorized')})")
+        lines.append(f"   Price: {product.get('price', 'N/A')}")
+        if product.get("description"):
+            lines.append(f"   {_shorten(product['description'])}")
+        lines.append("")
+    lines.append("You can pick these up at any of our stores or order them from our online shop.")
+    return "\n".join(lines)
+
+
+def render_outlets(outlets: List[Dict[str, Any]], is_nearest: bool = False) -> str:
+    """Render outlet results as a numbered list, with distances for nearest queries."""
+    if is_nearest:
+        lines = ["Here are our closest locations to you:", ""]
+    else:
+        lines = ["Here's where you can find us:", ""]
+
+    for i, outlet in enumerate(outlets, 1):
+        lines.append(f"{i}. **{outlet.get('name', 'Unknown Outlet')}**")
+        if is_nearest and outlet.get("distance_km") is not None:
+            lines.append(f"   {outlet['distance_km']} km away")
+        lines.append(f"   {outlet.get('address') or 'Address unavailable'}")
+        if outlet.get("operating_hours"):
+            lines.append(f"   Operating hours: {format_hours(outlet['operating_hours'])}")
+        else:
+            lines.append("   Operating hours unavailable")
+        if outlet.get("phone"):
+            lines.append(f"   Phone: {outlet['phone']}")
+        lines.append("")
+
+    lines.append("We look forward to serving you!")
+    return "\n".join(lines)
@@ -0,0 +1,205 @@
+"""
+Local intent router in front of the LLM planner.
+
+Some turns always get the same plan: plain arithmetic goes to the calculator,
+greetings and thanks get a friendly reply, and clearly off-topic requests get
+the same redirect. These are recognised here, with rules and a bag-of-words
+nearest-neighbour match against labelled examples, and turned straight into
+a decision in the planner's format. Anything ambiguous returns None and goes
+to the LLM as before. The agent only routes a session's first message, since
+a later one may be a follow-up that only reads right with the history.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from evaluator import EvaluationError, evaluate
+
+# "on" or "off"
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "on")
+
+# How close the nearest example must be, and how far ahead of the nearest
+# example with another label, for the match to be trusted
+MIN_SIMILARITY = 0.75
+MIN_MARGIN = 0.3
+
+GREETING_ANSWER = (
+    "Hello! Welcome to ZUS Coffee. I can help you find our outlets, browse our "
+    "mugs and tumblers, or work out a quick calculation. What can I do for you?"
+)
+THANKS_ANSWER = "You're welcome! Let me know if there's anything else I can help you with at ZUS Coffee."
+OFF_TOPIC_ANSWER = (
+    "Sorry, I can only help with ZUS Coffee, like finding an outlet near you or "
+    "browsing our mugs and tumblers. Is there anything about ZUS Coffee I can help you with?"
+)
+
+GREETINGS = {
+    "hi", "hello", "hey", "hiya", "yo", "hi there", "hello there", "hey there",
+    "good morning", "good afternoon", "good evening", "morning", "hello zus", "hi zus",
+}
+THANKS = {
+    "thanks", "thank you", "thanks a lot", "thank you so much", "thx", "ty",
+    "ok thanks", "okay thanks", "ok thank you", "great thanks", "cool thanks",
+}
+
+# Words that tie a message to ZUS Coffee, so it is never called off-topic here
+DOMAIN_WORDS = {
+    "zus", "coffee", "outlet", "outlets", "store", "stores", "branch", "shop",
+    "location", "near", "nearest", "closest", "nearby", "open", "opening", "close",
+    "closing", "hours", "address", "mug", "mugs", "tumbler", "tumblers", "cup",
+    "cups", "bottle", "drinkware", "product", "products", "price", "buy", "sell",
+    "latte", "drink", "drinks", "menu", "order", "calculate", "discount",
+}
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "whats", "s", "me", "i", "you",
+    "your", "my", "to", "of", "in", "on", "for", "about", "tell", "can", "could",
+    "do", "does", "please", "like", "it", "and", "or", "there", "who", "how",
+    "show", "give", "any", "some", "with", "at", "be", "will", "would",
+}
+
+# Labelled examples, taken from the test conversations plus common off-topic asks.
+# "zus" examples only serve to keep similar looking messages away from "off_topic".
+EXAMPLES: List[Tuple[str, str]] = [
+    ("off_topic", "What's the weather today?"),
+    ("off_topic", "Will it rain tomorrow?"),
+    ("off_topic", "Tell me a joke"),
+    ("off_topic", "Who is the president?"),
+    ("off_topic", "Who won the football match last night?"),
+    ("off_topic", "What's the latest news?"),
+    ("off_topic", "What is the stock price of Apple?"),
+    ("off_topic", "Write me an essay on politics"),
+    ("off_topic", "Translate this sentence into French"),
+    ("off_topic", "Recommend a good movie to watch"),
+    ("off_topic", "What is the capital of France?"),
+    ("off_topic", "Tell me about Starbucks"),
+    ("zus", "Is there an outlet in Petaling Jaya?"),
+    ("zus", "SS 2, what's the opening time?"),
+    ("zus", "And when does it close?"),
+    ("zus", "What time does it open?"),
+    ("zus", "Where is it located?"),
+    ("zus", "I want to visit the SS 2 outlet"),
+    ("zus", "Show me the nearest outlets"),
+    ("zus", "Show me outlets in KL"),
+    ("zus", "What mugs do you have?"),
+    ("zus", "Do you have any tumblers?"),
+    ("zus", "What is 15% of 50?"),
+    ("zus", "Recommend a good gift"),
+    ("zus", "Any gift ideas for a coffee lover?"),
+    ("zus", "Recommend a good one for travel"),
+    ("zus", "Which one is best for travel?"),
+    ("zus", "What about the one in the capital?"),
+    ("zus", "Which is the best one to get?"),
+]
+
+_PERCENT_OF = re.compile(r"(\d+(?:\.\d+)?)\s*%\s*of\s*(\d+(?:\.\d+)?)")
+_WORD_OPERATORS = [
+    (re.compile(r"\bplus\b"), "+"),
+    (re.compile(r"\bminus\b"), "-"),
+    (re.compile(r"\b(?:times|multiplied by)\b"), "*"),
+    (re.compile(r"\bdivided by\b"), "/"),
+    (re.compile(r"(?<=\d)\s*[x×]\s*(?=\d)"), "*"),
+    (re.compile(r"÷"), "/"),
+]
+_MATH_PREFIX = re.compile(r"^(?:what is|what's|whats|how much is|calculate|compute|work out|solve)\s+")
+_ARITHMETIC = re.compile(r"^[\d\s.+\-*/()]*\d[\d\s.+\-*/()]*$")
+# Read as a range, date or fraction ("2-3", "3/4") unless the message asks for a calculation
+_AMBIGUOUS = re.compile(r"^\d+(?:\.\d+)?\s*[-/]\s*\d+(?:\.\d+)?$")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).replace("'", "").split())
+
+
+def _tokens(text: str) -> List[str]:
+    return [word for word in _normalize(text).split() if word not in STOPWORDS]
+
+
+def _vector(tokens: List[str]) -> Dict[str, float]:
+    counts = Counter(tokens)
+    norm = math.sqrt(sum(count * count for count in counts.values()))
+    return {word: count / norm for word, count in counts.items()}
+
+
+_EXAMPLE_VECTORS = [(label, _vector(_tokens(text))) for label, text in EXAMPLES]
+
+
+def _decision(intent: str, action: str, **fields: Any) -> Dict[str, Any]:
+    """A decision in the same shape as AgentPlanner._parse_decision returns"""
+    decision = {
+        "intent": intent,
+        "missing": "none",
+        "action": action,
+        "tool": None,
+        "params": {},
+        "calls": [],
+        "question": "none",
+        "answer": "",
+        "reasoning": "local router",
+    }
+    decision.update(fields)
+    return decision
+
+
+def arithmetic_expression(text: str) -> Optional[str]:
+    """The arithmetic expression a message asks for, if that's all it asks for."""
+    text = text.lower().strip().rstrip("?.! ")
+    expression = _MATH_PREFIX.sub("", text.rstrip("= "))
+    expression = _PERCENT_OF.sub(r"(\2 * \1 / 100)", expression)
+    for pattern, symbol in _WORD_OPERATORS:
+        expression = pattern.sub(symbol, expression)
+    expression = " ".join(expression.split())
+    if not _ARITHMETIC.match(expression) or not re.search(r"\d\s*[-+*/]\s*[\d(]|\)", expression):
+        return None
+    # A trailing "=", a "what is" or a word operator says it's a calculation
+    asked = text.endswith("=") or " ".join(text.split()) != expression
+    if not asked and _AMBIGUOUS.match(expression):
+        return None
+    try:
+        evaluate(expression)
+    except EvaluationError:
+        return None
+    return expression
+
+
+def classify(text: str) -> Optional[str]:
+    """
+    Label a message "off_topic" when it is close to an off-topic example and
+    clearly closer to those than to any ZUS example, or None when unsure.
+    """
+    tokens = _tokens(text)
+    if not tokens or DOMAIN_WORDS.intersection(tokens):
+        return None
+    vector = _vector(tokens)
+    best: Dict[str, float] = {}
+    for label, example in _EXAMPLE_VECTORS:
+        similarity = sum(weight * example.get(word, 0.0) for word, weight in vector.items())
+        best[label] = max(best.get(label, 0.0), similarity)
+    ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    label, score = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    if label == "off_topic" and score >= MIN_SIMILARITY and score - runner_up >= MIN_MARGIN:
+        return label
+    return None
+
+
+def route(user_input: str) -> Optional[Dict[str, Any]]:
+    """A decision for turns that don't need the LLM planner, or None."""
+    expression = arithmetic_expression(user_input)
+    if expression is not None:
+        return _decision(
+            "calculate an arithmetic expression", "use_tool",
+            tool="calculator", params={"expression": expression}
+        )
+
+    normalized = _normalize(user_input)
+    if normalized in GREETINGS:
+        return _decision("greeting", "answer", answer=GREETING_ANSWER)
+    if normalized in THANKS:
+        return _decision("thanks", "answer", answer=THANKS_ANSWER)
+
+    if classify(user_input) == "off_topic":
+        return _decision("off-topic request", "answer", answer=OFF_TOPIC_ANSWER)
+    return None
@@ -0,0 +1,68 @@
+"""
+Process-wide event loop for the agent's async pipeline.
+
+The loop runs in one background thread for the life of the process, so every
+conversation's LLM and API calls share it instead of holding a thread each.
+Synchronous callers (the Flask routes, the tests) submit coroutines with
+run_sync and wait for the result.
+"""
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Get the background event loop, starting it on first use."""
+    global _loop, _thread
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="agent-event-loop",
+                    daemon=True
+                )
+                _thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coroutine: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the background loop and block until it finishes.
+    Must not be called from the loop itself, where it would wait forever.
+    """
+    loop = get_loop()
+    if threading.current_thread() is _thread:
+        coroutine.close()
+        raise RuntimeError("run_sync called from the agent event loop, await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result(timeout)
+
+
+def iterate_sync(iterator: AsyncIterator[Any]) -> Iterator[Any]:
+    """
+    Iterate an async iterator from synchronous code, one item at a time,
+    e.g. to stream events from the background loop out of a Flask response.
+    """
+    loop = get_loop()
+    if threading.current_thread() is _thread:
+        raise RuntimeError("iterate_sync called from the agent event loop, use async for instead")
+    finished = False
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(iterator.__anext__(), loop).result()
+            except StopAsyncIteration:
+                finished = True
+                return
+            yield item
+    finally:
+        # The consumer stopped early (e.g. the client disconnected)
+        if not finished and hasattr(iterator, "aclose"):
+            asyncio.run_coroutine_threadsafe(iterator.aclose(), loop).result()
@@ -0,0 +1,197 @@
+"""
+Semantic cache of final responses to first-turn questions.
+
+Many sessions open with nearly the same question ("where is the nearest
+outlet", "do you sell tumblers"). A first turn whose normalized text is close
+enough to a cached one gets that answer back without any LLM or API call.
+
+Texts are embedded locally as word and character trigram vectors, so a
+lookup costs no network call, and matches must also agree on every
+distinctive word (place names, numbers, what is asked about), so "opening
+hours at KLCC" never returns the answer for "opening hours at KLIA", nor
+"when does KLCC open" the one for "when does KLCC close". Entries expire, the cache is
+size-bounded, and it is cleared when the API reports a new data version.
+"""
+
+import asyncio
+import copy
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Optional
+from router import STOPWORDS
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "512"))
+# Cosine similarity a cached question needs to be reused
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.85"))
+
+# Seconds between checks of the API's data version
+DATA_VERSION_CHECK_INTERVAL = 30
+
+# Words that don't change what is being asked, so they may differ between
+# matches. Normalized, so singular only. Domain words that do change it (open
+# or close, price or hours, mug or tumbler) are left out
+COMMON_WORDS = STOPWORDS | {
+    "zus", "coffee", "outlet", "store", "branch", "shop", "location", "product", "sell",
+    "where", "when", "which", "have", "has", "got", "we", "time", "find", "get",
+    "want", "need", "know", "located", "list", "all", "much", "many", "hi", "hey",
+    "hello", "one", "ones", "currently", "today", "now", "right", "good", "best",
+    "locate", "way", "here", "yours", "our", "us", "sale",
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and plural s, collapse whitespace."""
+    words = re.sub(r"[^\w\s]", " ", text.lower().replace("'", "")).split()
+    return " ".join(word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words)
+
+
+def embed(text: str) -> Dict[str, float]:
+    """Sparse unit vector of the words and character trigrams of normalized text, minus stopwords."""
+    words = [word for word in text.split() if word not in STOPWORDS]
+    features = Counter(words)
+    padded = f" {' '.join(words)} "
+    features.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    norm = math.sqrt(sum(count * count for count in features.values())) or 1.0
+    return {feature: count / norm for feature, count in features.items()}
+
+
+def _key_terms(text: str) -> FrozenSet[str]:
+    return frozenset(word for word in text.split() if word not in COMMON_WORDS)
+
+
+def _similarity(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(feature, 0.0) for feature, weight in a.items())
+
+
+class SemanticCache:
+    """
+    Least recently used cache of responses keyed by question similarity, whose
+    entries also expire after a fixed time. Safe to share across gunicorn threads.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = RESPONSE_CACHE_MAXSIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        threshold: float = RESPONSE_CACHE_THRESHOLD
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        # (namespace, normalized text) -> (expires at, vector, key terms, value)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.data_version: Optional[str] = None
+        self._version_checked_at = 0.0
+        # The background version check in flight, see refresh_data_version
+        self._version_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, text: str, namespace: Hashable = None) -> Optional[Any]:
+        """The cached value for the most similar question in namespace, or None."""
+        normalized = normalize(text)
+        vector = embed(normalized)
+        key_terms = _key_terms(normalized)
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for key, (expires_at, cached_vector, cached_terms, _) in list(self._entries.items()):
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                if key[0] != namespace or cached_terms != key_terms:
+                    continue
+                score = _similarity(vector, cached_vector)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            # Callers get their own copy, so one session can't alter another's result
+            return copy.deepcopy(self._entries[best_key][3])
+
+    def set(self, text: str, value: Any, namespace: Hashable = None):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        normalized = normalize(text)
+        entry = (time.monotonic() + self.ttl, embed(normalized), _key_terms(normalized), copy.deepcopy(value))
+        with self._lock:
+            self._entries[(namespace, normalized)] = entry
+            self._entries.move_to_end((namespace, normalized))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def check_data_version(self, fetch_version: Callable[[], Awaitable[str]]) -> bool:
+        """
+        Every DATA_VERSION_CHECK_INTERVAL seconds, fetch the API's data version
+        and clear the cache if it changed. Returns True when it did.
+        """
+        now = time.monotonic()
+        if now - self._version_checked_at < DATA_VERSION_CHECK_INTERVAL:
+            return False
+        self._version_checked_at = now
+        try:
+            version = await fetch_version()
+        except Exception:
+            # Keep serving until the API can be asked again
+            return False
+        previous, self.data_version = self.data_version, version
+        if previous is None or previous == version:
+            return False
+        self.clear()
+        self.invalidations += 1
+        return True
+
+    def refresh_data_version(self, fetch_version: Callable[[], Awaitable[str]], on_change: Optional[Callable[[], Any]] = None):
+        """
+        Run check_data_version in the background on the running loop, calling
+        on_change if it cleared the cache, so a slow API never holds up the
+        caller, which goes on with the answers cached so far.
+        """
+        if time.monotonic() - self._version_checked_at < DATA_VERSION_CHECK_INTERVAL:
+            return
+        if self._version_task is not None and not self._version_task.done():
+            return
+
+        async def refresh():
+            if await self.check_data_version(fetch_version) and on_change is not None:
+                on_change()
+
+        self._version_task = asyncio.get_running_loop().create_task(refresh())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "threshold": self.threshold,
+                "data_version": self.data_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Shared by every session in the process
+response_cache = SemanticCache()
@@ -0,0 +1,182 @@
+"""
+Backends that keep chat sessions outside a single worker's memory.
+
+With several gunicorn workers (or instances), a user's next message can land
+on a worker that has never seen their session. A backend stores each
+session's history and context, so any worker can rehydrate the agent on first
+access. SESSION_BACKEND selects it: "memory" (the default) keeps sessions in
+the worker only, "sqlite" shares them between the workers on one machine
+through a SQLite database in WAL mode.
+
+A backend implements four methods:
+    version(session_id) -> the stored version, or None if there is none
+    load(session_id) -> (version, data), or None
+    save(session_id, data) -> the new version
+    delete(session_id)
+where data is the compressed bytes from serialize_session. A Redis-compatible
+backend can implement the same methods for sessions shared across machines.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Optional, Tuple
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# "memory" or "sqlite"
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = Path(os.getenv("SESSION_DB_PATH", Path(__file__).resolve().parent / "sessions.db"))
+
+# Sessions idle for longer than this many seconds are dropped, in memory and stored
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+
+# How often, in seconds, a worker deletes idle sessions from the database
+PURGE_INTERVAL = 60
+
+# The SQLite schema, one step per version: _MIGRATIONS[n] takes a database
+# from version n to n + 1. The version is kept in PRAGMA user_version, so
+# append a step here to change the schema, never edit an applied one.
+_MIGRATIONS = [
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    "session_id TEXT PRIMARY KEY, "
+    "version INTEGER NOT NULL, "
+    "updated_at REAL NOT NULL, "
+    "data BLOB NOT NULL)",
+]
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+_MESSAGE_TYPES = {
+    "human": HumanMessage,
+    "ai": AIMessage,
+    "system": SystemMessage,
+}
+
+
+def serialize_session(agent: Any) -> bytes:
+    """Pack an agent's history, context and memory note into compact, compressed JSON."""
+    state = {
+        "h": [[message.type, message.content] for message in agent.history.messages],
+        "c": agent.context,
+        "n": agent.memory_note,
+        "k": agent.compacted_count,
+    }
+    return zlib.compress(json.dumps(state, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def restore_session(agent: Any, data: bytes):
+    """Replace an agent's history, context and memory note with a serialized session's."""
+    state = json.loads(zlib.decompress(data).decode("utf-8"))
+    agent.history.clear()
+    agent.history.add_messages([
+        _MESSAGE_TYPES[message_type](content=content)
+        for message_type, content in state["h"]
+    ])
+    agent.context = state["c"]
+    agent.memory_note = state.get("n", "")
+    agent.compacted_count = state.get("k", 0)
+
+
+class SqliteSessionBackend:
+    """
+    Sessions in a local SQLite database, shared by every worker on the machine.
+    WAL mode lets workers read while another one writes.
+    """
+
+    def __init__(self, path: Path = SESSION_DB_PATH, ttl: float = SESSION_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        # sqlite3 connections can't be shared between threads
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._migrate(connection)
+            self._local.connection = connection
+        return connection
+
+    def _migrate(self, connection: sqlite3.Connection):
+        """Bring the database up to SCHEMA_VERSION, or refuse one written by newer code."""
+        with connection:
+            # Taking the write lock first means only one worker migrates
+            connection.execute("BEGIN IMMEDIATE")
+            current = connection.execute("PRAGMA user_version").fetchone()[0]
+            if current > SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"Session database {self.path} has schema version {current}, "
+                    f"newer than this code's {SCHEMA_VERSION}"
+                )
+            for statement in _MIGRATIONS[current:]:
+                connection.execute(statement)
+            if current < SCHEMA_VERSION:
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def version(self, session_id: str) -> Optional[int]:
+        row = self._connect().execute(
+            "SELECT version FROM sessions WHERE session_id = ? AND updated_at >= ?",
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        row = self._connect().execute(
+            "SELECT version, data FROM sessions WHERE session_id = ? AND updated_at >= ?",
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save(self, session_id: str, data: bytes) -> int:
+        connection = self._connect()
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT INTO sessions (session_id, version, updated_at, data) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET "
+                "version = version + 1, updated_at = excluded.updated_at, data = excluded.data",
+                (session_id, now, data)
+            )
+            version = connection.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+        if now - self._last_purge > PURGE_INTERVAL:
+            self._last_purge = now
+            self.purge()
+        return version
+
+    def delete(self, session_id: str):
+        self._connect().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge(self) -> int:
+        """Delete sessions idle for longer than the TTL and return how many there were."""
+        cursor = self._connect().execute(
+            "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,)
+        )
+        return cursor.rowcount
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_session_backend():
+    """Get the process-wide backend selected by SESSION_BACKEND, or None for "memory"."""
+    global _backend
+    if SESSION_BACKEND == "memory":
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if SESSION_BACKEND == "sqlite":
+                    _backend = SqliteSessionBackend()
+                else:
+                    raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+    return _backend
@@ -0,0 +1,152 @@
+"""
+Bounded store for chat sessions, with idle expiry and LRU eviction.
+
+With a session backend (see session_backends), sessions are also saved after
+every turn and rehydrated on first access, so they survive moving between
+workers.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from session_backends import SESSION_TTL, restore_session, serialize_session
+
+# Most sessions kept at once, the least recently used go first
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+
+# Rough fixed cost of an agent and its history objects, before any messages
+SESSION_BASE_BYTES = 2048
+
+
+def estimate_session_bytes(agent: Any) -> int:
+    """
+    Roughly estimate the memory one session holds: its messages and context.
+    Good enough to spot growth, not an exact measurement.
+    """
+    size = SESSION_BASE_BYTES
+    history = getattr(agent, "history", None)
+    if history is not None:
+        size += sum(sys.getsizeof(message.content) for message in history.messages)
+    context = getattr(agent, "context", None)
+    if context:
+        size += sys.getsizeof(json.dumps(context, default=str))
+    size += sys.getsizeof(getattr(agent, "memory_note", ""))
+    return size
+
+
+class SessionStore:
+    """
+    Sessions by id, dropped once idle for ttl seconds, or least recently used
+    first once there are more than maxsize. Safe to share across gunicorn threads.
+    
+    With a backend, the stored version is checked on every access, and a
+    session that another worker has changed since is reloaded from it.
+    """
+
+    def __init__(self, create: Callable[[str], Any], maxsize: int = SESSION_MAX_COUNT, ttl: float = SESSION_TTL, backend: Any = None):
+        # Builds a new, empty agent for a session id
+        self.create = create
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        # session id -> (last used, agent, stored version), least recently used first
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+        self.rehydrated = 0
+
+    def _expire(self, now: float):
+        """Drop idle sessions. They are in order of last use, so stop at the first live one."""
+        while self._sessions:
+            last_used = next(iter(self._sessions.values()))[0]
+            if now - last_used <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def _put(self, session_id: str, agent: Any, version: Optional[int]):
+        """Add or refresh a session as the most recently used. Call with the lock held."""
+        self._sessions[session_id] = (time.monotonic(), agent, version)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.maxsize:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, session_id: str, create_missing: bool = False) -> Optional[Any]:
+        """
+        Get a session's agent and mark it used. A session that isn't in memory
+        (or is stale) is rehydrated from the backend. A session that doesn't
+        exist at all is created if create_missing is set, or else None is returned.
+        """
+        # The backend is read outside the lock, so workers' threads don't queue on disk
+        version = self.backend.version(session_id) if self.backend else None
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry[2] == version:
+                self._put(session_id, entry[1], version)
+                return entry[1]
+
+        stored = self.backend.load(session_id) if self.backend and version is not None else None
+        if stored is None and not create_missing:
+            return None
+        agent = self.create(session_id)
+        if stored is not None:
+            version, data = stored
+            restore_session(agent, data)
+        else:
+            version = None
+
+        with self._lock:
+            if stored is not None:
+                self.rehydrated += 1
+            self._put(session_id, agent, version)
+        return agent
+
+    def get_or_create(self, session_id: str) -> Any:
+        return self.get(session_id, create_missing=True)
+
+    def save(self, session_id: str, agent: Any):
+        """Store a session's history and context in the backend, after a turn."""
+        if self.backend is None:
+            return
+        version = self.backend.save(session_id, serialize_session(agent))
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry[1] is agent:
+                self._sessions[session_id] = (entry[0], agent, version)
+
+    def pop(self, session_id: str) -> Optional[Any]:
+        if self.backend is not None:
+            self.backend.delete(session_id)
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            return entry[1] if entry is not None else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.monotonic())
+            agents = [entry[1] for entry in self._sessions.values()]
+            expired, evicted, rehydrated = self.expired, self.evicted, self.rehydrated
+        estimated_bytes = sum(estimate_session_bytes(agent) for agent in agents)
+        return {
+            "size": len(agents),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "expired": expired,
+            "evicted": evicted,
+            "rehydrated": rehydrated,
+            "backend": type(self.backend).__name__ if self.backend else "memory",
+            "estimated_bytes": estimated_bytes,
+            "average_session_bytes": estimated_bytes // len(agents) if agents else 0
+        }
@@ -60,11 +60,7 @@
                 // User messages: plain text
                 contentDiv.textContent = content;
             } else {
-                // Bot messages: format markdown and preserve line breaks
-                let formatted = content
-                    .replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>')
-                    .replace(/\n/g, '<br>');
-                contentDiv.innerHTML = formatted;
+                contentDiv.innerHTML = formatBotMessage(content);
             }
             
             messageDiv.appendChild(contentDiv);
@@ -72,17 +68,33 @@
             
             // Scroll to bottom
             chatMessages.scrollTop = chatMessages.scrollHeight;
+            return contentDiv;
+        }
+
+        function formatBotMessage(content) {
+            // Bot messages: format markdown and preserve line breaks
+            return content
+                .replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>')
+                .replace(/\n/g, '<br>');
         }
 
         function showTypingIndicator() {
             const indicator = document.createElement('div');
             indicator.className = 'message bot';
             indicator.id = 'typingIndicator';
-            indicator.innerHTML = '<div class="typing-indicator active"><span></span><span></span><span></span></div>';
+            indicator.innerHTML = '<div class="typing-indicator active"><span></span><span></span><span></span></div><div class="typing-status"></div>';
             chatMessages.appendChild(indicator);
             chatMessages.scrollTop = chatMessages.scrollHeight;
         }
 
+        function showStatus(text) {
+            // e.g. "Searching outlets..." while the agent works
+            const status = document.querySelector('#typingIndicator .typing-status');
+            if (status) {
+                status.textContent = text;
+            }
+        }
+
         function hideTypingIndicator() {
             const indicator = document.getElementById('typingIndicator');
             if (indicator) {
@@ -107,7 +119,7 @@
             showTypingIndicator();
             
             try {
-                const response = await fetch('/api/chat', {
+                const response = await fetch('/api/chat/stream', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
@@ -118,16 +130,12 @@
                     })
                 });
                 
-                const data = await response.json();
-                
-                hideTypingIndicator();
-                
-                if (data.success) {
-                    addMessage(data.message, false);
-                } else {
-                    addMessage('Sorry, something went wrong. Please try again.', false);
+                if (!response.ok || !response.body) {
+                    throw new Error(`HTTP ${response.status}`);
                 }
                 
+                await readEventStream(response.body);
+                
             } catch (error) {
                 hideTypingIndicator();
                 addMessage('Connection error. Please check your internet and try again.', false);
@@ -140,6 +148,69 @@
             }
         }
 
+        async function readEventStream(body) {
+            // Render a Server-Sent Events reply as it arrives: status events
+            // update the typing indicator, tokens are appended to the message
+            const reader = body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let text = '';
+            let contentDiv = null;
+            let finished = false;
+            
+            const handleEvent = (type, data) => {
+                if (type === 'status') {
+                    showStatus(data.message);
+                } else if (type === 'token') {
+                    if (!contentDiv) {
+                        hideTypingIndicator();
+                        contentDiv = addMessage('', false);
+                    }
+                    text += data.text;
+                    contentDiv.innerHTML = formatBotMessage(text);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (type === 'done') {
+                    finished = true;
+                    hideTypingIndicator();
+                    // The final message is authoritative over the streamed tokens
+                    if (contentDiv) {
+                        contentDiv.innerHTML = formatBotMessage(data.message);
+                    } else {
+                        addMessage(data.message, false);
+                    }
+                } else if (type === 'error') {
+                    finished = true;
+                    hideTypingIndicator();
+                    addMessage('Sorry, something went wrong. Please try again.', false);
+                }
+            };
+            
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let type = 'message';
+                    let data = '';
+                    for (const line of rawEvent.split('\n')) {
+                        if (line.startsWith('event: ')) type = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    }
+                    if (data) handleEvent(type, JSON.parse(data));
+                }
+            }
+            
+            if (!finished) {
+                throw new Error('Stream ended before the reply finished');
+            }
+        }
+
         async function clearConversation() {
             if (!confirm('Are you sure you want to clear the conversation?')) {
                 return;
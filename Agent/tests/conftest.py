@@ -0,0 +1,136 @@
+"""Offline stand-ins for the LLM and the ZUS Coffee API, for tests that build agents."""
+
+import asyncio
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+import agent as agent_module
+import transports
+from cache import tool_cache
+from semantic_cache import response_cache
+
+
+# What the fake API finds for any product search
+PRODUCTS = [{"name": "ZUS All-Can Tumbler", "price": "RM 79.00", "category": "Tumbler"}]
+
+
+def decision_text(action="answer", tool="none", params="none", answer="none"):
+    """A planner reply in the text format _parse_decision reads."""
+    return (
+        "INTENT: test\n"
+        "MISSING: none\n"
+        f"ACTION: {action}\n"
+        f"TOOL: {tool}\n"
+        f"PARAMS: {params}\n"
+        "CALLS: none\n"
+        "QUESTION: none\n"
+        f"ANSWER: {answer}\n"
+        "REASONING: test"
+    )
+
+
+class FakeChain:
+    """
+    Planner chain that replies with canned decisions and records its inputs.
+    A reply that is an exception is raised instead.
+    """
+
+    def __init__(self):
+        self.replies = []
+        self.inputs = []
+        # Set to make the planner take this long to decide
+        self.delay = 0.0
+
+    async def ainvoke(self, inputs, *args, **kwargs):
+        self.inputs.append(inputs)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return AIMessage(content=reply)
+
+
+class FakeTransport:
+    """
+    Answers like the API, recording each call as (method, first argument)
+    and the deadline it was given.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.deadlines = []
+        self.version = "v1"
+        # Set to make every lookup fail with this exception
+        self.error = None
+        # Set to make every lookup take this long
+        self.delay = 0.0
+        # Set to make the data version take this long to fetch
+        self.version_delay = 0.0
+
+    async def _lookup(self, method, argument, deadline, result):
+        self.calls.append((method, argument))
+        self.deadlines.append(deadline)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return result
+
+    async def search_products(self, query, top_k=3, deadline=None):
+        return await self._lookup("search_products", query, deadline, {
+            "success": True,
+            "count": len(PRODUCTS),
+            "products": PRODUCTS
+        })
+
+    async def query_outlets(self, query, deadline=None):
+        return await self._lookup("query_outlets", query, deadline, {
+            "success": True,
+            "count": 1,
+            "results": [{"name": "ZUS Coffee SS2", "address": "SS2, Petaling Jaya", "operating_hours": "8am-10pm"}]
+        })
+
+    async def nearest_outlets(self, latitude, longitude, limit=3, deadline=None):
+        return await self._lookup("nearest_outlets", (latitude, longitude), deadline, {"success": True, "count": 0, "results": []})
+
+    async def calculate(self, expression, deadline=None):
+        return await self._lookup("calculate", expression, deadline, {"success": True, "result": 0})
+
+    async def data_version(self):
+        if self.version_delay:
+            await asyncio.sleep(self.version_delay)
+        return self.version
+
+
+@pytest.fixture
+def fake_chain(monkeypatch):
+    chain = FakeChain()
+    monkeypatch.setattr(agent_module, "get_planner_chain", lambda mode=None: chain)
+    return chain
+
+
+@pytest.fixture
+def fake_transport(monkeypatch):
+    transport = FakeTransport()
+    monkeypatch.setattr(transports, "_transport", transport)
+    return transport
+
+
+@pytest.fixture
+def offline_agent(monkeypatch, fake_chain, fake_transport):
+    """Build agents whose planner, LLM and API are all fakes, with empty caches."""
+    monkeypatch.setattr(agent_module, "get_llm", lambda: FakeListChatModel(responses=["Summary."]))
+    tool_cache.clear()
+    response_cache.clear()
+    def create(session_id="test_session", summary_mode="template"):
+        return agent_module.create_agent(session_id, summary_mode=summary_mode)
+
+    yield create
+    tool_cache.clear()
+    response_cache.clear()
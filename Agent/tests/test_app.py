@@ -0,0 +1,46 @@
+"""Test cases for the Flask routes' handling of bad chat requests."""
+
+import importlib.util
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app.py'))
+
+# Loaded from its file, since the backend package is also called "app"
+_spec = importlib.util.spec_from_file_location("agent_app", APP_PATH)
+agent_app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(agent_app)
+
+
+@pytest.fixture
+def client():
+    """Test client for the chat app; bad requests are answered before any agent is made."""
+    agent_app.app.config['TESTING'] = True
+    return agent_app.app.test_client()
+
+
+@pytest.mark.parametrize("route", ['/api/chat', '/api/chat/stream'])
+@pytest.mark.parametrize("kwargs", [
+    {'data': 'not json', 'content_type': 'text/plain'},
+    {'data': '{"message": ', 'content_type': 'application/json'},
+    {'json': ['hello']},
+    {'json': {}},
+    {'json': {'message': '   '}},
+])
+def test_bad_body_gets_json_error(client, route, kwargs):
+    response = client.post(route, **kwargs)
+
+    assert response.status_code == 400
+    assert response.is_json
+    assert response.get_json() == {'error': 'Message is required'}
+
+
+def test_stream_unexpected_error_gets_json_error(client):
+    response = client.post('/api/chat/stream', json={'message': 42})
+
+    assert response.status_code == 500
+    assert response.is_json
+    assert response.get_json()['success'] is False
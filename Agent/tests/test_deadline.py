@@ -0,0 +1,217 @@
+"""Test cases for passing the turn's deadline down to the LLM and API calls."""
+
+import asyncio
+import contextlib
+import math
+import time
+import types
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import requests
+import http_client
+from deadline import DEADLINE_HEADER, Deadline
+from renderers import render_products
+from transports import HttpTransport, InProcessTransport
+from conftest import PRODUCTS, decision_text
+
+MUG_DECISION = decision_text(action="use_tool", tool="product_search", params='{"query": "mug"}')
+
+
+def test_never():
+    deadline = Deadline.never()
+
+    assert math.isinf(deadline.remaining())
+    assert not deadline.expired()
+    assert deadline.timeout() is None
+    assert deadline.timeout(5) == 5
+    assert deadline.headers() == {}
+
+
+def test_after():
+    deadline = Deadline.after(2)
+
+    assert 1.5 < deadline.remaining() <= 2
+    assert deadline.timeout(1) == 1
+    assert 1.5 < deadline.timeout(10) <= 2
+    assert 1500 < int(deadline.headers()[DEADLINE_HEADER]) <= 2000
+
+
+def test_expired():
+    deadline = Deadline(time.monotonic() - 1)
+
+    assert deadline.remaining() == 0
+    assert deadline.expired()
+    assert deadline.timeout(5) == 0
+    assert deadline.headers() == {DEADLINE_HEADER: "0"}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Route the pooled client to a fake API; its replies are popped from api.statuses."""
+    api = types.SimpleNamespace(requests=[], statuses=[])
+
+    def handler(request):
+        api.requests.append(request)
+        status = api.statuses.pop(0) if api.statuses else 200
+        return httpx.Response(status, json={"success": True, "count": 0, "products": []})
+
+    def get_client():
+        return httpx.AsyncClient(base_url="http://api.test", transport=httpx.MockTransport(handler))
+
+    monkeypatch.setattr(http_client, "get_client", get_client)
+    return api
+
+
+def test_request_without_deadline(api):
+    asyncio.run(http_client.get("/products/", timeout=10))
+
+    [request] = api.requests
+    assert DEADLINE_HEADER not in request.headers
+    assert request.extensions["timeout"]["read"] == 10
+
+
+def test_request_sends_time_left_and_shortens_timeout(api):
+    asyncio.run(http_client.get("/products/", timeout=10, deadline=Deadline.after(2), headers={"X-Test": "1"}))
+
+    [request] = api.requests
+    assert 1500 < int(request.headers[DEADLINE_HEADER]) <= 2000
+    assert request.headers["X-Test"] == "1"
+    assert request.extensions["timeout"]["read"] <= 2
+
+
+def test_retry_sends_updated_time_left(api, monkeypatch):
+    monkeypatch.setattr(http_client, "BACKOFF_FACTOR", 0.05)
+    monkeypatch.setattr(http_client, "BACKOFF_JITTER", 0)
+    api.statuses = [503]
+
+    response = asyncio.run(http_client.get("/products/", timeout=10, deadline=Deadline.after(5), retry=True))
+
+    assert response.status_code == 200
+    first, second = (int(request.headers[DEADLINE_HEADER]) for request in api.requests)
+    assert second <= first - 50
+
+
+def test_no_retry_that_cannot_finish(api, monkeypatch):
+    monkeypatch.setattr(http_client, "BACKOFF_FACTOR", 1.0)
+    api.statuses = [503]
+
+    response = asyncio.run(http_client.get("/products/", timeout=10, deadline=Deadline.after(0.5), retry=True))
+
+    assert response.status_code == 503
+    assert len(api.requests) == 1
+
+
+@pytest.mark.parametrize("retry, status", [(False, 503), (True, 504)], ids=["not_opted_in", "deadline_spent"])
+def test_no_retry(api, monkeypatch, retry, status):
+    monkeypatch.setattr(http_client, "BACKOFF_FACTOR", 0)
+    api.statuses = [status]
+
+    response = asyncio.run(http_client.get("/products/", timeout=10, retry=retry))
+
+    assert response.status_code == status
+    assert len(api.requests) == 1
+
+
+def test_http_transport_retries_only_safe_lookups(api, monkeypatch):
+    monkeypatch.setattr(http_client, "BACKOFF_FACTOR", 0)
+    monkeypatch.setattr(http_client, "BACKOFF_JITTER", 0)
+    transport = HttpTransport()
+
+    api.statuses = [503]
+    asyncio.run(transport.search_products("mug"))
+    assert len(api.requests) == 2
+
+    # Outlet queries cost the backend an LLM call, so they're never replayed
+    for lookup in (lambda: transport.query_outlets("outlets in SS2"), lambda: transport.nearest_outlets(3.1, 101.6)):
+        api.requests.clear()
+        api.statuses = [503]
+        with pytest.raises(requests.exceptions.HTTPError):
+            asyncio.run(lookup())
+        assert len(api.requests) == 1
+
+
+def test_http_transport_passes_the_deadline(api):
+    asyncio.run(HttpTransport().search_products("mug", 3, Deadline.after(2)))
+
+    [request] = api.requests
+    assert request.url.params["query"] == "mug"
+    assert DEADLINE_HEADER in request.headers
+
+
+def _in_process_transport(search):
+    """An InProcessTransport whose backend is a stand-in, recording the budget it gets."""
+    budgets = []
+
+    @contextlib.contextmanager
+    def request_deadline(seconds):
+        budgets.append(seconds)
+        yield
+
+    transport = InProcessTransport()
+    routers = {
+        "products": types.SimpleNamespace(search=search),
+        "deadline": types.SimpleNamespace(request_deadline=request_deadline),
+    }
+    transport._load = lambda: routers
+    return transport, budgets
+
+
+def test_in_process_transport_passes_the_budget():
+    transport, budgets = _in_process_transport(lambda query, top_k: {"count": 0, "products": []})
+
+    assert asyncio.run(transport.search_products("mug", 3, Deadline.after(2))) == {"count": 0, "products": []}
+    assert asyncio.run(transport.search_products("mug", 3)) == {"count": 0, "products": []}
+    # Only the call with a deadline sets one for the backend
+    [budget] = budgets
+    assert 1.5 < budget <= 2
+
+
+def test_in_process_transport_stops_waiting_at_the_deadline():
+    transport, _ = _in_process_transport(lambda query, top_k: time.sleep(0.5))
+
+    async def search():
+        started = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout):
+            await transport.search_products("mug", 3, Deadline.after(0.05))
+        # The backend's thread is left to finish on its own
+        return time.monotonic() - started
+
+    assert asyncio.run(search()) < 0.5
+
+
+def test_agent_passes_the_deadline_to_tools(offline_agent, fake_chain, fake_transport):
+    fake_chain.replies = [MUG_DECISION]
+    deadline = Deadline.after(30)
+
+    offline_agent().execute("Do you sell mugs?", deadline)
+
+    assert fake_transport.deadlines == [deadline]
+
+
+def test_summary_is_skipped_when_time_is_short(offline_agent, fake_chain, fake_transport):
+    fake_chain.replies = [MUG_DECISION, MUG_DECISION]
+    agent = offline_agent(summary_mode="llm")
+
+    with_time = agent.execute("Do you sell mugs?", Deadline.after(30))
+    short_of_time = agent.execute("Do you sell mugs?", Deadline.after(2))
+
+    assert with_time["response"] == "Summary."
+    # Rendered from the same results instead of waiting for the LLM
+    assert short_of_time["response"] == render_products(PRODUCTS)
+
+
+def test_planner_past_the_deadline(offline_agent, fake_chain):
+    fake_chain.delay = 1.0
+    fake_chain.replies = [MUG_DECISION]
+
+    started = time.monotonic()
+    result = offline_agent().execute("Do you sell mugs?", Deadline.after(0.1))
+
+    assert result["error"] == "deadline"
+    assert result["success"] is False
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,69 @@
+"""Test that the agent's local evaluator matches the backend's calculator exactly."""
+
+import importlib.util
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import evaluator as agent_evaluator
+
+BACKEND_EVALUATOR = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..', '..', 'fastapi-backend', 'app', 'evaluator.py'
+))
+
+# Loaded from its file, since the backend package is called "app" like the Agent's app.py
+_spec = importlib.util.spec_from_file_location("backend_evaluator", BACKEND_EVALUATOR)
+backend_evaluator = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(backend_evaluator)
+
+CORPUS = [
+    ("1 + 2 * 3", None),
+    ("(50 * 15 / 100)", None),
+    ("7 // 2 + 7 % 4 - -1", None),
+    ("2 ** -2", None),
+    ("0.1 + 0.2", None),
+    ("price * (1 - discount)", {"price": 79, "discount": 0.15}),
+    ("price * 2", None),
+    ("price * 2", {"price": "79"}),
+    ("1 / 0", None),
+    ("5 % 0", None),
+    ("(-8) ** 0.5", None),
+    ("2 ** 65", None),
+    ("9 ** 9 ** 9", None),
+    ("10 ** 15 * 10", None),
+    ("+".join(["1"] * 40), None),
+    ("1+" * 120 + "1", None),
+    ("abs(-1)", None),
+    ("__import__('os')", None),
+    ("(1).real", None),
+    ("True + 1", None),
+    ("1 < 2", None),
+    ("1 +", None),
+    ("", None),
+]
+
+
+def _outcome(module, expression, variables):
+    try:
+        return ("ok", module.evaluate(expression, variables))
+    except module.EvaluationError as e:
+        return (type(e).__name__, e.code, str(e))
+
+
+def test_limits_match():
+    for name in ("MAX_EXPRESSION_LENGTH", "MAX_NODES", "MAX_MAGNITUDE", "MAX_EXPONENT"):
+        assert getattr(agent_evaluator, name) == getattr(backend_evaluator, name), name
+
+
+@pytest.mark.parametrize("expression, variables", CORPUS)
+def test_same_results_and_errors(expression, variables):
+    assert _outcome(agent_evaluator, expression, variables) == _outcome(backend_evaluator, expression, variables)
+
+
+def test_same_code_apart_from_docstring():
+    with open(agent_evaluator.__file__) as agent_file, open(BACKEND_EVALUATOR) as backend_file:
+        agent_code = agent_file.read().split('"""', 2)[2]
+        backend_code = backend_file.read().split('"""', 2)[2]
+    assert agent_code == backend_code
@@ -0,0 +1,280 @@
+"""Test cases for admission control in front of the LLM."""
+
+import asyncio
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from openai import RateLimitError
+import governor
+from governor import LLMGovernor, LLMOverloadedError
+
+
+def _rate_limit_error(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+@pytest.fixture
+def jitter(monkeypatch):
+    """Record each backoff's upper bound, and wait a hundredth of it."""
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append(high)
+        return high / 100
+
+    monkeypatch.setattr(governor.random, "uniform", uniform)
+    return bounds
+
+
+class Tracker:
+    """make_call factory that records the order calls start in and how many overlap."""
+
+    def __init__(self, duration=0.02):
+        self.duration = duration
+        self.started = []
+        self.running = 0
+        self.peak = 0
+
+    def call(self, tag):
+        async def make_call():
+            self.started.append(tag)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            try:
+                await asyncio.sleep(self.duration)
+            finally:
+                self.running -= 1
+            return tag
+        return make_call
+
+
+def test_concurrency_cap():
+    llm = LLMGovernor(max_concurrency=2, tokens_per_minute=0, deadline=5)
+    tracker = Tracker()
+
+    async def main():
+        return await asyncio.gather(*(llm.call("s", 10, tracker.call(i)) for i in range(6)))
+
+    assert asyncio.run(main()) == list(range(6))
+    assert tracker.peak == 2
+    stats = llm.stats()
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+    assert stats["admitted"] == 6
+
+
+def test_sessions_take_turns():
+    llm = LLMGovernor(max_concurrency=1, tokens_per_minute=0, deadline=5)
+    tracker = Tracker(duration=0.005)
+
+    async def main():
+        # A busy session queues first, a second session right after
+        calls = [llm.call("busy", 10, tracker.call(f"busy{i}")) for i in range(5)]
+        calls += [llm.call("other", 10, tracker.call(f"other{i}")) for i in range(2)]
+        await asyncio.gather(*calls)
+
+    asyncio.run(main())
+
+    assert tracker.started == ["busy0", "busy1", "other0", "busy2", "other1", "busy3", "busy4"]
+
+
+def test_rate_limit_is_retried_with_jittered_backoff(jitter):
+    llm = LLMGovernor(tokens_per_minute=0, deadline=5)
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise _rate_limit_error()
+        return "ok"
+
+    assert asyncio.run(llm.call("s", 10, flaky)) == "ok"
+
+    assert len(attempts) == 3
+    # Drawn from a window that doubles with each attempt
+    assert jitter == [governor.BACKOFF_BASE, governor.BACKOFF_BASE * 2]
+    stats = llm.stats()
+    assert stats["rate_limited"] == 2 and stats["retries"] == 2
+    assert stats["in_flight"] == 0
+
+
+def test_backoff_is_capped(jitter):
+    llm = LLMGovernor(tokens_per_minute=0, deadline=5)
+
+    async def backoffs():
+        for attempt in [0, 5, 20]:
+            await llm._backoff(_rate_limit_error(), attempt, time.monotonic() + 5)
+
+    asyncio.run(backoffs())
+
+    assert jitter == [governor.BACKOFF_BASE, governor.BACKOFF_MAX, governor.BACKOFF_MAX]
+
+
+def test_retry_after_is_respected(jitter):
+    llm = LLMGovernor(tokens_per_minute=0, deadline=5)
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise _rate_limit_error(retry_after="0.2")
+        return "ok"
+
+    assert asyncio.run(llm.call("s", 10, flaky)) == "ok"
+    assert attempts[1] - attempts[0] >= 0.2
+
+
+def test_rate_limit_past_the_deadline_is_raised():
+    llm = LLMGovernor(tokens_per_minute=0, deadline=5)
+    attempts = []
+
+    async def always_limited():
+        attempts.append(1)
+        raise _rate_limit_error(retry_after="10")
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(llm.call("s", 10, always_limited, deadline=time.monotonic() + 1))
+
+    # Not retried, since the wait would end after the deadline
+    assert len(attempts) == 1
+    assert llm.stats()["retries"] == 0
+    assert llm.stats()["in_flight"] == 0
+
+
+def test_rate_limit_empties_the_token_bucket(jitter):
+    llm = LLMGovernor(tokens_per_minute=60000, deadline=5)
+
+    async def limited_once():
+        if llm.stats()["rate_limited"] == 0:
+            raise _rate_limit_error()
+        return "ok"
+
+    asyncio.run(llm.call("s", 10, limited_once))
+
+    # The bucket refills from empty, so other sessions back off too
+    assert llm.stats()["tokens_available"] < 1000
+
+
+def test_overloaded_when_no_slot_before_the_deadline():
+    llm = LLMGovernor(max_concurrency=1, tokens_per_minute=0, deadline=5)
+    tracker = Tracker(duration=0.5)
+
+    async def main():
+        busy = asyncio.create_task(llm.call("a", 10, tracker.call("slow")))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError):
+            await llm.call("b", 10, tracker.call("never"), deadline=time.monotonic() + 0.05)
+        # Giving up leaves nothing behind in the queue
+        assert llm.stats()["queued"] == 0
+        await busy
+
+    asyncio.run(main())
+
+    assert tracker.started == ["slow"]
+    assert llm.stats()["rejected"] == 1
+    assert llm.stats()["in_flight"] == 0
+
+
+def test_overloaded_when_tokens_run_out():
+    llm = LLMGovernor(tokens_per_minute=6000, deadline=0.1)
+
+    async def answer():
+        return "ok"
+
+    async def main():
+        await llm.call("s", 5000, answer)
+        await llm.call("s", 5000, answer)
+
+    with pytest.raises(LLMOverloadedError):
+        asyncio.run(main())
+    assert llm.stats()["admitted"] == 1
+
+
+def test_running_call_is_cut_at_the_deadline():
+    llm = LLMGovernor(tokens_per_minute=0, deadline=0.05)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(llm.call("s", 10, Tracker(duration=1).call("slow")))
+    assert llm.stats()["in_flight"] == 0
+
+
+def test_cancelling_a_running_call_releases_its_slot():
+    llm = LLMGovernor(max_concurrency=1, tokens_per_minute=0, deadline=5)
+    tracker = Tracker(duration=10)
+
+    async def main():
+        running = asyncio.create_task(llm.call("a", 10, tracker.call("slow")))
+        await asyncio.sleep(0.01)
+        assert llm.stats()["in_flight"] == 1
+        running.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running
+        assert llm.stats()["in_flight"] == 0
+        # The freed slot is usable straight away
+        tracker.duration = 0
+        return await llm.call("b", 10, tracker.call("next"), deadline=time.monotonic() + 0.05)
+
+    assert asyncio.run(main()) == "next"
+
+
+def test_cancelling_a_waiting_call_leaves_the_queue():
+    llm = LLMGovernor(max_concurrency=1, tokens_per_minute=0, deadline=5)
+    tracker = Tracker(duration=0.05)
+
+    async def main():
+        running = asyncio.create_task(llm.call("a", 10, tracker.call("first")))
+        waiting = asyncio.create_task(llm.call("b", 10, tracker.call("cancelled")))
+        await asyncio.sleep(0.01)
+        assert llm.stats()["queued"] == 1
+        waiting.cancel()
+        await running
+        await llm.call("c", 10, tracker.call("last"))
+
+    asyncio.run(main())
+
+    assert tracker.started == ["first", "last"]
+    assert llm.stats()["in_flight"] == 0 and llm.stats()["queued"] == 0
+
+
+def test_stream_retries_before_the_first_chunk(jitter):
+    llm = LLMGovernor(tokens_per_minute=0, deadline=5)
+    attempts = []
+
+    async def chunks():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise _rate_limit_error()
+        for chunk in ["Hello", " there"]:
+            yield chunk
+
+    async def main():
+        return [chunk async for chunk in llm.stream("s", 10, chunks)]
+
+    assert asyncio.run(main()) == ["Hello", " there"]
+    assert len(attempts) == 2
+    assert llm.stats()["in_flight"] == 0
+
+
+def test_stream_rate_limit_after_a_chunk_is_raised(jitter):
+    llm = LLMGovernor(tokens_per_minute=0, deadline=5)
+    received = []
+
+    async def chunks():
+        yield "Hello"
+        raise _rate_limit_error()
+
+    async def main():
+        async for chunk in llm.stream("s", 10, chunks):
+            received.append(chunk)
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(main())
+    assert received == ["Hello"]
+    assert llm.stats()["retries"] == 0
+    assert llm.stats()["in_flight"] == 0
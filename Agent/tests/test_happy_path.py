@@ -13,6 +13,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from agent import create_agent
+from runtime import iterate_sync
+from router import route
 
 
 @pytest.fixture
@@ -108,6 +110,31 @@ def test_nearest_outlets_with_location(agent):
     assert any(word in response.lower() for word in ["nearest", "closest", "distance", "km", "away"])
 
 
+def test_independent_lookups_in_one_turn(agent):
+    """Test a turn that needs two independent lookups, which run concurrently."""
+    
+    result = agent.execute("Show me outlets in Cheras and outlets in Shah Alam")
+    response = result['response']
+    
+    assert result['success'] is True
+    assert "cheras" in response.lower()
+    assert "shah alam" in response.lower()
+
+
+def test_streamed_reply(agent):
+    """Test that a streamed reply sends status first and its tokens add up to the answer."""
+    
+    events = list(iterate_sync(agent.astream("What mugs do you have?")))
+    
+    assert events[0]['type'] == 'status'
+    assert events[-1]['type'] == 'done'
+    result = events[-1]['result']
+    assert result['success'] is True
+    
+    streamed = "".join(event['text'] for event in events if event['type'] == 'token')
+    assert streamed.strip() == result['response']
+
+
 def test_calculator_tool(agent):
     """Test calculator functionality."""
     
@@ -140,6 +167,21 @@ def test_off_topic_redirect(agent):
     assert any(word in response.lower() for word in ["zus", "coffee", "help", "assist"])
 
 
+def test_local_router():
+    """Test that obvious turns are planned locally and ambiguous ones are left to the LLM."""
+
+    decision = route("What is 15% of 50?")
+    assert decision['tool'] == "calculator"
+    assert decision['params'] == {"expression": "(50 * 15 / 100)"}
+
+    assert route("Hello")['action'] == "answer"
+    assert route("What's the weather today?")['action'] == "answer"
+
+    assert route("Show me outlets in KL") is None
+    assert route("And when does it close?") is None
+    assert route("Hi, is there an outlet in SS 2?") is None
+
+
 def test_session_isolation():
     """Test that different sessions maintain separate histories."""
     
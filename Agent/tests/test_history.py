@@ -0,0 +1,120 @@
+"""Test cases for the token-budgeted history window and compaction point."""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage, HumanMessage
+import history
+from history import TOKENS_PER_MESSAGE, compaction_end, count_message_tokens, recent_turns
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    """One token per word, so budgets don't depend on tiktoken being downloadable."""
+    monkeypatch.setattr(history, "count_tokens", lambda text: len(text.split()))
+
+
+def _turn(question, *replies):
+    return [HumanMessage(content=question)] + [AIMessage(content=reply) for reply in replies]
+
+
+def _tokens(messages):
+    return sum(count_message_tokens(message) for message in messages)
+
+
+# Three turns of 2 messages, each 2 * TOKENS_PER_MESSAGE + 6 tokens
+TURNS = [
+    _turn("one two three", "four five six"),
+    _turn("where is SS2", "open until ten"),
+    _turn("and the price", "is RM 79"),
+]
+MESSAGES = [message for turn in TURNS for message in turn]
+TURN_TOKENS = 2 * TOKENS_PER_MESSAGE + 6
+
+
+def test_fixed_tokenizer():
+    assert count_message_tokens(HumanMessage(content="a b c")) == TOKENS_PER_MESSAGE + 3
+    assert _tokens(TURNS[0]) == TURN_TOKENS
+
+
+def test_everything_fits():
+    assert recent_turns(MESSAGES, 3 * TURN_TOKENS) == MESSAGES
+
+
+@pytest.mark.parametrize("budget, kept_turns", [
+    (3 * TURN_TOKENS - 1, 2),
+    (2 * TURN_TOKENS, 2),
+    (2 * TURN_TOKENS - 1, 1),
+    (TURN_TOKENS, 1),
+])
+def test_budget_is_respected(budget, kept_turns):
+    kept = recent_turns(MESSAGES, budget)
+
+    assert kept == [message for turn in TURNS[-kept_turns:] for message in turn]
+    assert _tokens(kept) <= budget
+
+
+def test_turns_are_never_cut():
+    messages = MESSAGES + _turn("any vouchers", "yes", "use code ZUS10 at checkout")
+    last_turn_tokens = _tokens(messages[-3:])
+
+    kept = recent_turns(messages, last_turn_tokens + TURN_TOKENS - 1)
+
+    assert kept == messages[-3:]
+    assert isinstance(kept[0], HumanMessage)
+
+
+@pytest.mark.parametrize("budget", [TURN_TOKENS - 1, 1, 0, -50])
+def test_last_turn_is_always_kept(budget):
+    assert recent_turns(MESSAGES, budget) == TURNS[-1]
+
+
+def test_oversized_last_turn_is_kept_alone():
+    messages = MESSAGES + _turn("list every outlet", " ".join(["outlet"] * 500))
+
+    assert recent_turns(messages, 100) == messages[-2:]
+
+
+def test_unanswered_last_message_is_kept():
+    messages = MESSAGES + [HumanMessage(content="hello")]
+
+    assert recent_turns(messages, TURN_TOKENS) == messages[-1:]
+    assert recent_turns(messages, TURN_TOKENS + TOKENS_PER_MESSAGE + 1) == messages[-3:]
+
+
+def test_empty_history():
+    assert recent_turns([], 100) == []
+
+
+def test_compaction_waits_for_the_threshold(monkeypatch):
+    monkeypatch.setattr(history, "COMPACTION_THRESHOLD_TOKENS", _tokens(MESSAGES))
+
+    assert compaction_end(MESSAGES, 0, keep_turns=1) == 0
+
+
+def test_compaction_keeps_the_last_turns(monkeypatch):
+    monkeypatch.setattr(history, "COMPACTION_THRESHOLD_TOKENS", TURN_TOKENS)
+
+    assert compaction_end(MESSAGES, 0, keep_turns=1) == 4
+    assert compaction_end(MESSAGES, 0, keep_turns=2) == 2
+    assert compaction_end(MESSAGES, 0, keep_turns=0) == len(MESSAGES)
+
+
+def test_compaction_needs_more_turns_than_it_keeps(monkeypatch):
+    monkeypatch.setattr(history, "COMPACTION_THRESHOLD_TOKENS", 0)
+
+    assert compaction_end(MESSAGES, 0, keep_turns=3) == 0
+    assert compaction_end(MESSAGES, 2, keep_turns=2) == 2
+
+
+def test_compaction_only_counts_unsummarized_messages(monkeypatch):
+    monkeypatch.setattr(history, "COMPACTION_THRESHOLD_TOKENS", 2 * TURN_TOKENS)
+
+    # Only the last two turns are pending, and they are within the threshold
+    assert compaction_end(MESSAGES, 2, keep_turns=1) == 2
+
+    monkeypatch.setattr(history, "COMPACTION_THRESHOLD_TOKENS", TURN_TOKENS)
+    assert compaction_end(MESSAGES, 2, keep_turns=1) == 4
@@ -0,0 +1,92 @@
+"""Test cases for the lookup prefetched while the planner decides."""
+
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import agent as agent_module
+from conftest import decision_text
+
+
+@pytest.fixture
+def prefetching_agent(offline_agent, fake_chain, monkeypatch):
+    """An agent with prefetching on, whose prefetch tasks are collected in agent.prefetched."""
+    monkeypatch.setattr(agent_module, "SPECULATIVE_PREFETCH", "on")
+    monkeypatch.setattr(agent_module, "INTENT_ROUTER", "off")
+    # The lookup is well under way by the time the planner decides
+    fake_chain.delay = 0.05
+    agent = offline_agent()
+    agent.prefetched = []
+    start_prefetch = agent._start_prefetch
+
+    def recording_start_prefetch(*args):
+        start_prefetch(*args)
+        if agent._prefetch is not None:
+            agent.prefetched.append(agent._prefetch[1])
+
+    agent._start_prefetch = recording_start_prefetch
+    return agent
+
+
+def test_hit_reuses_the_prefetched_lookup(prefetching_agent, fake_chain, fake_transport):
+    fake_chain.replies = [decision_text(action="use_tool", tool="product_search", params='{"query": "tumblers"}')]
+
+    result = prefetching_agent.execute("Do you have any tumblers?")
+
+    assert "ZUS All-Can Tumbler" in result["response"]
+    # The planner's call was answered by the prefetched lookup
+    assert fake_transport.calls == [("search_products", "tumblers")]
+    [task] = prefetching_agent.prefetched
+    assert task.done() and not task.cancelled()
+    assert prefetching_agent._prefetch is None
+
+
+def test_miss_cancels_the_prefetched_lookup(prefetching_agent, fake_chain, fake_transport):
+    fake_transport.delay = 1.0
+    fake_chain.replies = [decision_text(answer="We have mugs and tumblers")]
+
+    started = time.monotonic()
+    result = prefetching_agent.execute("Do you have any tumblers?")
+
+    assert result["response"] == "We have mugs and tumblers"
+    # The turn didn't wait for the unused lookup
+    assert time.monotonic() - started < fake_transport.delay
+    [task] = prefetching_agent.prefetched
+    assert task.cancelled()
+    assert prefetching_agent._prefetch is None
+
+
+def test_other_tool_cancels_the_prefetched_lookup(prefetching_agent, fake_chain, fake_transport):
+    fake_transport.delay = 0.2
+    fake_chain.replies = [decision_text(action="use_tool", tool="outlet_query", params='{"query": "outlets in SS2"}')]
+
+    result = prefetching_agent.execute("Which outlet has tumblers?")
+
+    assert "ZUS Coffee SS2" in result["response"]
+    [task] = prefetching_agent.prefetched
+    assert task.cancelled()
+    assert fake_transport.calls[-1] == ("query_outlets", "outlets in ss2")
+
+
+def test_failed_planner_cancels_the_prefetched_lookup(prefetching_agent, fake_chain, fake_transport):
+    fake_transport.delay = 1.0
+    fake_chain.replies = [TimeoutError("planner timed out")]
+
+    result = prefetching_agent.execute("Do you have any tumblers?")
+
+    assert result["error"] == "deadline"
+    [task] = prefetching_agent.prefetched
+    assert task.cancelled()
+    assert prefetching_agent._prefetch is None
+
+
+def test_no_prefetch_without_a_likely_lookup(prefetching_agent, fake_chain, fake_transport):
+    fake_chain.replies = [decision_text(answer="Hello")]
+
+    prefetching_agent.execute("Hello there, how are you?")
+
+    assert prefetching_agent.prefetched == []
+    assert fake_transport.calls == []
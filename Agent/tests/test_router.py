@@ -0,0 +1,107 @@
+"""Test cases for the local intent router, including past misroutes."""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import agent as agent_module
+from router import OFF_TOPIC_ANSWER, arithmetic_expression, classify, route
+from conftest import decision_text
+
+
+@pytest.mark.parametrize("message, expression", [
+    ("What is 15% of 50?", "(50 * 15 / 100)"),
+    ("12 * 4", "12 * 4"),
+    ("(1+2)*3", "(1+2)*3"),
+    ("2-3+1", "2-3+1"),
+    ("what is 3/4", "3/4"),
+    ("3/4 =", "3/4"),
+    ("2 minus 3", "2 - 3"),
+    ("calculate 100 - 20", "100 - 20"),
+])
+def test_arithmetic_is_routed(message, expression):
+    assert arithmetic_expression(message) == expression
+    assert route(message)['tool'] == "calculator"
+
+
+@pytest.mark.parametrize("message", [
+    # Ranges, dates and fractions, not sums to work out
+    "2-3",
+    "3/4",
+    "10 - 12",
+    "1.5/2",
+    # Not only arithmetic
+    "3/4 of the price",
+    "2 tumblers",
+    "1 / 0",
+])
+def test_ambiguous_numbers_are_not_routed(message):
+    assert arithmetic_expression(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "What's the weather today?",
+    "Tell me a joke",
+    "Who is the president?",
+    "Recommend a good movie to watch",
+    "What is the capital of France?",
+    "Tell me about Starbucks",
+])
+def test_off_topic_is_routed(message):
+    decision = route(message)
+    assert decision['action'] == "answer"
+    assert decision['answer'] == OFF_TOPIC_ANSWER
+
+
+@pytest.mark.parametrize("message", [
+    # Once read as off-topic: ZUS sells gifts and travel tumblers
+    "Recommend a good gift",
+    "recommend a good one for travel",
+    "What's the capital?",
+    "Any good gift ideas?",
+    "Which one is best?",
+    # ZUS questions
+    "Show me outlets in KL",
+    "And when does it close?",
+    "Hi, is there an outlet in SS 2?",
+    "Do you have any tumblers?",
+])
+def test_zus_and_unclear_messages_go_to_the_planner(message):
+    assert classify(message) is None
+    assert route(message) is None
+
+
+def test_greetings_and_thanks():
+    assert route("Hello")['intent'] == "greeting"
+    assert route("Thanks!")['intent'] == "thanks"
+    assert route("Hello, any tumblers?") is None
+
+
+def test_first_message_is_routed(offline_agent, fake_chain, monkeypatch):
+    monkeypatch.setattr(agent_module, "INTENT_ROUTER", "on")
+    agent = offline_agent()
+
+    result = agent.execute("Tell me a joke")
+
+    assert result['response'] == OFF_TOPIC_ANSWER
+    assert result['decision']['reasoning'] == "local router"
+    assert fake_chain.inputs == []
+
+
+def test_follow_ups_are_not_routed(offline_agent, fake_chain, monkeypatch):
+    monkeypatch.setattr(agent_module, "INTENT_ROUTER", "on")
+    agent = offline_agent()
+    fake_chain.replies = [
+        decision_text(answer="Our tumblers make great gifts"),
+        decision_text(answer="A joke? Our All-Can Tumbler is no joke"),
+    ]
+
+    agent.execute("Any tumblers?")
+    result = agent.execute("Tell me a joke")
+
+    # With history, even a clearly off-topic message goes to the planner
+    assert len(fake_chain.inputs) == 2
+    assert fake_chain.inputs[1]['history']
+    assert result['response'] == "A joke? Our All-Can Tumbler is no joke"
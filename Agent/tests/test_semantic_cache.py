@@ -0,0 +1,199 @@
+"""Test cases for the semantic cache of first-turn answers."""
+
+import asyncio
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import semantic_cache
+from cache import tool_cache
+from runtime import run_sync
+from semantic_cache import SemanticCache, response_cache
+from conftest import decision_text
+
+TUMBLER_DECISION = decision_text(action="use_tool", tool="product_search", params='{"query": "tumbler"}')
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(maxsize=10, ttl=60, threshold=0.85)
+
+
+@pytest.mark.parametrize("question", [
+    "do you sell tumblers",
+    "Do you sell any tumblers?",
+    "DO YOU SELL TUMBLERS!!",
+])
+def test_near_duplicate_hits(cache, question):
+    cache.set("Do you sell tumblers?", "tumblers")
+
+    assert cache.get(question) == "tumblers"
+
+
+@pytest.mark.parametrize("question", [
+    "Do you sell mugs?",
+    "Do you sell tumblers in blue?",
+    "Where is the nearest outlet?",
+])
+def test_near_miss_is_rejected(cache, question):
+    cache.set("Do you sell tumblers?", "tumblers")
+
+    assert cache.get(question) is None
+
+
+def test_distinctive_words_must_match(cache):
+    cache.set("What are the opening hours at KLCC?", "KLCC hours")
+
+    assert cache.get("what are the opening hours at klcc") == "KLCC hours"
+    assert cache.get("What are the opening hours at KLIA?") is None
+
+
+@pytest.mark.parametrize("cached, question", [
+    ("What time does the ZUS Coffee outlet in Sunway Pyramid open on weekends?",
+     "What time does the ZUS Coffee outlet in Sunway Pyramid close on weekends?"),
+    ("What is the price of the ZUS stainless steel tumbler?",
+     "What is the price of the ZUS stainless steel mug?"),
+    ("What are the opening hours at KLCC?", "What are the prices at KLCC?"),
+], ids=["open_close", "tumbler_mug", "hours_price"])
+def test_domain_words_that_change_the_question_must_match(cache, cached, question):
+    cache.set(cached, "cached answer")
+
+    assert cache.get(cached.lower()) == "cached answer"
+    assert cache.get(question) is None
+
+
+def test_namespaces_are_kept_apart(cache):
+    cache.set("Show me the nearest outlets", "near A", namespace=("template", (3.1, 101.6)))
+
+    assert cache.get("Show me the nearest outlets", ("template", (3.1, 101.6))) == "near A"
+    assert cache.get("Show me the nearest outlets", ("template", (2.9, 101.7))) is None
+    assert cache.get("Show me the nearest outlets") is None
+
+
+def test_entries_expire(cache, monkeypatch):
+    now = semantic_cache.time.monotonic()
+    cache.set("Do you sell tumblers?", "tumblers")
+
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now + 61)
+    assert cache.get("Do you sell tumblers?") is None
+
+
+def test_disabled_with_zero_ttl():
+    cache = SemanticCache(ttl=0)
+    cache.set("Do you sell tumblers?", "tumblers")
+
+    assert cache.get("Do you sell tumblers?") is None
+
+
+def test_callers_get_copies(cache):
+    cache.set("Do you sell tumblers?", {"response": "tumblers"})
+    cache.get("Do you sell tumblers?")["response"] = "changed"
+
+    assert cache.get("Do you sell tumblers?") == {"response": "tumblers"}
+
+
+def test_new_data_version_clears(cache, monkeypatch):
+    versions = iter(["v1", "v1", "v2"])
+
+    async def fetch_version():
+        return next(versions)
+
+    async def check():
+        # Every check is past the interval
+        cache._version_checked_at = 0.0
+        return await cache.check_data_version(fetch_version)
+
+    cache.set("Do you sell tumblers?", "tumblers")
+    assert asyncio.run(check()) is False
+    assert asyncio.run(check()) is False
+    assert cache.get("Do you sell tumblers?") == "tumblers"
+
+    assert asyncio.run(check()) is True
+    assert cache.get("Do you sell tumblers?") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_agent_answers_repeat_question_from_cache(offline_agent, fake_chain, fake_transport):
+    fake_chain.replies = [TUMBLER_DECISION]
+    first = offline_agent("first").execute("Do you sell tumblers?")
+
+    second_agent = offline_agent("second")
+    second = second_agent.execute("do you sell any tumblers")
+
+    assert second.get("cached") is True
+    assert second["response"] == first["response"]
+    assert "ZUS All-Can Tumbler" in second["response"]
+    # One planner call and one lookup, both for the first session
+    assert len(fake_chain.inputs) == 1
+    assert fake_transport.calls == [("search_products", "tumbler")]
+    # The cached answer is still part of the second session's history
+    assert [message.content for message in second_agent.history.messages] == [
+        "do you sell any tumblers", second["response"]
+    ]
+
+
+def test_agent_plans_near_miss_question(offline_agent, fake_chain, fake_transport):
+    fake_chain.replies = [
+        TUMBLER_DECISION,
+        decision_text(action="use_tool", tool="product_search", params='{"query": "mug"}'),
+    ]
+    offline_agent("first").execute("Do you sell tumblers?")
+
+    result = offline_agent("second").execute("Do you sell mugs?")
+
+    assert not result.get("cached")
+    assert len(fake_chain.inputs) == 2
+    assert fake_transport.calls == [("search_products", "tumbler"), ("search_products", "mug")]
+
+
+def test_agent_follow_ups_are_not_cached(offline_agent, fake_chain):
+    fake_chain.replies = [TUMBLER_DECISION, TUMBLER_DECISION, TUMBLER_DECISION]
+    agent = offline_agent("first")
+    agent.execute("Do you sell mugs?")
+    agent.execute("Do you sell tumblers?")
+
+    # Only first turns are cached, so this one goes to the planner again
+    result = offline_agent("second").execute("Do you sell tumblers?")
+
+    assert not result.get("cached")
+    assert len(fake_chain.inputs) == 3
+
+
+def _wait_for_version_check():
+    async def wait():
+        await response_cache._version_task
+
+    run_sync(wait())
+
+
+def test_agent_does_not_wait_for_the_data_version(offline_agent, fake_chain, fake_transport, monkeypatch):
+    fake_transport.version_delay = 0.5
+    monkeypatch.setattr(response_cache, "_version_checked_at", 0.0)
+    fake_chain.replies = [TUMBLER_DECISION]
+
+    started = time.monotonic()
+    offline_agent().execute("Do you sell tumblers?")
+
+    assert time.monotonic() - started < 0.5
+    _wait_for_version_check()
+    assert response_cache.data_version == "v1"
+
+
+def test_agent_clears_caches_on_new_data_version(offline_agent, fake_chain, fake_transport, monkeypatch):
+    monkeypatch.setattr(response_cache, "data_version", "v1")
+    monkeypatch.setattr(response_cache, "_version_checked_at", time.monotonic())
+    fake_chain.replies = [TUMBLER_DECISION]
+    offline_agent("first").execute("Do you sell tumblers?")
+
+    fake_transport.version = "v2"
+    response_cache._version_checked_at = 0.0
+    # Answered from what was cached while the check runs
+    assert offline_agent("second").execute("Do you sell tumblers?").get("cached") is True
+
+    _wait_for_version_check()
+    assert response_cache.data_version == "v2"
+    assert response_cache.get("Do you sell tumblers?") is None
+    assert tool_cache.stats()["size"] == 0
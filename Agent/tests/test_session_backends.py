@@ -0,0 +1,184 @@
+"""Test cases for saving sessions to SQLite and rehydrating them."""
+
+import sqlite3
+import threading
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_community.chat_message_histories import ChatMessageHistory
+import session_backends
+from session_backends import SCHEMA_VERSION, SqliteSessionBackend, serialize_session
+from sessions import SessionStore
+
+
+class FakeAgent:
+    """Just the session state an AgentPlanner keeps."""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.history = ChatMessageHistory()
+        self.context = {}
+        self.memory_note = ""
+        self.compacted_count = 0
+
+
+def _agent_with_turn(session_id="s1"):
+    agent = FakeAgent(session_id)
+    agent.history.add_user_message("Is there an outlet in SS2?")
+    agent.history.add_ai_message("Yes, ZUS Coffee SS2 is open 8am to 10pm.")
+    agent.context = {"user_location": "Petaling Jaya"}
+    agent.memory_note = "Asked about outlets."
+    agent.compacted_count = 2
+    return agent
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "sessions.db"
+
+
+def test_save_and_load(db_path):
+    backend = SqliteSessionBackend(db_path)
+    data = serialize_session(_agent_with_turn())
+
+    assert backend.version("s1") is None
+    assert backend.load("s1") is None
+    assert backend.save("s1", data) == 1
+    assert backend.save("s1", data) == 2
+    assert backend.version("s1") == 2
+    assert backend.load("s1") == (2, data)
+
+    backend.delete("s1")
+    assert backend.version("s1") is None
+
+
+def test_rehydrate_after_restart(db_path):
+    store = SessionStore(FakeAgent, backend=SqliteSessionBackend(db_path))
+    agent = store.get_or_create("s1")
+    original = _agent_with_turn()
+    agent.history.add_messages(original.history.messages)
+    agent.context = original.context
+    agent.memory_note = original.memory_note
+    agent.compacted_count = original.compacted_count
+    store.save("s1", agent)
+
+    # A new process with a new store and backend, on the same file
+    restarted = SessionStore(FakeAgent, backend=SqliteSessionBackend(db_path))
+    restored = restarted.get("s1")
+
+    assert restored is not None and restored is not agent
+    assert [(m.type, m.content) for m in restored.history.messages] == [
+        (m.type, m.content) for m in original.history.messages
+    ]
+    assert restored.context == {"user_location": "Petaling Jaya"}
+    assert restored.memory_note == "Asked about outlets."
+    assert restored.compacted_count == 2
+    assert restarted.stats()["rehydrated"] == 1
+
+
+def test_change_from_another_worker_is_reloaded(db_path):
+    first = SessionStore(FakeAgent, backend=SqliteSessionBackend(db_path))
+    second = SessionStore(FakeAgent, backend=SqliteSessionBackend(db_path))
+    first.save("s1", first.get_or_create("s1"))
+    stale = second.get("s1")
+
+    agent = first.get("s1")
+    agent.history.add_user_message("hello")
+    first.save("s1", agent)
+
+    reloaded = second.get("s1")
+    assert reloaded is not stale
+    assert [m.content for m in reloaded.history.messages] == ["hello"]
+
+
+def test_idle_sessions_expire(db_path, monkeypatch):
+    backend = SqliteSessionBackend(db_path, ttl=60)
+    backend.save("s1", b"data")
+    now = session_backends.time.time()
+
+    monkeypatch.setattr(session_backends.time, "time", lambda: now + 61)
+    assert backend.version("s1") is None
+    assert backend.load("s1") is None
+    assert backend.purge() == 1
+
+
+def test_new_database_gets_current_schema(db_path):
+    SqliteSessionBackend(db_path).version("s1")
+
+    connection = sqlite3.connect(db_path)
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(sessions)")]
+    assert columns == ["session_id", "version", "updated_at", "data"]
+
+
+def test_unversioned_database_is_migrated_in_place(db_path):
+    # A database made before the schema was versioned
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+        "updated_at REAL NOT NULL, data BLOB NOT NULL)"
+    )
+    connection.execute("INSERT INTO sessions VALUES ('s1', 3, ?, ?)", (session_backends.time.time(), b"data"))
+    connection.commit()
+
+    backend = SqliteSessionBackend(db_path)
+    assert backend.load("s1") == (3, b"data")
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+
+def test_newer_schema_is_refused(db_path):
+    connection = sqlite3.connect(db_path)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    connection.commit()
+
+    with pytest.raises(RuntimeError, match="newer"):
+        SqliteSessionBackend(db_path).version("s1")
+
+
+def test_concurrent_saves_from_threads_and_workers(db_path):
+    # Two backends stand in for two workers, each saving from several threads
+    backends = [SqliteSessionBackend(db_path), SqliteSessionBackend(db_path)]
+    saves_per_thread = 20
+    errors = []
+
+    def save_many(backend, session_id):
+        try:
+            for _ in range(saves_per_thread):
+                backend.save(session_id, b"data")
+                backend.load(session_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=save_many, args=(backends[i % 2], session_id))
+        for i in range(8)
+        for session_id in ["shared", f"own-{i}"]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # Every save took a new version, none were lost
+    assert backends[0].version("shared") == 8 * saves_per_thread
+    assert all(backends[1].version(f"own-{i}") == saves_per_thread for i in range(8))
+
+
+def test_reads_are_not_blocked_by_a_writer(db_path):
+    backend = SqliteSessionBackend(db_path)
+    backend.save("s1", b"old")
+
+    writer = sqlite3.connect(db_path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("UPDATE sessions SET version = 2, data = ? WHERE session_id = 's1'", (b"new",))
+    try:
+        # WAL readers see the last committed version while the write is open
+        assert backend.load("s1") == (1, b"old")
+    finally:
+        writer.execute("COMMIT")
+    assert backend.load("s1") == (2, b"new")
@@ -0,0 +1,141 @@
+"""Test cases for the in-memory session store's expiry and eviction."""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sessions
+from sessions import SessionStore
+
+
+class FakeClock:
+    """Stands in for time.monotonic, moved on by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeAgent:
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sessions.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def created():
+    """Session ids in the order their agents were built."""
+    return []
+
+
+@pytest.fixture
+def store(clock, created):
+    def create(session_id):
+        created.append(session_id)
+        return FakeAgent(session_id)
+    return SessionStore(create, maxsize=3, ttl=60)
+
+
+def test_get_or_create_reuses_the_agent(store, created):
+    agent = store.get_or_create("a")
+
+    assert store.get_or_create("a") is agent
+    assert store.get("a") is agent
+    assert created == ["a"]
+
+
+def test_get_missing_returns_none(store, created):
+    assert store.get("missing") is None
+    assert created == []
+    assert len(store) == 0
+
+
+def test_idle_session_expires(store, clock, created):
+    first = store.get_or_create("a")
+
+    clock.advance(60)
+    assert store.get("a") is first
+
+    clock.advance(61)
+    assert store.get("a") is None
+    assert store.stats()["expired"] == 1
+
+    # A new, empty agent is built for the same id
+    assert store.get_or_create("a") is not first
+    assert created == ["a", "a"]
+
+
+def test_access_keeps_a_session_alive(store, clock):
+    agent = store.get_or_create("a")
+
+    for _ in range(5):
+        clock.advance(50)
+        assert store.get("a") is agent
+    assert store.stats()["expired"] == 0
+
+
+def test_expiry_stops_at_first_live_session(store, clock):
+    store.get_or_create("a")
+    clock.advance(30)
+    store.get_or_create("b")
+    clock.advance(40)
+
+    assert len(store) == 1
+    assert store.get("a") is None
+    assert store.get("b") is not None
+
+
+def test_least_recently_used_is_evicted(store):
+    for session_id in ["a", "b", "c", "d"]:
+        store.get_or_create(session_id)
+
+    assert len(store) == 3
+    assert store.get("a") is None
+    assert store.stats()["evicted"] == 1
+
+
+def test_access_protects_from_eviction(store, clock):
+    a = store.get_or_create("a")
+    store.get_or_create("b")
+    store.get_or_create("c")
+
+    clock.advance(1)
+    assert store.get("a") is a
+    store.get_or_create("d")
+
+    assert store.get("a") is a
+    assert store.get("b") is None
+    assert store.get("c") is not None
+
+
+def test_pop_removes_the_session(store):
+    agent = store.get_or_create("a")
+
+    assert store.pop("a") is agent
+    assert store.pop("a") is None
+    assert store.get("a") is None
+
+
+def test_stats(store):
+    store.get_or_create("a")
+    store.get_or_create("b")
+    stats = store.stats()
+
+    assert stats["size"] == 2
+    assert stats["maxsize"] == 3
+    assert stats["ttl_seconds"] == 60
+    assert stats["backend"] == "memory"
+    assert stats["estimated_bytes"] == 2 * sessions.estimate_session_bytes(FakeAgent("a"))
@@ -9,15 +9,21 @@ import sys
 import os
 # Mock api downtime
 from unittest.mock import patch
-import requests
+import httpx
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from agent import create_agent
+from tools import AVAILABLE_TOOLS
+from cache import tool_cache
+from semantic_cache import response_cache
 
 @pytest.fixture
 def agent():
     """Fixture to provide a fresh agent for each test."""
+    # Cached tool results and answers would hide the simulated API downtime
+    tool_cache.clear()
+    response_cache.clear()
     return create_agent("test_session")
 
 class TestConversationContext:
@@ -232,7 +238,7 @@ class TestAPIDowntime:
 
     def test_product_api_connection_error(self, agent):
         """Simulate product API being unreachable."""
-        with patch("requests.get", side_effect=requests.exceptions.ConnectionError("Server down")):
+        with patch("httpx.AsyncClient.get", side_effect=httpx.ConnectError("Server down")):
             result = agent.execute("What mugs do you have?")
             assert result is not None
             assert "response" in result
@@ -241,7 +247,7 @@ class TestAPIDowntime:
 
     def test_product_api_timeout(self, agent):
         """Simulate product API timeout."""
-        with patch("requests.get", side_effect=requests.exceptions.Timeout):
+        with patch("httpx.AsyncClient.get", side_effect=httpx.ReadTimeout("Read timed out")):
             result = agent.execute("Show me tumblers")
             assert result is not None
             response = result["response"].lower()
@@ -249,18 +255,16 @@ class TestAPIDowntime:
 
     def test_product_api_http_error(self, agent):
         """Simulate product API returning 500 Internal Server Error."""
-        mock_response = requests.Response()
-        mock_response.status_code = 500
-        with patch("requests.get", return_value=mock_response):
-            with patch.object(mock_response, "raise_for_status", side_effect=requests.exceptions.HTTPError("500 error")):
-                result = agent.execute("Show me mugs")
-                assert result is not None
-                response = result["response"].lower()
-                assert "couldn't" in response or "try again later" in response
+        mock_response = httpx.Response(500, request=httpx.Request("GET", "http://api/products/"))
+        with patch("httpx.AsyncClient.get", return_value=mock_response):
+            result = agent.execute("Show me mugs")
+            assert result is not None
+            response = result["response"].lower()
+            assert "couldn't" in response or "try again later" in response
 
     def test_outlet_api_connection_error(self, agent):
         """Simulate outlet API being unreachable."""
-        with patch("requests.get", side_effect=requests.exceptions.ConnectionError("Connection refused")):
+        with patch("httpx.AsyncClient.get", side_effect=httpx.ConnectError("Connection refused")):
             result = agent.execute("Where are outlets in KL?")
             assert result is not None
             response = result["response"].lower()
@@ -268,7 +272,7 @@ class TestAPIDowntime:
 
     def test_outlet_api_timeout(self, agent):
         """Simulate outlet API timing out."""
-        with patch("requests.get", side_effect=requests.exceptions.Timeout):
+        with patch("httpx.AsyncClient.get", side_effect=httpx.ReadTimeout("Read timed out")):
             result = agent.execute("Find outlets in PJ")
             assert result is not None
             response = result["response"].lower()
@@ -276,7 +280,7 @@ class TestAPIDowntime:
 
     def test_outlet_nearest_api_connection_error(self, agent):
         """Simulate nearest outlet API POST endpoint connection failure."""
-        with patch("requests.post", side_effect=requests.exceptions.ConnectionError("Server unreachable")):
+        with patch("httpx.AsyncClient.post", side_effect=httpx.ConnectError("Server unreachable")):
             
             # Set user location 
             agent.update_context('user_location', {
@@ -291,7 +295,7 @@ class TestAPIDowntime:
 
     def test_outlet_api_unexpected_exception(self, agent):
         """Simulate unexpected generic exception."""
-        with patch("requests.get", side_effect=Exception("Unexpected crash")):
+        with patch("httpx.AsyncClient.get", side_effect=Exception("Unexpected crash")):
             result = agent.execute("Find outlets in Penang")
             assert result is not None
             response = result["response"].lower()
@@ -300,7 +304,7 @@ class TestAPIDowntime:
     def test_outlet_api_unexpected_exception_nearest(self, agent):
         """Simulate unexpected generic exception for nearest."""  
 
-        with patch("requests.get", side_effect=Exception("Unexpected crash")):
+        with patch("httpx.AsyncClient.get", side_effect=Exception("Unexpected crash")):
             result = agent.execute("Show me nearest outlets")
             assert result is not None
             response = result["response"].lower()
@@ -309,7 +313,9 @@ class TestAPIDowntime:
 
     def test_calculator_api_connection_error(self, agent):
         """Simulate calculator API being unreachable."""
-        with patch("requests.post", side_effect=requests.exceptions.ConnectionError("Server down")):
+        # The calculator evaluates locally unless remote mode is selected
+        with patch.object(AVAILABLE_TOOLS["calculator"], "mode", "remote"), \
+             patch("httpx.AsyncClient.post", side_effect=httpx.ConnectError("Server down")):
             result = agent.execute("What is 15% of 100?")
             assert result is not None
             assert "response" in result
@@ -318,7 +324,8 @@ class TestAPIDowntime:
 
     def test_calculator_api_timeout(self, agent):
         """Simulate calculator API timeout."""
-        with patch("requests.post", side_effect=requests.exceptions.Timeout):
+        with patch.object(AVAILABLE_TOOLS["calculator"], "mode", "remote"), \
+             patch("httpx.AsyncClient.post", side_effect=httpx.ReadTimeout("Read timed out")):
             result = agent.execute("Calculate 50 * 20")
             assert result is not None
             response = result["response"].lower()
@@ -326,22 +333,30 @@ class TestAPIDowntime:
 
     def test_calculator_api_http_error(self, agent):
         """Simulate calculator API returning 500 Internal Server Error."""
-        mock_response = requests.Response()
-        mock_response.status_code = 500
-        with patch("requests.post", return_value=mock_response):
-            with patch.object(mock_response, "raise_for_status", side_effect=requests.exceptions.HTTPError("500 error")):
-                result = agent.execute("What's 25% of 200?")
-                assert result is not None
-                response = result["response"].lower()
-                assert "unable" in response or "products" in response or "outlets" in response
+        mock_response = httpx.Response(500, request=httpx.Request("POST", "http://api/calculator/"))
+        with patch.object(AVAILABLE_TOOLS["calculator"], "mode", "remote"), \
+             patch("httpx.AsyncClient.post", return_value=mock_response):
+            result = agent.execute("What's 25% of 200?")
+            assert result is not None
+            response = result["response"].lower()
+            assert "unable" in response or "products" in response or "outlets" in response
 
     def test_calculator_api_unexpected_exception(self, agent):
         """Simulate unexpected generic exception in calculator."""
-        with patch("requests.post", side_effect=Exception("Unexpected crash")):
+        with patch.object(AVAILABLE_TOOLS["calculator"], "mode", "remote"), \
+             patch("httpx.AsyncClient.post", side_effect=Exception("Unexpected crash")):
             result = agent.execute("Calculate 100 + 50")
             assert result is not None
             response = result["response"].lower()
             assert "unable" in response or "products" in response or "outlets" in response
+
+    def test_calculator_local_mode_ignores_api_downtime(self, agent):
+        """Local calculations should not depend on the calculator API."""
+        with patch.object(AVAILABLE_TOOLS["calculator"], "mode", "local"), \
+             patch("httpx.AsyncClient.post", side_effect=httpx.ConnectError("Server down")):
+            result = agent.execute("What is 15% of 50?")
+            assert result['success'] is True
+            assert "7.5" in result['response']
             
 class TestRecoveryAndRetry:
     """Test bot's ability to recover from errors."""
@@ -1,39 +1,99 @@
 """Tools that the agent can use to perform actions."""
 
+import os
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import requests
+from transports import get_transport
+from deadline import Deadline
+from cache import tool_cache
+from runtime import run_sync
+from evaluator import evaluate, EvaluationError, LimitExceededError
+
+# Nearest-outlet lookups are cached on coordinates rounded to this many
+# decimal places (about 110 m), so nearby users share one result
+NEAREST_COORDINATE_PRECISION = 3
+
+# Words that make an outlet query a nearest-outlet lookup when coordinates are given
+NEAREST_KEYWORDS = ['nearest', 'closest', 'near me', 'nearby', 'close to me', 'around me']
+
+
+def _normalize_query(text: str) -> str:
+    """Lowercase and collapse whitespace so equivalent queries share a cache key."""
+    return " ".join(text.lower().split())
 
 class Tool:
     """Base class for tools."""
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
+        # None uses the process-wide transport (see transports.py)
+        self.transport = None
+    
+    def get_transport(self):
+        """Get the transport this tool reaches the API through."""
+        return self.transport or get_transport()
     
     def execute(self, **kwargs) -> Dict[str, Any]:
         """Execute the tool and return result."""
+        return run_sync(self.aexecute(**kwargs))
+    
+    async def aexecute(self, **kwargs) -> Dict[str, Any]:
+        """Execute the tool on the event loop and return result."""
         raise NotImplementedError
 
 
 class CalculatorTool(Tool):
-    """Tool for performing calculations."""
+    """
+    Tool for performing calculations.
     
-    def __init__(self):
+    Evaluates locally by default, using the same safe evaluator as the
+    backend. Set CALCULATOR_MODE=remote to call the /calculator endpoint instead.
+    """
+    
+    def __init__(self, mode: str = None):
         super().__init__(
             name="calculator",
             description='Performs mathematical calculations. Use this when user asks for math operations like percentages, sums, differences, etc. Parameter: "expression" (the math expression to evaluate, e.g., "100 * 0.15" for 15% of 100)'
         )
+        self.mode = mode or os.getenv("CALCULATOR_MODE", "local")
+    
+    async def aexecute(self, expression: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Evaluate the expression locally or through the calculator API."""
+        if self.mode == "remote":
+            return await self._execute_remote(expression, deadline)
+        return self._execute_local(expression)
     
-    def execute(self, expression: str) -> Dict[str, Any]:
-        """Call the calculator API endpoint"""
+    def _execute_local(self, expression: str) -> Dict[str, Any]:
+        """Evaluate in-process, returning the same shape as the calculator API"""
         try:
-            response = requests.post(
-                "https://zus-coffee-chatbot-api-702670372085.asia-southeast1.run.app/calculator/",
-                json={"expression": expression},
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
+            result = evaluate(expression)
+            return {
+                "success": True,
+                "result": result,
+                "message": f"Calculation result: {result}"
+            }
+        except LimitExceededError as e:
+            return {
+                "success": False,
+                "result": None,
+                "message": "That calculation is too large for me to work out. Could you try smaller numbers?",
+                "error": e.code,
+                "detail": str(e)
+            }
+        except EvaluationError as e:
+            return {
+                "success": False,
+                "result": None,
+                "message": "I was unable to help with that request right now. Would you like to explore our products or outlets instead?",
+                "error": e.code,
+                "detail": str(e)
+            }
+    
+    async def _execute_remote(self, expression: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Call the calculator API endpoint through the transport"""
+        try:
+            return await self.get_transport().calculate(expression, deadline)
             
         except requests.exceptions.Timeout:
             return {
@@ -64,12 +124,13 @@ class AskUserTool(Tool):
             description="Ask the user for missing information when you don't have enough details to complete the task."
         )
     
-    def execute(self, question: str) -> Dict[str, Any]:
+    async def aexecute(self, question: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Prepare a question to ask the user.
         
         Args:
             question: The question to ask the user
+            deadline: Unused, every tool is given the turn's deadline
         
         Returns:
             Dict with the question to be displayed
@@ -90,26 +151,23 @@ class ProductSearchTool(Tool):
             description="Search for ZUS Coffee drinkware products (mugs, tumblers, accessories). Use this when users ask about products, prices, or what's available in the shop."
         )
     
-    def execute(self, query: str = None, product_type: str = None, category: str = None, top_k: int = 3, **kwargs) -> Dict[str, Any]:
+    async def aexecute(self, query: str = None, product_type: str = None, category: str = None, top_k: int = 3, deadline: Optional[Deadline] = None, **kwargs) -> Dict[str, Any]:
         """
-        Search for products via the FastAPI endpoint.
+        Search for products via the FastAPI endpoint (or in-process, see transports.py).
         """
-        import requests
-        
         try:
             # Combine query and product_type if both provided
             search_query = query or product_type or category or "drinkware"
             if query and (product_type or category):
                 search_query = f"{query} {product_type or category}"
             
-            response = requests.get(
-                "https://zus-coffee-chatbot-api-702670372085.asia-southeast1.run.app/products",
-                params={"query": search_query, "top_k": top_k},
-                timeout=10
+            # The embedding model is uncased, so searching the normalized
+            # query returns the same products and lets cached results match their key
+            search_query = _normalize_query(search_query)
+            data = await tool_cache.get_or_fetch(
+                ("product_search", search_query, top_k),
+                lambda: self.get_transport().search_products(search_query, top_k, deadline)
             )
-            response.raise_for_status()
-            
-            data = response.json()
             
             return {
                 "success": True,
@@ -177,7 +235,7 @@ class OutletQueryTool(Tool):
             text = re.sub(short, full.lower(), text, flags=re.IGNORECASE)
         return text
 
-    def execute(self, query: str = None, location: str = None, latitude: float = None, longitude: float = None, **kwargs) -> Dict[str, Any]:
+    async def aexecute(self, query: str = None, location: str = None, latitude: float = None, longitude: float = None, deadline: Optional[Deadline] = None, **kwargs) -> Dict[str, Any]:
         """
         Query outlets via the FastAPI endpoints.
         
@@ -186,6 +244,7 @@ class OutletQueryTool(Tool):
             location: Optional specific location to search
             latitude: User's GPS latitude (for nearest outlets)
             longitude: User's GPS longitude (for nearest outlets)
+            deadline: The turn's deadline, bounding the API call
             **kwargs: Additional parameters (ignored)
         
         Returns:
@@ -197,25 +256,22 @@ class OutletQueryTool(Tool):
             is_nearest_query = False
             if query:
                 query_lower = query.lower()
-                nearest_keywords = ['nearest', 'closest', 'near me', 'nearby', 'close to me', 'around me']
-                is_nearest_query = any(keyword in query_lower for keyword in nearest_keywords)
+                is_nearest_query = any(keyword in query_lower for keyword in NEAREST_KEYWORDS)
 
             if latitude is not None and longitude is not None and not query and not location:
                 is_nearest_query = True
 
             if is_nearest_query and latitude is not None and longitude is not None:
                 # Use the nearest outlets endpoint
-                response = requests.post(
-                    "https://zus-coffee-chatbot-api-702670372085.asia-southeast1.run.app/outlets/nearest",
-                    json={
-                        "latitude": latitude,
-                        "longitude": longitude,
-                        "limit": 3
-                    },
-                    timeout=10
+                # Query with the rounded coordinates too, so the cached
+                # distances match the coordinates they are keyed on
+                latitude = round(latitude, NEAREST_COORDINATE_PRECISION)
+                longitude = round(longitude, NEAREST_COORDINATE_PRECISION)
+                data = await tool_cache.get_or_fetch(
+                    ("outlet_nearest", latitude, longitude, 3),
+                    lambda: self.get_transport().nearest_outlets(latitude, longitude, limit=3, deadline=deadline),
+                    cacheable=lambda data: data.get('success')
                 )
-                response.raise_for_status()
-                data = response.json()
                 
                 if not data['success']:
                     return {
@@ -248,16 +304,14 @@ class OutletQueryTool(Tool):
             
             # Clean up and normalize
             search_query = search_query.strip()
-            search_query = self._normalize_location_shortforms(search_query)
+            search_query = _normalize_query(self._normalize_location_shortforms(search_query))
 
-            response = requests.get(
-                "https://zus-coffee-chatbot-api-702670372085.asia-southeast1.run.app/outlets/",
-                params={"query": search_query},
-                timeout=15
+            # Failed SQL generation is not cached, the next attempt may succeed
+            data = await tool_cache.get_or_fetch(
+                ("outlet_query", search_query),
+                lambda: self.get_transport().query_outlets(search_query, deadline),
+                cacheable=lambda data: data.get('success')
             )
-            response.raise_for_status()
-            
-            data = response.json()
             
             if not data['success']:
                 error_msg = data.get('error', 'Unknown error')
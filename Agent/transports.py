@@ -0,0 +1,199 @@
+"""
+Transports the tools use to reach the ZUS Coffee API.
+
+HttpTransport (the default) calls the deployed API over the pooled HTTP client.
+InProcessTransport imports the FastAPI backend's routers and calls their search
+and query functions directly, for deployments where the Agent and the API run
+on the same machine. Both return the same JSON shapes as the API, and both
+surface failures as requests exceptions so the tools handle them the same way.
+
+Each call takes the turn's Deadline, if any: over HTTP it shortens the timeout
+and is sent on as a header, in-process it bounds the wait for the router.
+
+Every method is a coroutine, so the tools can run several lookups at once.
+"""
+
+import asyncio
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+import requests
+import http_client
+from deadline import Deadline
+
+# "http" or "inprocess"
+TOOLS_TRANSPORT = os.getenv("TOOLS_TRANSPORT", "http")
+
+# Where the fastapi-backend directory is, for the in-process transport
+DEFAULT_BACKEND_PATH = Path(__file__).resolve().parent.parent / "fastapi-backend"
+BACKEND_PATH = Path(os.getenv("ZUS_BACKEND_PATH", DEFAULT_BACKEND_PATH))
+
+# The backend package is called "app", like the Agent's app.py, so it is
+# imported under its own name to keep the two apart
+BACKEND_PACKAGE = "zus_backend"
+
+
+class HttpTransport:
+    """Call the API endpoints over HTTP."""
+
+    async def search_products(self, query: str, top_k: int = 3, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        response = await http_client.get(
+            "/products/",
+            params={"query": query, "top_k": top_k},
+            timeout=10,
+            deadline=deadline,
+            retry=True
+        )
+        http_client.raise_for_status(response)
+        return response.json()
+
+    async def query_outlets(self, query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        response = await http_client.get(
+            "/outlets/",
+            params={"query": query},
+            timeout=15,
+            deadline=deadline
+        )
+        http_client.raise_for_status(response)
+        return response.json()
+
+    async def nearest_outlets(self, latitude: float, longitude: float, limit: int = 3, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        response = await http_client.post(
+            "/outlets/nearest",
+            json={
+                "latitude": latitude,
+                "longitude": longitude,
+                "limit": limit
+            },
+            timeout=10,
+            deadline=deadline
+        )
+        http_client.raise_for_status(response)
+        return response.json()
+
+    async def calculate(self, expression: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        response = await http_client.post(
+            "/calculator/",
+            json={"expression": expression},
+            timeout=10,
+            deadline=deadline,
+            retry=True
+        )
+        http_client.raise_for_status(response)
+        return response.json()
+
+    async def data_version(self) -> str:
+        response = await http_client.get("/version", timeout=5, retry=True)
+        http_client.raise_for_status(response)
+        return response.json()["data_version"]
+
+
+class InProcessTransport:
+    """
+    Call the backend routers' functions directly, skipping HTTP entirely.
+    Requires the backend's requirements (faiss, sentence-transformers,
+    sqlalchemy) to be installed alongside the Agent's.
+    """
+
+    def __init__(self, backend_path: Path = BACKEND_PATH):
+        self.backend_path = Path(backend_path)
+        self._routers = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Import the backend routers (and the data version and deadline modules) once, on first use"""
+        if self._routers is None:
+            with self._lock:
+                if self._routers is None:
+                    try:
+                        package_dir = self.backend_path / "app"
+                        if BACKEND_PACKAGE not in sys.modules:
+                            spec = importlib.util.spec_from_file_location(
+                                BACKEND_PACKAGE,
+                                package_dir / "__init__.py",
+                                submodule_search_locations=[str(package_dir)]
+                            )
+                            package = importlib.util.module_from_spec(spec)
+                            sys.modules[BACKEND_PACKAGE] = package
+                            spec.loader.exec_module(package)
+                        self._routers = {
+                            name: importlib.import_module(f"{BACKEND_PACKAGE}.routers.{name}")
+                            for name in ("products", "outlets", "calculator")
+                        }
+                        for name in ("data_version", "deadline"):
+                            self._routers[name] = importlib.import_module(f"{BACKEND_PACKAGE}.{name}")
+                    except (ImportError, OSError) as e:
+                        sys.modules.pop(BACKEND_PACKAGE, None)
+                        # Same as the API being unreachable over HTTP
+                        raise requests.exceptions.ConnectionError(
+                            f"Could not load the backend from {self.backend_path}: {e}"
+                        )
+        return self._routers
+
+    def _call_sync(self, router: str, function: str, *args, budget: Optional[float] = None) -> Dict[str, Any]:
+        """Call a router function and return its result as the endpoint would"""
+        from fastapi.encoders import jsonable_encoder
+
+        routers = self._load()
+        try:
+            if budget is None:
+                result = getattr(routers[router], function)(*args)
+            else:
+                # What the deadline header does over HTTP
+                with routers["deadline"].request_deadline(budget):
+                    result = getattr(routers[router], function)(*args)
+        except Exception as e:
+            # The endpoint would have answered with a 500
+            raise requests.exceptions.HTTPError(f"500 Server Error: {e}")
+        return jsonable_encoder(result)
+
+    async def _call(self, router: str, function: str, *args, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        # The router functions block (model encoding, SQLite, the SQL LLM call),
+        # so they run in a worker thread to keep the event loop free
+        budget = deadline.timeout() if deadline is not None else None
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self._call_sync, router, function, *args, budget=budget),
+                budget
+            )
+        except asyncio.TimeoutError:
+            # The thread finishes in the background, its result is dropped
+            raise requests.exceptions.Timeout(f"{router}.{function} ran past the deadline")
+
+    async def search_products(self, query: str, top_k: int = 3, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        return await self._call("products", "search", query, top_k, deadline=deadline)
+
+    async def query_outlets(self, query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        return await self._call("outlets", "search", query, deadline=deadline)
+
+    async def nearest_outlets(self, latitude: float, longitude: float, limit: int = 3, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        return await self._call("outlets", "nearest", latitude, longitude, limit, deadline=deadline)
+
+    async def calculate(self, expression: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        return await self._call("calculator", "compute", expression, deadline=deadline)
+
+    async def data_version(self) -> str:
+        return await self._call("data_version", "data_version")
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Get the process-wide transport selected by TOOLS_TRANSPORT."""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                if TOOLS_TRANSPORT == "inprocess":
+                    _transport = InProcessTransport()
+                elif TOOLS_TRANSPORT == "http":
+                    _transport = HttpTransport()
+                else:
+                    raise ValueError(f"Unknown TOOLS_TRANSPORT: {TOOLS_TRANSPORT}")
+    return _transport
@@ -0,0 +1,28 @@
+"""Version of the product and outlet data the API serves"""
+
+from pathlib import Path
+import hashlib
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+# Rewritten by the ingestion scripts, or updated in place for the outlets database
+DATA_FILES = (
+    DATA_DIR / "vector_store" / "products.index",
+    DATA_DIR / "vector_store" / "products.pkl",
+    DATA_DIR / "outlets" / "zus_outlets.db",
+)
+
+def data_version() -> str:
+    """
+    Short hash of the data files' sizes and modification times. It changes
+    whenever the data is re-ingested or edited, so clients can drop answers
+    they cached from the old data.
+    """
+    digest = hashlib.sha1()
+    for path in DATA_FILES:
+        try:
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        except FileNotFoundError:
+            digest.update(f"{path.name}:missing;".encode())
+    return digest.hexdigest()[:16]
@@ -0,0 +1,62 @@
+"""Request deadlines sent by the agent"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import JSONResponse
+import asyncio
+import time
+
+# Milliseconds the caller will still wait for the response
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+# When the current request must be answered by, on the monotonic clock
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left for the current request, at most default (None if neither is set)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    left = max(0.0, deadline - time.monotonic())
+    return left if default is None else min(default, left)
+
+@contextmanager
+def request_deadline(seconds: float):
+    """Give the code inside seconds to finish, see remaining"""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def _deadline_exceeded() -> JSONResponse:
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+
+async def deadline_middleware(request: Request, call_next):
+    """
+    Honor the caller's deadline header: a request that arrives with no time
+    left is refused, and one that runs out of time gets a 504 instead of an
+    answer the caller has stopped waiting for.
+
+    The 504 can only be sent while the event loop is free, so endpoints that
+    block (model encoding, FAISS, SQLite, the text-to-SQL call) are plain
+    def: FastAPI runs them in its threadpool, which copies the request's
+    context, so remaining() still works there, and a 504 doesn't wait for
+    their threads to return.
+    """
+    header = request.headers.get(DEADLINE_HEADER)
+    if header is None:
+        return await call_next(request)
+    try:
+        budget = int(header) / 1000
+    except ValueError:
+        return JSONResponse(status_code=400, content={"detail": f"Invalid {DEADLINE_HEADER} header"})
+    if budget <= 0:
+        return _deadline_exceeded()
+    with request_deadline(budget):
+        try:
+            return await asyncio.wait_for(call_next(request), budget)
+        except asyncio.TimeoutError:
+            return _deadline_exceeded()
@@ -2,7 +2,11 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import products, outlets, calculator
+from fastapi.responses import PlainTextResponse
+from .routers import products, outlets, calculator
+from .timing import metrics
+from .data_version import data_version
+from .deadline import deadline_middleware
 from dotenv import load_dotenv
 import uvicorn
 import os
@@ -23,6 +27,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Requests from the agent carry the time it will still wait for them
+app.middleware("http")(deadline_middleware)
+
 # Include routers
 app.include_router(products.router)
 app.include_router(outlets.router)
@@ -35,13 +42,18 @@ async def root():
         "status": "running",
         "endpoints": {
             "calculator": "/calculator",
+            "calculator_batch": "/calculator/batch",
             "calculator_health": "/calculator/health",
-            "products": "/products?query=<search_query>&top_k=3",
+            "products": "/products?query=<search_query>&top_k=3&min_score=<0-1>",
             "products_health": "/products/health",
+            "products_lookup": "/products/{id}",
+            "products_similar": "/products/{id}/similar?top_k=3",
             "outlets": "/outlets?query=<natural_language_query>",
             "outlets_schema": "/outlets/schema",
             "outlets_health": "/outlets/health",
             "outlets_nearest": "/outlets/nearest",
+            "metrics": "/metrics",
+            "version": "/version",
             "docs": "/docs"
         }
     }
@@ -50,6 +62,16 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/version")
+async def version():
+    """Version of the product and outlet data, for clients that cache answers"""
+    return {"data_version": data_version()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage latency histograms in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
     uvicorn.run("app.main:app", host="0.0.0.0", port=port)
\ No newline at end of file
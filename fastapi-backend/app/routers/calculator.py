@@ -1,9 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Any
+from typing import Any, Callable, Dict, List, Optional
+from ..evaluator import compile_expression, evaluate, run, EvaluationError, LimitExceededError
 
 router = APIRouter(prefix="/calculator", tags=["calculator"])
 
+MAX_BATCH_SIZE = 1000
+
 class CalculatorRequest(BaseModel):
     expression: str
 
@@ -11,25 +14,107 @@ class CalculatorResponse(BaseModel):
     success: bool
     result: Any
     message: str
+    # "invalid_expression" or "limit_exceeded" when success is False
+    error: Optional[str] = None
+    detail: Optional[str] = None
 
-@router.post("/", response_model=CalculatorResponse)
-async def calculate(request: CalculatorRequest):
-    """Perform mathematical calculations"""
+class BatchCalculatorRequest(BaseModel):
+    # Either a list of independent expressions...
+    expressions: Optional[List[str]] = None
+    # ...or one template evaluated once per set of variable bindings
+    template: Optional[str] = None
+    bindings: Optional[List[Dict[str, float]]] = None
+
+class BatchCalculatorResponse(BaseModel):
+    success: bool
+    results: List[CalculatorResponse]
+    count: int
+    failed: int
+
+def _error_response(e: EvaluationError) -> CalculatorResponse:
+    """Map an evaluator error to a failed calculator response"""
+    if isinstance(e, LimitExceededError):
+        message = "That calculation is too large for me to work out. Could you try smaller numbers?"
+    else:
+        message = "I was unable to help with that request right now. Would you like to explore our products or outlets instead?"
+    return CalculatorResponse(
+        success=False,
+        result=None,
+        message=message,
+        error=e.code,
+        detail=str(e)
+    )
+
+def _calculate(evaluate_fn: Callable[[], Any]) -> CalculatorResponse:
+    """Run one evaluation and wrap the outcome in a calculator response"""
     try:
-        result = eval(request.expression, {"__builtins__": {}}, {})
+        result = evaluate_fn()
         return CalculatorResponse(
             success=True,
             result=result,
             message=f"Calculation result: {result}"
         )
-    except Exception as e:
-        return CalculatorResponse(
-            success=False,
-            result=None,
-            message="I was unable to help with that request right now. Would you like to explore our products or outlets instead?"
-        )
+    except EvaluationError as e:
+        return _error_response(e)
+
+def compute(expression: str) -> CalculatorResponse:
+    """
+    Evaluate one expression.
+    This is the endpoint without HTTP, so the agent tools can call it in-process.
+    """
+    return _calculate(lambda: evaluate(expression))
+
+@router.post("/", response_model=CalculatorResponse)
+async def calculate(request: CalculatorRequest):
+    """Perform mathematical calculations"""
+    return compute(request.expression)
+
+@router.post("/batch", response_model=BatchCalculatorResponse)
+async def calculate_batch(request: BatchCalculatorRequest):
+    """
+    Perform many calculations in one request.
+
+    You are provided either a list of expressions
+    {
+        "expressions": ["79 * 0.85", "55.30 * 0.85"]
+    }
+    or a template with one set of bindings per result
+    {
+        "template": "price * (1 - discount)",
+        "bindings": [{"price": 79, "discount": 0.15}, {"price": 55.3, "discount": 0.15}]
+    }
+    """
+    if (request.expressions is None) == (request.template is None):
+        raise HTTPException(status_code=422, detail="Provide either expressions or template, not both")
+    if request.expressions is not None and request.bindings is not None:
+        raise HTTPException(status_code=422, detail="Bindings are only used with a template")
+    if request.template is not None and request.bindings is None:
+        raise HTTPException(status_code=422, detail="A template requires bindings")
+
+    size = len(request.expressions) if request.expressions is not None else len(request.bindings)
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"Batch is limited to {MAX_BATCH_SIZE} calculations")
+
+    if request.expressions is not None:
+        results = [_calculate(lambda expression=expression: evaluate(expression)) for expression in request.expressions]
+    else:
+        # Compile the template once and reuse it for every binding
+        try:
+            compiled = compile_expression(request.template)
+        except EvaluationError as e:
+            results = [_error_response(e)] * size
+        else:
+            results = [_calculate(lambda variables=variables: run(compiled, variables)) for variables in request.bindings]
+
+    failed = sum(1 for result in results if not result.success)
+    return BatchCalculatorResponse(
+        success=failed == 0,
+        results=results,
+        count=len(results),
+        failed=failed
+    )
 
 @router.get("/health")
 async def health():
     """Health check for calculator"""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
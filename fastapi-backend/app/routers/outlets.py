@@ -1,19 +1,22 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.orm import sessionmaker
 from openai import OpenAI
 import os
 import math
 import threading
 from pathlib import Path
+from ..timing import StageTimer
+from ..deadline import remaining
 
 router = APIRouter(prefix="/outlets", tags=["outlets"])
 
+# Longest the text-to-SQL call may take, less if the caller's deadline is sooner
+SQL_LLM_TIMEOUT = 15
+
 # Global variables
 _engine = None
-_session = None
 _openai_client = None
 _schema = None
 _init_lock = threading.Lock()
@@ -21,7 +24,7 @@ _initialized = False
 
 def _initialize():
     """Initialize database and OpenAI client    """
-    global _engine, _session, _openai_client, _schema, _initialized
+    global _engine, _openai_client, _schema, _initialized
     if _initialized:
         return
 
@@ -32,9 +35,9 @@ def _initialize():
 
         BASE_DIR = Path(__file__).resolve().parents[2]
         DB_PATH = BASE_DIR / "data" / "outlets" / "zus_outlets.db"
+        # Connections are checked out per call, so callers on any thread
+        # (including the agent's in-process transport) never share one
         _engine = create_engine(f"sqlite:///{DB_PATH}")
-        Session = sessionmaker(bind=_engine)
-        _session = Session()
 
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
@@ -189,7 +192,8 @@ def _text_to_sql(query: str) -> str:
                 {"role": "user", "content": prompt}
             ],
             max_tokens=300,
-            temperature=0
+            temperature=0,
+            timeout=remaining(SQL_LLM_TIMEOUT)
         )
         
         sql_query = response.choices[0].message.content.strip()
@@ -222,13 +226,16 @@ def _validate_sql(sql_query: str) -> bool:
     
     return True
 
-def _execute_sql(sql_query: str) -> Dict[str, Any]:
+def _execute_sql(sql_query: str, timer: Optional[StageTimer] = None) -> Dict[str, Any]:
     """Execute SQL query safely"""
     _initialize()
+    timer = timer or StageTimer("outlets")
     
     try:
         # Validate query
-        if not _validate_sql(sql_query):
+        with timer.stage("validation"):
+            is_valid = _validate_sql(sql_query)
+        if not is_valid:
             return {
                 'success': False,
                 'sql': sql_query,
@@ -238,17 +245,19 @@ def _execute_sql(sql_query: str) -> Dict[str, Any]:
             }
         
         # Execute query
-        result = _session.execute(text(sql_query))
-        rows = result.fetchall()
-        columns = result.keys()
-        
-        # Convert to list of dictionaries
-        results = []
-        for row in rows:
-            row_dict = {}
-            for col, value in zip(columns, row):
-                row_dict[col] = value
-            results.append(row_dict)
+        with timer.stage("execute"):
+            with _engine.connect() as connection:
+                result = connection.execute(text(sql_query))
+                rows = result.fetchall()
+                columns = result.keys()
+            
+            # Convert to list of dictionaries
+            results = []
+            for row in rows:
+                row_dict = {}
+                for col, value in zip(columns, row):
+                    row_dict[col] = value
+                results.append(row_dict)
         
         return {
             'success': True,
@@ -288,8 +297,85 @@ class NearestOutletsResponse(BaseModel):
     count: int
     error: Optional[str] = None
     
+def search(query: str, timer: Optional[StageTimer] = None) -> OutletQueryResponse:
+    """
+    Answer a natural language outlet query.
+    This is the endpoint without HTTP, so the agent tools can call it in-process.
+    """
+    timer = timer or StageTimer("outlets")
+    
+    # Convert natural language to SQL
+    with timer.stage("llm"):
+        sql_query = _text_to_sql(query)
+    
+    # Execute the SQL
+    result = _execute_sql(sql_query, timer)
+    
+    return OutletQueryResponse(
+        query=query,
+        sql=result['sql'],
+        success=result['success'],
+        results=result['results'],
+        count=result['count'],
+        error=result.get('error')
+    )
+
+def nearest(
+    latitude: float,
+    longitude: float,
+    limit: int = 3,
+    timer: Optional[StageTimer] = None
+) -> NearestOutletsResponse:
+    """
+    Find the outlets nearest to a coordinate.
+    This is the endpoint without HTTP, so the agent tools can call it in-process.
+    """
+    _initialize()
+    timer = timer or StageTimer("outlets_nearest")
+    
+    # Get all outlets with coordinates
+    with timer.stage("execute"):
+        query = "SELECT * FROM outlets WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+        with _engine.connect() as connection:
+            result = connection.execute(text(query))
+            rows = result.fetchall()
+            columns = result.keys()
+    
+    with timer.stage("rank"):
+        # Convert to list of dicts and calculate distances
+        outlets_with_distance = []
+        for row in rows:
+            outlet = {}
+            for col, value in zip(columns, row):
+                outlet[col] = value
+            
+            # Calculate distance
+            distance = calculate_distance(
+                latitude,
+                longitude,
+                outlet['latitude'],
+                outlet['longitude']
+            )
+            outlet['distance_km'] = distance
+            outlets_with_distance.append(outlet)
+        
+        # Sort by distance and limit results
+        sorted_outlets = sorted(outlets_with_distance, key=lambda x: x['distance_km'])
+        nearest_outlets = sorted_outlets[:limit]
+    
+    return NearestOutletsResponse(
+        success=True,
+        user_location={
+            "latitude": latitude,
+            "longitude": longitude
+        },
+        results=nearest_outlets,
+        count=len(nearest_outlets)
+    )
+    
 @router.get("/", response_model=OutletQueryResponse)
-async def query_outlets(
+def query_outlets(
+    response: Response,
     query: str = Query(..., description="Natural language query about outlets")
 ):
     """
@@ -307,26 +393,16 @@ async def query_outlets(
     - "Show me all outlets with their phone numbers"
     """
     try:
-        # Convert natural language to SQL
-        sql_query = _text_to_sql(query)
-        
-        # Execute the SQL
-        result = _execute_sql(sql_query)
-        
-        return OutletQueryResponse(
-            query=query,
-            sql=result['sql'],
-            success=result['success'],
-            results=result['results'],
-            count=result['count'],
-            error=result.get('error')
-        )
+        timer = StageTimer("outlets")
+        query_response = search(query, timer)
+        timer.apply(response)
+        return query_response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/nearest", response_model=NearestOutletsResponse)
-async def get_nearest_outlets(request: NearestOutletsRequest):
+def get_nearest_outlets(request: NearestOutletsRequest, response: Response):
     """
     Find the nearest ZUS Coffee outlets based on user's GPS coordinates.
     
@@ -338,50 +414,16 @@ async def get_nearest_outlets(request: NearestOutletsRequest):
     }
     """
     try:
-        _initialize()
-        
-        # Get all outlets with coordinates
-        query = "SELECT * FROM outlets WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
-        result = _session.execute(text(query))
-        rows = result.fetchall()
-        columns = result.keys()
-        
-        # Convert to list of dicts and calculate distances
-        outlets_with_distance = []
-        for row in rows:
-            outlet = {}
-            for col, value in zip(columns, row):
-                outlet[col] = value
-            
-            # Calculate distance
-            distance = calculate_distance(
-                request.latitude,
-                request.longitude,
-                outlet['latitude'],
-                outlet['longitude']
-            )
-            outlet['distance_km'] = distance
-            outlets_with_distance.append(outlet)
-        
-        # Sort by distance and limit results
-        sorted_outlets = sorted(outlets_with_distance, key=lambda x: x['distance_km'])
-        nearest_outlets = sorted_outlets[:request.limit]
-        
-        return NearestOutletsResponse(
-            success=True,
-            user_location={
-                "latitude": request.latitude,
-                "longitude": request.longitude
-            },
-            results=nearest_outlets,
-            count=len(nearest_outlets)
-        )
+        timer = StageTimer("outlets_nearest")
+        nearest_response = nearest(request.latitude, request.longitude, request.limit, timer)
+        timer.apply(response)
+        return nearest_response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/schema")
-async def get_schema():
+def get_schema():
     """Get the database schema"""
     try:
         _initialize()
@@ -392,13 +434,13 @@ async def get_schema():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/health")
-async def health():
+def health():
     """Health check endpoint"""
     try:
         _initialize()
         # Test query to check database connection
-        result = _session.execute(text("SELECT COUNT(*) FROM outlets"))
-        count = result.scalar()
+        with _engine.connect() as connection:
+            count = connection.execute(text("SELECT COUNT(*) FROM outlets")).scalar()
         return {
             "status": "healthy",
             "outlets_count": count
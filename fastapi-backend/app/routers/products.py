@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Response
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import faiss
 import pickle
 from sentence_transformers import SentenceTransformer
 from pathlib import Path
 import threading
+from ..timing import StageTimer
 
 router = APIRouter(prefix="/products", tags=["products"])
 
@@ -13,12 +14,17 @@ router = APIRouter(prefix="/products", tags=["products"])
 _model = None
 _index = None
 _products = None
+_neighbors = None
+# Stable product ID -> row in _products, and FAISS label -> row
+_id_to_row = None
+_label_to_row = None
+_index_config = None
 _init_lock = threading.Lock()
 _initialized = False
 
 def _initialize():
     """Initialize the vector store"""
-    global _model, _index, _products, _initialized
+    global _model, _index, _products, _neighbors, _id_to_row, _label_to_row, _index_config, _initialized
     if _initialized:
         return
 
@@ -38,6 +44,26 @@ def _initialize():
         with open(PICKLE_PATH, 'rb') as f:
             data = pickle.load(f)
             _products = data.get('products', data) if isinstance(data, dict) else data
+            _neighbors = data.get('neighbors') if isinstance(data, dict) else None
+            id_to_label = data.get('id_to_label') if isinstance(data, dict) else None
+            _index_config = data.get('index_config', {}) if isinstance(data, dict) else {}
+
+        if not id_to_label:
+            raise ValueError("Product data has no stable IDs. Please re-run ingestion script.")
+
+        if _index_config.get('metric') != 'cosine':
+            raise ValueError("Product index is not a cosine index. Please re-run ingestion script.")
+
+        # Float16 and reduced-dimension indexes are saved with their projection
+        # (IndexPreTransform), so queries only need to match the model's dimension
+        if _index.d != _model.get_sentence_embedding_dimension():
+            raise ValueError(
+                f"Index expects {_index.d}-dim queries but the model produces "
+                f"{_model.get_sentence_embedding_dimension()}. Please re-run ingestion script."
+            )
+
+        _id_to_row = {product['id']: row for row, product in enumerate(_products)}
+        _label_to_row = {label: _id_to_row[product_id] for product_id, label in id_to_label.items()}
 
         _initialized = True
         print(f"Loaded {_index.ntotal} vectors and {len(_products)} products")
@@ -45,71 +71,103 @@ def _initialize():
 
 # Response models
 class Product(BaseModel):
+    id: str
     name: str
     category: str
     price: str
     description: str = ""
     image_url: str = ""
     url: str = ""
+    # Cosine similarity to the query or source product, when there is one
+    score: Optional[float] = None
 
 class ProductSearchResponse(BaseModel):
     query: str
     products: List[Product]
     count: int
     top_k: int
+    min_score: Optional[float] = None
 
-@router.get("/", response_model=ProductSearchResponse)
-async def search_products(
-    query: str = Query(..., description="Search query for products"),
-    top_k: int = Query(3, ge=1, le=10, description="Number of results to return")
-):
+class SimilarProductsResponse(BaseModel):
+    product: Product
+    similar: List[Product]
+    count: int
+    top_k: int
+
+def _to_product(product: dict, score: Optional[float] = None) -> Product:
+    """Convert a stored product record into the response model"""
+    return Product(
+        score=score,
+        id=product['id'],
+        name=product.get('name', 'Unknown'),
+        category=product.get('category', 'N/A'),
+        price=product.get('price', 'N/A'),
+        description=product.get('detailed_description', ''),
+        image_url=product.get('image_url', ''),
+        url=product.get('url', '')
+    )
+
+def search(
+    query: str,
+    top_k: int = 3,
+    min_score: Optional[float] = None,
+    timer: Optional[StageTimer] = None
+) -> ProductSearchResponse:
     """
-    Search ZUS Coffee drinkware products using semantic vector search.
-    Returns raw product data without AI summary.
-    
-    Example: GET /products?query=thermal+bottle&top_k=3
+    Run a semantic product search.
+    This is the endpoint without HTTP, so the agent tools can call it in-process.
     """
-    try:
-        _initialize()
-        
-        # Encode the query
-        query_embedding = _model.encode([query], convert_to_numpy=True)
-        
-        # Search in FAISS index
-        distances, indices = _index.search(
-            query_embedding.astype('float32'), 
-            top_k
-        )
-        
-        # Collect results
+    _initialize()
+    
+    timer = timer or StageTimer("products")
+    
+    # Encode and normalize the query so inner product is cosine similarity
+    with timer.stage("encode"):
+        query_embedding = _model.encode([query], convert_to_numpy=True).astype('float32')
+        faiss.normalize_L2(query_embedding)
+    
+    # Search in FAISS index, which returns product labels
+    with timer.stage("search"):
+        scores, labels = _index.search(query_embedding, top_k)
+    
+    # Collect results
+    with timer.stage("serialize"):
         results = []
-        print(f"Search returned indices: {indices[0]}, distances: {distances[0]}")
-        print(f"Total products available: {len(_products)}")
-        
-        for idx, dist in zip(indices[0], distances[0]):
-            print(f"Processing index {idx}, distance {dist}")
-            if idx < len(_products):
-                product = _products[idx]
-                print(f"Found product: {product.get('name', 'Unknown')}")
-                results.append(Product(
-                    name=product.get('name', 'Unknown'),
-                    category=product.get('category', 'N/A'),
-                    price=product.get('price', 'N/A'),
-                    description=product.get('detailed_description', ''),
-                    image_url=product.get('image_url', ''),
-                    url=product.get('url', '')
-                ))
-            else:
-                print(f"Index {idx} is out of range!")
-        
-        print(f"Returning {len(results)} results")
+        for label, score in zip(labels[0], scores[0]):
+            # Results are sorted by score, so everything after this is weaker
+            if min_score is not None and score < min_score:
+                break
+            # -1 pads the results when top_k exceeds the number of products
+            row = _label_to_row.get(int(label))
+            if row is not None:
+                results.append(_to_product(_products[row], float(score)))
         
         return ProductSearchResponse(
             query=query,
             products=results,
             count=len(results),
-            top_k=top_k
+            top_k=top_k,
+            min_score=min_score
         )
+
+@router.get("/", response_model=ProductSearchResponse)
+def search_products(
+    response: Response,
+    query: str = Query(..., description="Search query for products"),
+    top_k: int = Query(3, ge=1, le=10, description="Number of results to return"),
+    min_score: Optional[float] = Query(None, ge=-1, le=1, description="Minimum cosine similarity for a result to be returned")
+):
+    """
+    Search ZUS Coffee drinkware products using semantic vector search.
+    Returns raw product data without AI summary.
+    
+    Example: GET /products?query=thermal+bottle&top_k=3&min_score=0.3
+    """
+    try:
+        timer = StageTimer("products")
+        search_response = search(query, top_k, min_score, timer)
+        timer.apply(response)
+        return search_response
         
     except FileNotFoundError as e:
         raise HTTPException(
@@ -120,16 +178,79 @@ async def search_products(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/health")
-async def health():
+def health():
     """Health check endpoint"""
     try:
         _initialize()
         return {
             "status": "healthy",
-            "products_loaded": _index.ntotal if _index else 0
+            "products_loaded": _index.ntotal if _index else 0,
+            "index_config": _index_config
         }
     except Exception as e:
         return {
             "status": "error",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+def _load_or_raise():
+    """Initialize the vector store, mapping failures to HTTP errors"""
+    try:
+        _initialize()
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=500,
+            detail="Product data not found. Please run ingestion script first."
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _get_row_or_404(product_id: str) -> int:
+    """Resolve a product ID to its row"""
+    row = _id_to_row.get(product_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Product '{product_id}' not found")
+    return row
+
+@router.get("/{product_id}", response_model=Product)
+def get_product(product_id: str):
+    """
+    Get a single product by its stable ID.
+    
+    Example: GET /products/all-day-cup-500ml-17oz-aqua-collection
+    """
+    _load_or_raise()
+    return _to_product(_products[_get_row_or_404(product_id)])
+
+@router.get("/{product_id}/similar", response_model=SimilarProductsResponse)
+def similar_products(
+    product_id: str,
+    top_k: int = Query(3, ge=1, le=10, description="Number of similar products to return")
+):
+    """
+    Get products similar to a given product.
+    Served from the neighbor graph built during ingestion, so no query is encoded.
+    
+    Example: GET /products/all-day-cup-500ml-17oz-aqua-collection/similar?top_k=3
+    """
+    _load_or_raise()
+    
+    if _neighbors is None:
+        raise HTTPException(
+            status_code=500,
+            detail="Similar products not available. Please re-run ingestion script."
+        )
+    
+    row = _get_row_or_404(product_id)
+    similar = [
+        _to_product(_products[_id_to_row[neighbor_id]], score)
+        for neighbor_id, score in _neighbors.get(product_id, [])
+        if neighbor_id in _id_to_row
+    ][:top_k]
+    
+    return SimilarProductsResponse(
+        product=_to_product(_products[row]),
+        similar=similar,
+        count=len(similar),
+        top_k=top_k
+    )
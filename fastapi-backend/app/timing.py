@@ -0,0 +1,91 @@
+"""Per-stage request timing for the routers"""
+
+from contextlib import contextmanager
+from typing import Dict, Tuple
+from fastapi import Response
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        for i, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                self.counts[i] += 1
+        self.total += seconds
+        self.count += 1
+
+class MetricsRegistry:
+    """Process-wide stage latency histograms, keyed by (router, stage)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+
+    def observe(self, router: str, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get((router, stage))
+            if histogram is None:
+                histogram = self._histograms[(router, stage)] = Histogram()
+            histogram.observe(seconds)
+
+    def render(self) -> str:
+        """Render all histograms in the Prometheus text exposition format"""
+        name = "zus_api_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each request stage",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for (router, stage), histogram in sorted(self._histograms.items()):
+                labels = f'router="{router}",stage="{stage}"'
+                for upper, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{name}_bucket{{{labels},le="{upper}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+class StageTimer:
+    """
+    Times the stages of a single request.
+    Each stage is recorded into the shared histograms and can be sent
+    back to the client as a Server-Timing header.
+    """
+
+    def __init__(self, router: str):
+        self.router = router
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed
+            metrics.observe(self.router, name, elapsed)
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.2f}"
+            for name, seconds in self.durations.items()
+        )
+
+    def apply(self, response: Response):
+        """Attach the recorded stages to the response as Server-Timing"""
+        if self.durations:
+            response.headers["Server-Timing"] = self.server_timing()
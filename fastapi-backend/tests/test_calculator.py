@@ -0,0 +1,110 @@
+"""Tests for the calculator endpoints, including batch calculations."""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import calculator
+
+
+@pytest.fixture
+def client():
+    """Client for an app with only the calculator router, so no models or data load."""
+    app = FastAPI()
+    app.include_router(calculator.router)
+    return TestClient(app)
+
+
+def test_single_calculation(client):
+    response = client.post("/calculator/", json={"expression": "50 * 15 / 100"})
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    assert response.json()["result"] == 7.5
+
+
+def test_single_calculation_error(client):
+    body = client.post("/calculator/", json={"expression": "9 ** 9 ** 9"}).json()
+    assert body["success"] is False
+    assert body["error"] == "limit_exceeded"
+
+
+def test_batch_expressions(client):
+    response = client.post("/calculator/batch", json={"expressions": ["79 * 0.85", "1 + 1"]})
+    body = response.json()
+
+    assert response.status_code == 200
+    assert body["success"] is True
+    assert body["count"] == 2
+    assert body["failed"] == 0
+    assert [result["result"] for result in body["results"]] == [pytest.approx(67.15), 2]
+
+
+def test_batch_template(client):
+    response = client.post("/calculator/batch", json={
+        "template": "price * (1 - discount)",
+        "bindings": [{"price": 100, "discount": 0.15}, {"price": 40, "discount": 0.5}]
+    })
+    body = response.json()
+
+    assert response.status_code == 200
+    assert body["success"] is True
+    assert [result["result"] for result in body["results"]] == [pytest.approx(85.0), pytest.approx(20.0)]
+
+
+def test_batch_errors_are_per_row(client):
+    body = client.post("/calculator/batch", json={"expressions": ["1 + 1", "1 / 0", "2 ** 100", "abs(1)"]}).json()
+
+    assert body["success"] is False
+    assert body["count"] == 4
+    assert body["failed"] == 3
+    assert [result["success"] for result in body["results"]] == [True, False, False, False]
+    assert [result["error"] for result in body["results"]] == [None, "invalid_expression", "limit_exceeded", "invalid_expression"]
+
+
+def test_batch_template_row_errors(client):
+    body = client.post("/calculator/batch", json={
+        "template": "total / people",
+        "bindings": [{"total": 10, "people": 2}, {"total": 10, "people": 0}, {"total": 10}]
+    }).json()
+
+    assert body["failed"] == 2
+    assert body["results"][0]["result"] == 5
+    assert body["results"][1]["detail"] == "Division by zero"
+    assert body["results"][2]["detail"] == "Unknown variable: people"
+
+
+def test_batch_invalid_template_fails_every_row(client):
+    body = client.post("/calculator/batch", json={
+        "template": "abs(price)",
+        "bindings": [{"price": 1}, {"price": 2}]
+    }).json()
+
+    assert body["count"] == 2
+    assert body["failed"] == 2
+    assert all(result["error"] == "invalid_expression" for result in body["results"])
+
+
+@pytest.mark.parametrize("payload", [
+    {},
+    {"template": "x * 2"},
+    {"bindings": [{"x": 1}]},
+    {"expressions": ["1"] * (calculator.MAX_BATCH_SIZE + 1)},
+], ids=["empty", "template_without_bindings", "bindings_only", "too_many"])
+def test_batch_rejects_bad_requests(client, payload):
+    assert client.post("/calculator/batch", json=payload).status_code == 422
+
+
+@pytest.mark.parametrize("payload, detail", [
+    ({"expressions": ["1 + 1"], "bindings": [{"x": 1}]}, "Bindings are only used with a template"),
+    ({"expressions": ["1 + 1"], "template": "x"}, "not both"),
+    ({"expressions": ["1 + 1"], "template": "x", "bindings": [{"x": 1}]}, "not both"),
+], ids=["expressions_and_bindings", "expressions_and_template", "everything"])
+def test_batch_rejects_mixed_inputs(client, payload, detail):
+    response = client.post("/calculator/batch", json=payload)
+
+    assert response.status_code == 422
+    assert detail in response.json()["detail"]
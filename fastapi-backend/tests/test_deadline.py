@@ -0,0 +1,156 @@
+"""Tests for honoring the caller's request deadline."""
+
+import asyncio
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.deadline import DEADLINE_HEADER, deadline_middleware, remaining, request_deadline
+from app.routers import outlets, products
+
+# How long the slow endpoints block for
+BLOCK_SECONDS = 0.5
+
+
+def _response_start(app, path, headers):
+    """
+    Status of the app's response to a GET, and the seconds until it started.
+    Measured at the ASGI level, since TestClient returns only once the whole
+    app call does, and that waits for a blocking handler's thread.
+    """
+    started = time.monotonic()
+    response = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start" and not response:
+            response["status"] = message["status"]
+            response["after"] = time.monotonic() - started
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    return response["status"], response["after"]
+
+
+def _app():
+    """An app with the deadline middleware and a few test endpoints."""
+    app = FastAPI()
+    app.middleware("http")(deadline_middleware)
+
+    @app.get("/remaining")
+    def sync_remaining():
+        return {"remaining": remaining()}
+
+    @app.get("/async-remaining")
+    async def async_remaining():
+        return {"remaining": remaining(), "capped": remaining(0.01)}
+
+    @app.get("/blocking")
+    def blocking():
+        time.sleep(BLOCK_SECONDS)
+        return {"done": True}
+
+    return app
+
+
+@pytest.fixture
+def client():
+    return TestClient(_app())
+
+
+def test_no_header_means_no_deadline(client):
+    assert client.get("/remaining").json() == {"remaining": None}
+
+
+def test_remaining_is_visible_in_handlers(client):
+    headers = {DEADLINE_HEADER: "5000"}
+
+    # Plain def handlers run in the threadpool, which copies the context
+    assert 4 < client.get("/remaining", headers=headers).json()["remaining"] <= 5
+
+    body = client.get("/async-remaining", headers=headers).json()
+    assert 4 < body["remaining"] <= 5
+    assert body["capped"] == 0.01
+
+
+@pytest.mark.parametrize("header", ["0", "-50"])
+def test_expired_deadline_is_refused(client, header):
+    response = client.get("/remaining", headers={DEADLINE_HEADER: header})
+
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+
+
+@pytest.mark.parametrize("header", ["soon", "1.5", ""])
+def test_invalid_header_is_rejected(client, header):
+    response = client.get("/remaining", headers={DEADLINE_HEADER: header})
+
+    assert response.status_code == 400
+    assert DEADLINE_HEADER in response.json()["detail"]
+
+
+def test_deadline_passing_mid_request():
+    status, after = _response_start(_app(), "/blocking", {DEADLINE_HEADER: "100"})
+
+    assert status == 504
+    # Answered at the deadline, not when the handler finished
+    assert after < BLOCK_SECONDS
+
+
+def test_within_deadline_is_answered(client):
+    response = client.get("/remaining", headers={DEADLINE_HEADER: "2000"})
+
+    assert response.status_code == 200
+
+
+def test_request_deadline_is_scoped():
+    assert remaining() is None
+    with request_deadline(2):
+        assert 1 < remaining() <= 2
+        assert remaining(0.5) == 0.5
+    assert remaining() is None
+
+
+@pytest.mark.parametrize("router", [outlets.router, products.router], ids=["outlets", "products"])
+def test_blocking_endpoints_run_in_the_threadpool(router):
+    # An async def endpoint that blocks would hold the event loop, and the
+    # middleware couldn't answer 504 until it returned
+    for route in router.routes:
+        assert not asyncio.iscoroutinefunction(route.endpoint), route.path
+
+
+def test_blocking_outlet_query_gets_504_at_the_deadline(monkeypatch):
+    def slow_search(query, timer=None):
+        time.sleep(BLOCK_SECONDS)
+        raise AssertionError("answered after the deadline")
+
+    monkeypatch.setattr(outlets, "search", slow_search)
+    app = FastAPI()
+    app.middleware("http")(deadline_middleware)
+    app.include_router(outlets.router)
+
+    status, after = _response_start(app, "/outlets/?query=outlets+in+SS2", {DEADLINE_HEADER: "100"})
+
+    assert status == 504
+    assert after < BLOCK_SECONDS
@@ -0,0 +1,135 @@
+"""Tests for the calculator's bounded arithmetic evaluator."""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.evaluator import (
+    MAX_EXPONENT, MAX_EXPRESSION_LENGTH, MAX_MAGNITUDE, MAX_NODES,
+    EvaluationError, LimitExceededError, compile_expression, evaluate
+)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("1 + 2 * 3", 7),
+    ("(1 + 2) * 3", 9),
+    ("7 / 2", 3.5),
+    ("7 // 2", 3),
+    ("7 % 4", 3),
+    ("-3 + +2", -1),
+    ("(50 * 15 / 100)", 7.5),
+    ("2 ** 10", 1024),
+    ("2 ** -1", 0.5),
+])
+def test_arithmetic(expression, expected):
+    assert evaluate(expression) == expected
+
+
+def test_variables():
+    assert evaluate("price * (1 - discount)", {"price": 100, "discount": 0.15}) == 85.0
+
+    with pytest.raises(EvaluationError, match="Unknown variable: price"):
+        evaluate("price * 2")
+    with pytest.raises(EvaluationError, match="not a number"):
+        evaluate("price * 2", {"price": "100"})
+
+
+def test_exponent_limit():
+    assert evaluate(f"1 ** {MAX_EXPONENT}") == 1
+
+    with pytest.raises(LimitExceededError, match="Exponent"):
+        evaluate(f"2 ** {MAX_EXPONENT + 1}")
+    # 9**9 is within the magnitude limit, but far past the exponent limit
+    with pytest.raises(LimitExceededError):
+        evaluate("9 ** 9 ** 9")
+
+
+def test_magnitude_limit():
+    with pytest.raises(LimitExceededError, match="Value exceeds"):
+        evaluate(f"{int(MAX_MAGNITUDE)} * 10")
+    with pytest.raises(LimitExceededError):
+        evaluate("2 ** 60")
+    with pytest.raises(LimitExceededError):
+        evaluate("x + 1", {"x": MAX_MAGNITUDE * 2})
+
+
+def test_length_limit():
+    expression = "1+" * (MAX_EXPRESSION_LENGTH // 2) + "1"
+    assert len(expression) > MAX_EXPRESSION_LENGTH
+
+    with pytest.raises(LimitExceededError, match="longer than"):
+        evaluate(expression)
+
+
+def test_node_limit():
+    expression = "+".join(["1"] * 40)
+    assert len(expression) <= MAX_EXPRESSION_LENGTH
+
+    with pytest.raises(LimitExceededError, match=f"more than {MAX_NODES} parts"):
+        evaluate(expression)
+
+
+@pytest.mark.parametrize("expression", ["1 / 0", "1 // 0", "1 % 0", "x / y"])
+def test_division_by_zero(expression):
+    with pytest.raises(EvaluationError, match="Division by zero") as error:
+        evaluate(expression, {"x": 1, "y": 0})
+    assert error.value.code == "invalid_expression"
+
+
+def test_complex_result():
+    with pytest.raises(EvaluationError, match="not a real number") as error:
+        evaluate("(-8) ** 0.5")
+    assert error.value.code == "invalid_expression"
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('ls')",
+    "abs(-1)",
+    "(1).real",
+    "[1, 2]",
+    "'a' * 3",
+    "1 if 1 else 2",
+    "lambda: 1",
+    "1 < 2",
+    "True + 1",
+    "1 & 3",
+])
+def test_rejected_syntax(expression):
+    with pytest.raises(EvaluationError) as error:
+        evaluate(expression)
+    assert not isinstance(error.value, LimitExceededError)
+    assert error.value.code == "invalid_expression"
+
+
+def test_invalid_syntax():
+    with pytest.raises(EvaluationError, match="not valid arithmetic"):
+        evaluate("1 +")
+
+
+def test_error_codes():
+    assert EvaluationError.code == "invalid_expression"
+    assert LimitExceededError.code == "limit_exceeded"
+    assert issubclass(LimitExceededError, EvaluationError)
+
+
+def test_compiled_expressions_are_cached():
+    compile_expression.cache_clear()
+    compiled = compile_expression("price * 2")
+    assert compile_expression("price * 2") is compiled
+
+    info = compile_expression.cache_info()
+    assert info.hits == 1 and info.misses == 1
+
+    # One compiled form serves every binding
+    assert compiled({"price": 2}) == 4
+    assert compiled({"price": 3}) == 6
+
+
+def test_invalid_expressions_are_not_cached():
+    compile_expression.cache_clear()
+    for _ in range(2):
+        with pytest.raises(EvaluationError):
+            compile_expression("abs(1)")
+    assert compile_expression.cache_info().currsize == 0
@@ -0,0 +1,90 @@
+"""
+Benchmark end-to-end agent turn latency with the template renderer against
+the LLM summary call.
+
+Runs each query through a fresh agent in both summary modes and prints the
+mean, median and p95 turn latency per mode. Needs OPENAI_API_KEY and a
+reachable API (ZUS_API_BASE_URL, or the hosted API by default).
+
+Usage: python scripts/benchmark_summary.py [--rounds 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Measure the planner and tool calls on every turn rather than cached
+# results or local routing
+os.environ["TOOL_CACHE_TTL"] = "0"
+os.environ["RESPONSE_CACHE_TTL"] = "0"
+os.environ["INTENT_ROUTER"] = "off"
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Agent"))
+
+from agent import create_agent
+
+QUERIES = [
+    "What mugs do you have?",
+    "Show me tumblers",
+    "Show me outlets in Petaling Jaya",
+    "Find outlets in Shah Alam",
+    "Show me the nearest outlets",
+]
+
+# Used for the nearest outlet query
+USER_LOCATION = {"latitude": 3.1191791750227895, "longitude": 101.63313809936191}
+
+
+def run_turn(mode: str, query: str) -> float:
+    """Run one turn on a fresh agent and return its latency in seconds"""
+    agent = create_agent(f"benchmark_{mode}", summary_mode=mode)
+    agent.update_context("user_location", USER_LOCATION)
+    start = time.perf_counter()
+    agent.execute(query)
+    return time.perf_counter() - start
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def main(rounds: int):
+    results = {"template": [], "llm": []}
+
+    for round_number in range(1, rounds + 1):
+        print(f"Round {round_number}/{rounds}")
+        for query in QUERIES:
+            # Alternate which mode goes first so neither always runs warm
+            modes = ["template", "llm"] if round_number % 2 else ["llm", "template"]
+            for mode in modes:
+                results[mode].append(run_turn(mode, query))
+
+    print("\n" + "=" * 60)
+    print(f"Turn latency over {rounds} round(s) of {len(QUERIES)} queries")
+    print("=" * 60)
+    print(f"{'mode':<10}{'mean (s)':>12}{'median (s)':>12}{'p95 (s)':>12}")
+    for mode, latencies in results.items():
+        print(
+            f"{mode:<10}{statistics.mean(latencies):>12.2f}"
+            f"{statistics.median(latencies):>12.2f}"
+            f"{percentile(latencies, 95):>12.2f}"
+        )
+
+    saved = statistics.mean(results["llm"]) - statistics.mean(results["template"])
+    print(f"\nTemplate rendering saves {saved:.2f}s per turn on average "
+          f"({saved / statistics.mean(results['llm']) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark template vs LLM summaries")
+    parser.add_argument("--rounds", type=int, default=5, help="times to run each query per mode")
+    args = parser.parse_args()
+    main(args.rounds)
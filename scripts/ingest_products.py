@@ -1,20 +1,54 @@
+import argparse
 import json
 import os
+import re
+import hashlib
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 import faiss
 from sentence_transformers import SentenceTransformer
 import pickle
+from urllib.parse import urlparse
+
+STORAGE_TYPES = ('float32', 'float16')
+TRANSFORM_TYPES = ('pca', 'opq')
+# OPQ trains a product quantizer with 256 centroids per sub-space
+OPQ_MIN_TRAINING_POINTS = 256
 
 class ProductVectorStore:
-    def __init__(self, model_name='sentence-transformers/all-MiniLM-L6-v2'):
-        """Initialize vector store with sentence transformer model"""
+    def __init__(self, model_name='sentence-transformers/all-MiniLM-L6-v2',
+                 storage: str = 'float32', reduced_dim: Optional[int] = None, transform: str = 'pca'):
+        """
+        Initialize vector store with sentence transformer model.
+        
+        Args:
+            model_name: Sentence transformer used for embeddings
+            storage: 'float32' for full precision or 'float16' for half-precision vectors
+            reduced_dim: Optional number of dimensions to project embeddings down to
+            transform: 'pca' or 'opq' projection used when reduced_dim is set
+        """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"storage must be one of {STORAGE_TYPES}")
+        if transform not in TRANSFORM_TYPES:
+            raise ValueError(f"transform must be one of {TRANSFORM_TYPES}")
+        
         print(f"Loading embedding model: {model_name}")
         self.model = SentenceTransformer(model_name)
         self.dimension = self.model.get_sentence_embedding_dimension()
+        self.storage = storage
+        self.reduced_dim = reduced_dim
+        self.transform = transform
+        if reduced_dim is not None and not 0 < reduced_dim < self.dimension:
+            raise ValueError(f"reduced_dim must be between 1 and {self.dimension - 1}")
         self.index = None
+        self.embeddings = None
         self.products = []
         self.product_texts = []
+        self.neighbors = {}
+        # Stable product ID -> row in self.products, and -> FAISS label
+        self.id_to_row = {}
+        self.id_to_label = {}
+        self.label_to_row = {}
         
     def create_product_text(self, product: Dict) -> str:
         """Create searchable text representation of product"""
@@ -38,55 +72,262 @@ class ProductVectorStore:
         
         return ' | '.join(parts)
     
-    def ingest_products(self, products: List[Dict]):
+    def create_product_id(self, product: Dict) -> str:
+        """
+        Create a stable ID for a product.
+        Uses the shop URL handle, which survives re-scrapes and re-ordering,
+        and falls back to a slug of the product name.
+        """
+        if product.get('id'):
+            return str(product['id'])
+        
+        handle = ''
+        if product.get('url'):
+            handle = urlparse(product['url']).path.rstrip('/').split('/')[-1]
+        if not handle:
+            handle = re.sub(r'[^a-z0-9]+', '-', product.get('name', '').lower()).strip('-')
+        
+        return handle or 'product'
+    
+    @staticmethod
+    def create_label(product_id: str) -> int:
+        """Map a product ID to a non-negative 64-bit FAISS label"""
+        digest = hashlib.sha1(product_id.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') & 0x7FFFFFFFFFFFFFFF
+    
+    def _assign_ids(self, products: List[Dict]) -> List[Dict]:
+        """
+        Return copies of the products with an 'id' field, unique within the batch.
+        Explicit IDs are kept as given and must be unique; generated IDs get a
+        numbered suffix when they clash with an explicit ID or an earlier product.
+        """
+        explicit = set()
+        for product in products:
+            if product.get('id'):
+                product_id = str(product['id'])
+                if product_id in explicit:
+                    raise ValueError(f"Duplicate product id '{product_id}'")
+                explicit.add(product_id)
+        
+        taken = set(explicit)
+        assigned = []
+        for product in products:
+            product_id = self.create_product_id(product)
+            if not product.get('id'):
+                # Same handle scraped twice within one batch
+                base_id, suffix = product_id, 2
+                while product_id in taken:
+                    product_id = f"{base_id}-{suffix}"
+                    suffix += 1
+                taken.add(product_id)
+            assigned.append({**product, 'id': product_id})
+        return assigned
+    
+    def _build_lookup(self):
+        """Rebuild the ID -> row and label -> row hash indexes"""
+        self.id_to_row = {product['id']: row for row, product in enumerate(self.products)}
+        if len(self.id_to_row) != len(self.products):
+            raise ValueError("Product ids are not unique")
+        self.id_to_label = {product_id: self.create_label(product_id) for product_id in self.id_to_row}
+        self.label_to_row = {label: self.id_to_row[product_id] for product_id, label in self.id_to_label.items()}
+        if len(self.label_to_row) != len(self.id_to_label):
+            raise ValueError("Two product ids hash to the same FAISS label")
+    
+    def _encode(self, texts: List[str], show_progress_bar: bool = True) -> np.ndarray:
+        """
+        Generate L2-normalized float32 embeddings, so that inner product
+        equals cosine similarity
+        """
+        embeddings = self.model.encode(
+            texts,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True
+        )
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def ingest_products(self, products: List[Dict], neighbors_k: int = 10):
         """Ingest products into vector store"""
         print(f"\nIngesting {len(products)} products...")
         
-        self.products = products
+        self.products = self._assign_ids(products)
         self.product_texts = []
         
         # Create searchable text for each product
-        for product in products:
+        for product in self.products:
             text = self.create_product_text(product)
             self.product_texts.append(text)
         
         # Generate embeddings
         print("Generating embeddings...")
-        embeddings = self.model.encode(
-            self.product_texts,
-            show_progress_bar=True,
-            convert_to_numpy=True
-        )
+        embeddings = self._encode(self.product_texts)
         
-        # Create FAISS index
+        # Create FAISS index keyed by product label instead of position
         print("Building FAISS index...")
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(embeddings.astype('float32'))
+        self._build_lookup()
+        labels = np.array([self.id_to_label[p['id']] for p in self.products], dtype='int64')
+        self.index = self.create_index(embeddings)
+        self.index.add_with_ids(embeddings, labels)
+        self.embeddings = embeddings
+        
+        # Precompute similar products so the API never re-encodes for them
+        print("Building similar products graph...")
+        self.neighbors = self.build_neighbor_graph(embeddings, [p['id'] for p in self.products], neighbors_k)
         
         print(f"Vector store created with {self.index.ntotal} products")
     
+    def create_index(self, training_embeddings: np.ndarray) -> faiss.Index:
+        """
+        Create the FAISS inner product index for the configured storage options.
+        A projection is wrapped in IndexPreTransform so that searches on the
+        saved index apply the same transform to queries automatically.
+        """
+        dim = self.reduced_dim or self.dimension
+        
+        if self.storage == 'float16':
+            base_index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+        else:
+            base_index = faiss.IndexFlatIP(dim)
+        
+        if self.reduced_dim:
+            n_train = len(training_embeddings)
+            if self.transform == 'opq':
+                if n_train < OPQ_MIN_TRAINING_POINTS:
+                    raise ValueError(f"OPQ needs at least {OPQ_MIN_TRAINING_POINTS} products to train, got {n_train}")
+                # Largest sub-quantizer count (up to 16) that divides the output dimension
+                m = max(m for m in range(1, 17) if dim % m == 0)
+                projection = faiss.OPQMatrix(self.dimension, m, dim)
+            else:
+                if n_train < dim:
+                    raise ValueError(f"PCA to {dim} dimensions needs at least {dim} products to train, got {n_train}")
+                projection = faiss.PCAMatrix(self.dimension, dim)
+            # Projected vectors are no longer unit length, re-normalize for cosine scores
+            base_index = faiss.IndexPreTransform(faiss.NormalizationTransform(dim), base_index)
+            base_index.prepend_transform(projection)
+        
+        index = faiss.IndexIDMap2(base_index)
+        if not index.is_trained:
+            print(f"Training {self.transform.upper() if self.reduced_dim else self.storage} index...")
+            index.train(np.ascontiguousarray(training_embeddings, dtype='float32'))
+        return index
+    
+    def bytes_per_vector(self) -> int:
+        """Memory used by one stored vector in the index"""
+        dim = self.reduced_dim or self.dimension
+        return dim * (2 if self.storage == 'float16' else 4)
+    
+    def evaluate_recall(self, query_embeddings: np.ndarray, k: int = 5) -> float:
+        """
+        Measure recall@k of this index against an exact float32 IndexFlatL2
+        over the full-dimension embeddings from the last ingest.
+        Embeddings are unit length, so L2 ranks exactly like cosine similarity.
+        """
+        if self.index is None or self.embeddings is None:
+            raise ValueError("Vector store not initialized. Run ingest_products first.")
+        
+        k = min(k, len(self.embeddings))
+        queries = np.ascontiguousarray(query_embeddings, dtype='float32')
+        
+        exact_index = faiss.IndexFlatL2(self.dimension)
+        exact_index.add(self.embeddings)
+        _, exact_rows = exact_index.search(queries, k)
+        
+        row_labels = np.array([self.id_to_label[p['id']] for p in self.products], dtype='int64')
+        _, labels = self.index.search(queries, k)
+        
+        hits = sum(
+            len(set(row_labels[exact]) & set(found))
+            for exact, found in zip(exact_rows, labels)
+        )
+        return hits / float(len(queries) * k)
+    
+    def upsert_products(self, products: List[Dict], neighbors_k: int = 10):
+        """
+        Add new products or replace existing ones in place.
+        Existing products keep their IDs and rows, so nothing shifts.
+        """
+        if self.index is None:
+            raise ValueError("Vector store not initialized. Run ingest_products first.")
+        
+        products = self._assign_ids(products)
+        texts = [self.create_product_text(product) for product in products]
+        embeddings = self._encode(texts)
+        labels = np.array([self.create_label(p['id']) for p in products], dtype='int64')
+        
+        # Drop stale vectors for products being replaced, then add
+        self.index.remove_ids(labels)
+        self.index.add_with_ids(embeddings, labels)
+        
+        for product, text in zip(products, texts):
+            row = self.id_to_row.get(product['id'])
+            if row is None:
+                self.products.append(product)
+                self.product_texts.append(text)
+            else:
+                self.products[row] = product
+                self.product_texts[row] = text
+        self._build_lookup()
+        
+        # Refresh the graph from the vectors already stored in the index
+        product_ids = [p['id'] for p in self.products]
+        stored = np.vstack([self.index.reconstruct(self.id_to_label[pid]) for pid in product_ids])
+        self.neighbors = self.build_neighbor_graph(stored, product_ids, neighbors_k)
+        
+        print(f"Upserted {len(products)} products, index now holds {self.index.ntotal}")
+    
+    def build_neighbor_graph(self, embeddings: np.ndarray, product_ids: List[str], k: int = 10) -> Dict[str, List[List]]:
+        """
+        Build a k-nearest-neighbor graph over the product embeddings.
+        Returns, for every product ID, a list of [product_id, score] pairs
+        sorted by cosine similarity, excluding the product itself.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        k = min(k, len(embeddings) - 1)
+        if k <= 0:
+            return {product_id: [] for product_id in product_ids}
+        
+        graph_index = faiss.IndexFlatIP(embeddings.shape[1])
+        graph_index.add(embeddings)
+        # Ask for one extra neighbor since every product matches itself
+        scores, indices = graph_index.search(embeddings, k + 1)
+        
+        graph = {}
+        for row, (row_indices, row_scores) in enumerate(zip(indices, scores)):
+            neighbors = [
+                [product_ids[idx], float(score)]
+                for idx, score in zip(row_indices, row_scores)
+                if idx != row and idx != -1
+            ]
+            graph[product_ids[row]] = neighbors[:k]
+        
+        return graph
+    
+    def get_product(self, product_id: str) -> Dict:
+        """Look up a product by its stable ID"""
+        row = self.id_to_row.get(product_id)
+        return self.products[row] if row is not None else None
+    
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
         """Search for products using semantic similarity"""
         if self.index is None:
             raise ValueError("Vector store not initialized. Run ingest_products first.")
         
-        # Generate query embedding
-        query_embedding = self.model.encode([query], convert_to_numpy=True)
+        # Generate normalized query embedding
+        query_embedding = self._encode([query], show_progress_bar=False)
         
         # Search
-        distances, indices = self.index.search(
-            query_embedding.astype('float32'), 
-            top_k
-        )
+        scores, labels = self.index.search(query_embedding, top_k)
         
-        # Return results with scores
+        # Return results with cosine similarity scores
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.products):
+        for label, score in zip(labels[0], scores[0]):
+            row = self.label_to_row.get(int(label))
+            if row is not None:
                 result = {
-                    **self.products[idx],
-                    'score': float(distances[0][i]),
-                    'matched_text': self.product_texts[idx]
+                    **self.products[row],
+                    'score': float(score),
+                    'matched_text': self.product_texts[row]
                 }
                 results.append(result)
         
@@ -102,7 +343,16 @@ class ProductVectorStore:
         # Save products and texts
         data = {
             'products': self.products,
-            'product_texts': self.product_texts
+            'product_texts': self.product_texts,
+            'neighbors': self.neighbors,
+            'id_to_label': self.id_to_label,
+            'index_config': {
+                'dimension': self.dimension,
+                'metric': 'cosine',
+                'storage': self.storage,
+                'reduced_dim': self.reduced_dim,
+                'transform': self.transform if self.reduced_dim else None
+            }
         }
         with open(data_path, 'wb') as f:
             pickle.dump(data, f)
@@ -122,10 +372,16 @@ class ProductVectorStore:
             data = pickle.load(f)
             self.products = data['products']
             self.product_texts = data['product_texts']
+            self.neighbors = data.get('neighbors', {})
+            config = data.get('index_config', {})
+            self.storage = config.get('storage', 'float32')
+            self.reduced_dim = config.get('reduced_dim')
+            self.transform = config.get('transform') or 'pca'
         
+        self._build_lookup()
         print(f"Loaded {self.index.ntotal} products from index")
 
-def main():
+def main(storage: str = 'float32', reduced_dim: Optional[int] = None, transform: str = 'pca'):
     """Main ingestion pipeline"""
     # Paths
     products_file = 'data/products/drinkware.json'
@@ -148,7 +404,7 @@ def main():
     print(f"Loaded {len(products)} products")
     
     # Initialize vector store
-    vector_store = ProductVectorStore()
+    vector_store = ProductVectorStore(storage=storage, reduced_dim=reduced_dim, transform=transform)
     
     # Ingest products
     vector_store.ingest_products(products)
@@ -175,7 +431,35 @@ def main():
             print(f"{i}. {result['name']} - {result['price']}")
             print(f"   Score: {result['score']:.4f}")
     
+    # Compare compressed storage against the full 384-dim float32 index
+    if storage != 'float32' or reduced_dim:
+        queries = np.vstack([
+            vector_store._encode(test_queries, show_progress_bar=False),
+            vector_store.embeddings
+        ])
+        full_bytes = vector_store.dimension * 4
+        print(f"\nIndex memory: {vector_store.bytes_per_vector()} bytes per vector "
+              f"(float32 {vector_store.dimension}-dim: {full_bytes})")
+        for k in (1, 3, 5):
+            recall = vector_store.evaluate_recall(queries, k=k)
+            print(f"Recall@{k} vs float32 IndexFlatL2: {recall:.3f} (loss {1 - recall:.3f})")
+    
+    if vector_store.products:
+        first = vector_store.products[0]
+        print(f"\nSimilar to '{first['name']}' ({first['id']}):")
+        print("-" * 50)
+        for neighbor_id, score in vector_store.neighbors[first['id']][:3]:
+            print(f"- {vector_store.get_product(neighbor_id)['name']} (similarity {score:.4f})")
+    
     print("\nIngestion complete!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingest products into the FAISS vector store")
+    parser.add_argument("--storage", choices=STORAGE_TYPES, default="float32",
+                        help="Precision of stored vectors")
+    parser.add_argument("--reduced-dim", type=int, default=None,
+                        help="Project embeddings down to this many dimensions")
+    parser.add_argument("--transform", choices=TRANSFORM_TYPES, default="pca",
+                        help="Projection used with --reduced-dim")
+    args = parser.parse_args()
+    main(storage=args.storage, reduced_dim=args.reduced_dim, transform=args.transform)
\ No newline at end of file